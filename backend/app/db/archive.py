@@ -0,0 +1,361 @@
+import asyncio
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+from app.db.checkpointer import checkpointer
+from app.db.connection import get_connection
+from app.utils.context_cache import context_cache
+from app.utils.metrics import instrument_query
+
+load_dotenv()
+
+ARCHIVE_FORMAT_VERSION = 1
+
+
+def _month_start(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(month: datetime) -> datetime:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _write_archive(path: str, header: dict, messages: List[tuple], images: List[tuple]) -> None:
+    """Write a thread as gzip-compressed NDJSON: a header line, then one line
+    per message and image. Written to a temp file and renamed into place so
+    a crash never leaves a truncated archive behind."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+        f.write(json.dumps(header) + "\n")
+        for id, parent_id, role, content, created_at in messages:
+            f.write(json.dumps({
+                "type": "message", "id": id, "parent_id": parent_id, "role": role,
+                "content": content, "created_at": _iso(created_at),
+            }, ensure_ascii=False) + "\n")
+        for id, parent_id, url_id, role, description, created_at in images:
+            f.write(json.dumps({
+                "type": "image", "id": id, "parent_id": parent_id, "url_id": url_id,
+                "role": role, "description": description, "created_at": _iso(created_at),
+            }, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_archive(path: str) -> Tuple[List[dict], List[dict]]:
+    messages, images = [], []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("type") == "message":
+                messages.append(record)
+            elif record.get("type") == "image":
+                images.append(record)
+    return messages, images
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ThreadArchiver:
+    """Keeps ``messages`` partitions ahead of time and moves idle threads out
+    of Postgres.
+
+    Every ``interval`` seconds the monthly partitions for the next
+    ``months_ahead`` months are created, and (when enabled) up to
+    ``batch_size`` threads with no message newer than ``idle_days`` are
+    written to ``directory`` as gzip NDJSON and their messages, images and
+    checkpoints deleted. ``rehydrate`` puts an archived thread back on the
+    next read, so callers never see the difference.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        enabled: bool = False,
+        idle_days: float = 90.0,
+        interval: float = 3600.0,
+        batch_size: int = 100,
+        months_ahead: int = 2,
+    ):
+        self.directory = directory
+        self.enabled = enabled
+        self.idle_days = idle_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.months_ahead = months_ahead
+        self._task: Optional[asyncio.Task] = None
+        self.archived = 0
+        self.rehydrated = 0
+        self.failures = 0
+
+    def _path(self, thread_id: str) -> str:
+        return os.path.join(self.directory, thread_id[:2], f"{thread_id}.ndjson.gz")
+
+    # --- Background loop -----------------------------------------------------
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop(), name="thread-archiver")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.ensure_partitions()
+                if self.enabled:
+                    await self.archive_idle()
+            except Exception as e:
+                print(f"⚠️ Archiver run failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    @instrument_query(name="ensure_message_partitions")
+    async def ensure_partitions(self) -> None:
+        month = _month_start(datetime.now(timezone.utc))
+        async with get_connection() as conn:
+            for _ in range(self.months_ahead + 1):
+                upper = _next_month(month)
+                name = f"messages_{month:%Y_%m}"
+                try:
+                    await conn.execute(
+                        f"""
+                            CREATE TABLE IF NOT EXISTS {name} PARTITION OF messages
+                            FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}');
+                        """
+                    )
+                    await conn.commit()
+                except Exception as e:
+                    # Usually rows for that month already sit in messages_default.
+                    await conn.rollback()
+                    print(f"⚠️ Could not create partition {name}: {e}")
+                month = upper
+
+    # --- Archiving -----------------------------------------------------------
+
+    @instrument_query(name="find_idle_threads")
+    async def _idle_threads(self, cutoff: datetime) -> List[str]:
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                        SELECT t.thread_id::text
+                        FROM threads t
+                        WHERE t.archived_at IS NULL AND t.deleted_at IS NULL
+                          AND t.created_at < %(cutoff)s
+                          AND EXISTS (SELECT 1 FROM messages m WHERE m.thread_id = t.thread_id)
+                          AND NOT EXISTS (
+                              SELECT 1 FROM messages m
+                              WHERE m.thread_id = t.thread_id AND m.created_at >= %(cutoff)s
+                          )
+                        LIMIT %(limit)s;
+                    """,
+                    {"cutoff": cutoff, "limit": self.batch_size},
+                )
+                return [row[0] for row in await cur.fetchall()]
+
+    async def archive_idle(self) -> int:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.idle_days)
+        archived = 0
+        for thread_id in await self._idle_threads(cutoff):
+            try:
+                if await self.archive_thread(thread_id, cutoff):
+                    archived += 1
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Failed to archive thread {thread_id}: {e}")
+        if archived:
+            print(f"🗄️ Archived {archived} idle thread(s)")
+        return archived
+
+    @instrument_query(name="archive_thread")
+    async def archive_thread(self, thread_id: str, cutoff: datetime) -> bool:
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                        SELECT id, parent_id, role, content, created_at
+                        FROM messages WHERE thread_id = %s ORDER BY id;
+                    """,
+                    (thread_id,),
+                )
+                messages = await cur.fetchall()
+                await cur.execute(
+                    """
+                        SELECT id, parent_id, url_id, role, description, created_at
+                        FROM images WHERE thread_id = %s ORDER BY id;
+                    """,
+                    (thread_id,),
+                )
+                images = await cur.fetchall()
+        if not messages:
+            return False
+
+        path = self._path(thread_id)
+        header = {
+            "version": ARCHIVE_FORMAT_VERSION,
+            "thread_id": thread_id,
+            "archived_at": datetime.now(timezone.utc).isoformat(),
+        }
+        await asyncio.to_thread(_write_archive, path, header, messages, images)
+
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                # The row lock also blocks message inserts (their foreign key
+                # check needs a KEY SHARE lock), so nothing slips in between
+                # the re-check and the delete.
+                await cur.execute(
+                    """
+                        SELECT 1 FROM threads t
+                        WHERE t.thread_id = %(thread_id)s
+                          AND t.archived_at IS NULL AND t.deleted_at IS NULL
+                          AND NOT EXISTS (
+                              SELECT 1 FROM messages m
+                              WHERE m.thread_id = t.thread_id
+                                AND (m.created_at >= %(cutoff)s OR m.id > %(last_id)s)
+                          )
+                        FOR UPDATE;
+                    """,
+                    {"thread_id": thread_id, "cutoff": cutoff, "last_id": messages[-1][0]},
+                )
+                if await cur.fetchone() is None:
+                    await asyncio.to_thread(_remove, path)
+                    return False
+                await cur.execute("DELETE FROM images WHERE thread_id = %s;", (thread_id,))
+                await cur.execute("DELETE FROM messages WHERE thread_id = %s;", (thread_id,))
+                await cur.execute(
+                    """
+                        UPDATE threads SET archived_at = now(), archive_path = %s
+                        WHERE thread_id = %s;
+                    """,
+                    (path, thread_id),
+                )
+        # Continuing the thread re-bootstraps the graph state from history.
+        await checkpointer.adelete_thread(thread_id)
+        context_cache.invalidate(thread_id)
+        self.archived += 1
+        return True
+
+    # --- Rehydration ---------------------------------------------------------
+
+    @instrument_query(name="rehydrate_thread")
+    async def rehydrate(self, thread_id: str) -> bool:
+        """Restore an archived thread into Postgres. Returns True if rows were
+        restored, False if the thread was not archived."""
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                # Concurrent readers queue on the row lock; the first restores
+                # the thread and the rest find it no longer archived.
+                await cur.execute(
+                    """
+                        SELECT archive_path FROM threads
+                        WHERE thread_id = %s AND archived_at IS NOT NULL AND deleted_at IS NULL
+                        FOR UPDATE;
+                    """,
+                    (thread_id,),
+                )
+                row = await cur.fetchone()
+                if row is None:
+                    return False
+                path = row[0]
+                try:
+                    messages, images = await asyncio.to_thread(_read_archive, path)
+                except FileNotFoundError:
+                    self.failures += 1
+                    print(f"❌ Archive for thread {thread_id} is missing: {path}")
+                    return False
+                if messages:
+                    await cur.executemany(
+                        """
+                            INSERT INTO messages (id, thread_id, parent_id, role, content, created_at)
+                            VALUES (%s, %s, %s, %s, %s, %s)
+                            ON CONFLICT DO NOTHING;
+                        """,
+                        [
+                            (m["id"], thread_id, m["parent_id"], m["role"], m["content"], m["created_at"])
+                            for m in messages
+                        ],
+                    )
+                if images:
+                    await cur.executemany(
+                        """
+                            INSERT INTO images (id, thread_id, parent_id, url_id, role, description, created_at)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s)
+                            ON CONFLICT DO NOTHING;
+                        """,
+                        [
+                            (
+                                i["id"], thread_id, i["parent_id"], i["url_id"],
+                                i["role"], i["description"], i["created_at"],
+                            )
+                            for i in images
+                        ],
+                    )
+                await cur.execute(
+                    "UPDATE threads SET archived_at = NULL, archive_path = NULL WHERE thread_id = %s;",
+                    (thread_id,),
+                )
+        await asyncio.to_thread(_remove, path)
+        self.rehydrated += 1
+        print(f"📦 Rehydrated thread {thread_id} ({len(messages)} messages)")
+        return True
+
+    async def image_ids(self, path: str) -> List[str]:
+        """Storage ids of the images kept in an archive file."""
+        try:
+            _, images = await asyncio.to_thread(_read_archive, path)
+        except FileNotFoundError:
+            return []
+        return [image["url_id"] for image in images]
+
+    async def message_ids(self, path: str) -> List[int]:
+        """Ids of the messages kept in an archive file; their tool logs and
+        embeddings stay in Postgres while the thread is archived."""
+        try:
+            messages, _ = await asyncio.to_thread(_read_archive, path)
+        except FileNotFoundError:
+            return []
+        return [message["id"] for message in messages]
+
+    async def remove_archive(self, path: Optional[str]) -> None:
+        if path:
+            await asyncio.to_thread(_remove, path)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "idle_days": self.idle_days,
+            "archived": self.archived,
+            "rehydrated": self.rehydrated,
+            "failures": self.failures,
+        }
+
+
+archiver = ThreadArchiver(
+    directory=os.getenv("ARCHIVE_DIR", "archive"),
+    enabled=os.getenv("ARCHIVE_ENABLED", "false").lower() == "true",
+    idle_days=float(os.getenv("ARCHIVE_IDLE_DAYS", "90")),
+    interval=float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600")),
+    batch_size=int(os.getenv("ARCHIVE_BATCH_SIZE", "100")),
+    months_ahead=int(os.getenv("MESSAGE_PARTITIONS_AHEAD", "2")),
+)
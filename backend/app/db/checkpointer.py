@@ -0,0 +1,336 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Set
+from dotenv import load_dotenv
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from app.db.connection import get_connection
+from app.utils.metrics import instrument_query
+
+load_dotenv()
+
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+    return {
+        "configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint_id,
+        }
+    }
+
+
+class PostgresCheckpointSaver(BaseCheckpointSaver):
+    """LangGraph checkpointer on the application's shared connection pool.
+
+    The stock Postgres saver wants its own autocommit, dict_row connections,
+    so this one stores each checkpoint as a single serialized row and its
+    pending writes alongside, using the same pool (and query metrics) as the
+    rest of the app. Only the async API is implemented.
+
+    Checkpoints are keyed by (thread_id, checkpoint_ns, checkpoint_id) and
+    cascade-delete with their thread. Threads written to are marked dirty and
+    a background task keeps only the ``keep`` newest checkpoints of each.
+    """
+
+    def __init__(self, keep: int = 2, prune_interval: float = 30.0):
+        super().__init__()
+        self.keep = keep
+        self.prune_interval = prune_interval
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.pruned = 0
+
+    # --- Reads ---------------------------------------------------------------
+
+    def _tuple(self, row, writes) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, c_type, c_blob, m_type, m_blob = row
+        return CheckpointTuple(
+            config=_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint=self.serde.loads_typed((c_type, c_blob)),
+            metadata=self.serde.loads_typed((m_type, m_blob)),
+            parent_config=_config(thread_id, checkpoint_ns, parent_id) if parent_id else None,
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((w_type, w_blob)))
+                for task_id, channel, w_type, w_blob in writes
+            ],
+        )
+
+    @instrument_query(name="checkpoint_get")
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    f"""
+                        SELECT thread_id::text, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+                               type, checkpoint, metadata_type, metadata
+                        FROM graph_checkpoints
+                        WHERE thread_id = %s AND checkpoint_ns = %s
+                        {'AND checkpoint_id = %s' if checkpoint_id else ''}
+                        ORDER BY checkpoint_id DESC
+                        LIMIT 1;
+                    """,
+                    (thread_id, checkpoint_ns, checkpoint_id) if checkpoint_id else (thread_id, checkpoint_ns),
+                )
+                row = await cur.fetchone()
+                if row is None:
+                    return None
+                await cur.execute(
+                    """
+                        SELECT task_id, channel, type, value
+                        FROM graph_checkpoint_writes
+                        WHERE thread_id = %s AND checkpoint_ns = %s AND checkpoint_id = %s
+                        ORDER BY task_id, idx;
+                    """,
+                    (thread_id, checkpoint_ns, row[2]),
+                )
+                writes = await cur.fetchall()
+        return self._tuple(row, writes)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = %s")
+            params.append(str(config["configurable"]["thread_id"]))
+            if "checkpoint_ns" in config["configurable"]:
+                clauses.append("checkpoint_ns = %s")
+                params.append(config["configurable"]["checkpoint_ns"])
+        if before and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < %s")
+            params.append(get_checkpoint_id(before))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    f"""
+                        SELECT thread_id::text, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+                               type, checkpoint, metadata_type, metadata
+                        FROM graph_checkpoints
+                        {where}
+                        ORDER BY checkpoint_id DESC;
+                    """,
+                    params,
+                )
+                rows = await cur.fetchall()
+        yielded = 0
+        for row in rows:
+            tuple_ = self._tuple(row, [])
+            # Metadata is stored serialized, so filters are applied here.
+            if filter and any(tuple_.metadata.get(k) != v for k, v in filter.items()):
+                continue
+            yield tuple_
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+
+    # --- Writes --------------------------------------------------------------
+
+    @instrument_query(name="checkpoint_put")
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c_type, c_blob = self.serde.dumps_typed(checkpoint)
+        m_type, m_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                        INSERT INTO graph_checkpoints (
+                            thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+                            type, checkpoint, metadata_type, metadata
+                        )
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                        ON CONFLICT (thread_id, checkpoint_ns, checkpoint_id) DO UPDATE
+                        SET type = EXCLUDED.type,
+                            checkpoint = EXCLUDED.checkpoint,
+                            metadata_type = EXCLUDED.metadata_type,
+                            metadata = EXCLUDED.metadata;
+                    """,
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint["id"],
+                        config["configurable"].get("checkpoint_id"),
+                        c_type,
+                        c_blob,
+                        m_type,
+                        m_blob,
+                    ),
+                )
+        self._dirty.add(thread_id)
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    @instrument_query(name="checkpoint_put_writes")
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Special writes (errors, interrupts) replace earlier ones; regular
+        # writes are idempotent per (task, index).
+        upsert = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            w_type, w_blob = self.serde.dumps_typed(value)
+            rows.append(
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint_id,
+                    task_id,
+                    task_path,
+                    WRITES_IDX_MAP.get(channel, idx),
+                    channel,
+                    w_type,
+                    w_blob,
+                )
+            )
+        if not rows:
+            return
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.executemany(
+                    f"""
+                        INSERT INTO graph_checkpoint_writes (
+                            thread_id, checkpoint_ns, checkpoint_id, task_id, task_path,
+                            idx, channel, type, value
+                        )
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        ON CONFLICT (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+                        {'DO UPDATE SET channel = EXCLUDED.channel, type = EXCLUDED.type, value = EXCLUDED.value' if upsert else 'DO NOTHING'};
+                    """,
+                    rows,
+                )
+
+    @instrument_query(name="checkpoint_delete_thread")
+    async def adelete_thread(self, thread_id: str) -> None:
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "DELETE FROM graph_checkpoint_writes WHERE thread_id = %s;", (str(thread_id),)
+                )
+                await cur.execute(
+                    "DELETE FROM graph_checkpoints WHERE thread_id = %s;", (str(thread_id),)
+                )
+        self._dirty.discard(str(thread_id))
+
+    @instrument_query(name="checkpoint_exists")
+    async def has_checkpoint(self, thread_id: str) -> bool:
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "SELECT 1 FROM graph_checkpoints WHERE thread_id = %s LIMIT 1;",
+                    (thread_id,),
+                )
+                return await cur.fetchone() is not None
+
+    # --- Pruning -------------------------------------------------------------
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._prune_loop(), name="checkpoint-pruner")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.prune()
+
+    async def _prune_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.prune_interval)
+            try:
+                await self.prune()
+            except Exception as e:
+                print(f"⚠️ Checkpoint pruning failed: {e}")
+
+    @instrument_query(name="checkpoint_prune")
+    async def prune(self) -> int:
+        """Drop all but the ``keep`` newest checkpoints (and their writes) of
+        every thread written since the last run."""
+        if not self._dirty:
+            return 0
+        thread_ids, self._dirty = list(self._dirty), set()
+        try:
+            async with get_connection() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(
+                        """
+                            WITH doomed AS (
+                                SELECT thread_id, checkpoint_ns, checkpoint_id
+                                FROM (
+                                    SELECT thread_id, checkpoint_ns, checkpoint_id,
+                                           row_number() OVER (
+                                               PARTITION BY thread_id, checkpoint_ns
+                                               ORDER BY checkpoint_id DESC
+                                           ) AS rn
+                                    FROM graph_checkpoints
+                                    WHERE thread_id = ANY(%s::uuid[])
+                                ) ranked
+                                WHERE rn > %s
+                            ),
+                            dropped_writes AS (
+                                DELETE FROM graph_checkpoint_writes w
+                                USING doomed d
+                                WHERE w.thread_id = d.thread_id
+                                  AND w.checkpoint_ns = d.checkpoint_ns
+                                  AND w.checkpoint_id = d.checkpoint_id
+                            )
+                            DELETE FROM graph_checkpoints c
+                            USING doomed d
+                            WHERE c.thread_id = d.thread_id
+                              AND c.checkpoint_ns = d.checkpoint_ns
+                              AND c.checkpoint_id = d.checkpoint_id;
+                        """,
+                        (thread_ids, self.keep),
+                    )
+                    deleted = cur.rowcount
+        except Exception:
+            self._dirty.update(thread_ids)
+            raise
+        self.pruned += deleted
+        return deleted
+
+    def stats(self) -> dict:
+        return {"keep": self.keep, "dirty_threads": len(self._dirty), "pruned": self.pruned}
+
+
+checkpointer = PostgresCheckpointSaver(
+    keep=int(os.getenv("CHECKPOINT_KEEP", "2")),
+    prune_interval=float(os.getenv("CHECKPOINT_PRUNE_INTERVAL_SECONDS", "30")),
+)
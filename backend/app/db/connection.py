@@ -1,31 +1,201 @@
-from psycopg_pool import AsyncConnectionPool
+import asyncio
+import bisect
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Dict, List
+from dotenv import load_dotenv
+from psycopg import AsyncConnection, AsyncCursor
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
 from app.db.database import get_db_url
+from app.utils.metrics import observe_query
 
-pool: AsyncConnectionPool | None = None
+load_dotenv()
+
+# Upper bounds (ms) of the checkout latency histogram buckets.
+CHECKOUT_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class InstrumentedCursor(AsyncCursor):
+    """Cursor that records statement latency and row counts into metrics."""
+
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            observe_query(time.perf_counter() - started, self.rowcount)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            observe_query(time.perf_counter() - started, self.rowcount)
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    min_size: int = 4
+    max_size: int = 20
+    max_idle: float = 600.0
+    max_lifetime: float = 3600.0
+    checkout_timeout: float = 10.0
+    check_on_checkout: bool = True
+    reconnect_attempts: int = 5
+    reconnect_backoff: float = 0.5
+    reconnect_backoff_max: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        return cls(
+            min_size=int(os.getenv("DB_POOL_MIN_SIZE", cls.min_size)),
+            max_size=int(os.getenv("DB_POOL_MAX_SIZE", cls.max_size)),
+            max_idle=float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", cls.max_idle)),
+            max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME_SECONDS", cls.max_lifetime)),
+            checkout_timeout=float(os.getenv("DB_POOL_TIMEOUT_SECONDS", cls.checkout_timeout)),
+            check_on_checkout=os.getenv("DB_POOL_CHECK_ON_CHECKOUT", "true").lower() == "true",
+            reconnect_attempts=int(os.getenv("DB_POOL_RECONNECT_ATTEMPTS", cls.reconnect_attempts)),
+        )
+
+
+class PoolManager:
+    """Owns the application's AsyncConnectionPool.
+
+    Every checkout goes through ``connection()``, which records waiting
+    requests, checkout latency, connections in use and errors. A closed pool
+    is reopened with bounded exponential backoff; when that fails the error
+    is raised instead of silently building a fresh pool.
+    """
+
+    def __init__(self, config: PoolConfig):
+        self.config = config
+        self.pool: AsyncConnectionPool | None = None
+        self._reopen_lock = asyncio.Lock()
+        self.waiting = 0
+        self.in_use = 0
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.checkout_buckets: List[int] = [0] * (len(CHECKOUT_BUCKETS_MS) + 1)
+        self.checkout_ms_sum = 0.0
+
+    def _build(self) -> AsyncConnectionPool:
+        return AsyncConnectionPool(
+            get_db_url(),
+            min_size=self.config.min_size,
+            max_size=self.config.max_size,
+            max_idle=self.config.max_idle,
+            max_lifetime=self.config.max_lifetime,
+            timeout=self.config.checkout_timeout,
+            check=AsyncConnectionPool.check_connection if self.config.check_on_checkout else None,
+            kwargs={"cursor_factory": InstrumentedCursor},
+            open=False,
+        )
+
+    async def open(self) -> AsyncConnectionPool:
+        """Open the pool, retrying with bounded backoff"""
+        delay = self.config.reconnect_backoff
+        for attempt in range(1, self.config.reconnect_attempts + 1):
+            pool = self._build()
+            try:
+                await pool.open(wait=True, timeout=self.config.checkout_timeout)
+                self.pool = pool
+                print(f"✅ Database pool open (min={self.config.min_size}, max={self.config.max_size})")
+                return pool
+            except Exception as e:
+                self.errors += 1
+                await pool.close()
+                print(f"⚠️ Database pool open failed (attempt {attempt}/{self.config.reconnect_attempts}): {e}")
+                if attempt == self.config.reconnect_attempts:
+                    raise RuntimeError("Database pool unavailable") from e
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.config.reconnect_backoff_max)
+        raise RuntimeError("Database pool unavailable")
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def get_pool(self) -> AsyncConnectionPool:
+        if self.pool is not None and not self.pool.closed:
+            return self.pool
+        async with self._reopen_lock:
+            if self.pool is None or self.pool.closed:
+                print("⚠️ Database pool was closed or uninitialized. Reopening...")
+                self.reconnects += 1
+                await self.open()
+        return self.pool
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[AsyncConnection]:
+        pool = await self.get_pool()
+        started = time.perf_counter()
+        checked_out = False
+        self.waiting += 1
+        try:
+            async with pool.connection() as conn:
+                checked_out = True
+                self.waiting -= 1
+                self._observe_checkout((time.perf_counter() - started) * 1000)
+                self.in_use += 1
+                try:
+                    yield conn
+                finally:
+                    self.in_use -= 1
+        except PoolTimeout:
+            self.checkout_timeouts += 1
+            raise
+        except Exception:
+            # Only checkout failures are pool errors; whatever the caller's
+            # block raises (constraint violations, HTTP errors) is not.
+            if not checked_out:
+                self.errors += 1
+            raise
+        finally:
+            if not checked_out:
+                self.waiting -= 1
+
+    def _observe_checkout(self, elapsed_ms: float) -> None:
+        self.checkouts += 1
+        self.checkout_ms_sum += elapsed_ms
+        self.checkout_buckets[bisect.bisect_left(CHECKOUT_BUCKETS_MS, elapsed_ms)] += 1
+
+    def stats(self) -> Dict[str, object]:
+        pool_stats = self.pool.get_stats() if self.pool is not None else {}
+        cumulative, histogram = 0, {}
+        for bound, count in zip(CHECKOUT_BUCKETS_MS + ["+Inf"], self.checkout_buckets):
+            cumulative += count
+            histogram[str(bound)] = cumulative
+        return {
+            "config": asdict(self.config),
+            "open": self.pool is not None and not self.pool.closed,
+            "pool_size": pool_stats.get("pool_size", 0),
+            "pool_available": pool_stats.get("pool_available", 0),
+            "requests_waiting": pool_stats.get("requests_waiting", 0),
+            "waiting": self.waiting,
+            "in_use": self.in_use,
+            "checkouts": self.checkouts,
+            "checkout_ms_avg": round(self.checkout_ms_sum / self.checkouts, 3) if self.checkouts else 0.0,
+            "checkout_ms_histogram": histogram,
+            "checkout_timeouts": self.checkout_timeouts,
+            "errors": self.errors,
+            "reconnects": self.reconnects,
+            "connections_lost": pool_stats.get("connections_lost", 0),
+        }
+
+
+pool_manager = PoolManager(PoolConfig.from_env())
 
 
 async def get_pool() -> AsyncConnectionPool:
     """Get the global database pool instance"""
-    global pool
-    try:
-        if pool is None or pool.closed:
-            print("⚠️ Database pool was closed or uninitialized. Reopening...")
-            pool = AsyncConnectionPool(get_db_url())
-            await pool.open()
-        return pool
-    except Exception as e:
-        print(f"❌ Pool validation failed: {e}. Reinitializing pool...")
-        try:
-            pool = AsyncConnectionPool(get_db_url())
-            await pool.open()
-            print("✅ Pool reinitialized successfully.")
-            return pool
-        except Exception as e2:
-            print(f"💥 Failed to reinitialize pool: {e2}")
-            raise RuntimeError("Database pool reinitialization failed") from e2
-
-
-def set_pool(new_pool: AsyncConnectionPool) -> None:
-    """Set the global database pool instance"""
-    global pool
-    pool = new_pool
+    return await pool_manager.get_pool()
+
+
+def get_connection():
+    """Check out a pooled connection through the instrumented pool manager"""
+    return pool_manager.connection()
@@ -0,0 +1,411 @@
+from dataclasses import dataclass
+from typing import List, Optional
+import psycopg
+from app.db.database import get_db_url
+
+# Arbitrary constant shared by every worker so only one applies migrations.
+MIGRATION_LOCK_KEY = 727_011
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: List[str]
+    # CONCURRENTLY statements cannot run inside a transaction block, so they
+    # are executed one by one in autocommit mode.
+    concurrent: bool = False
+    # Name of the index built by a concurrent migration; an INVALID leftover
+    # from an interrupted build is dropped before retrying.
+    index_name: Optional[str] = None
+
+
+def index_migration(version: int, name: str, index_name: str, definition: str) -> Migration:
+    return Migration(
+        version=version,
+        name=name,
+        statements=[f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {definition};"],
+        concurrent=True,
+        index_name=index_name,
+    )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "initial_schema",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id SERIAL PRIMARY KEY,
+                username VARCHAR(20) UNIQUE NOT NULL,
+                email VARCHAR(254) UNIQUE NOT NULL,
+                encoded_password TEXT NOT NULL,
+                first_name VARCHAR(20),
+                last_name VARCHAR(20),
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS threads (
+                thread_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                title VARCHAR(20),
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                id SERIAL PRIMARY KEY,
+                thread_id UUID NOT NULL REFERENCES threads(thread_id) ON DELETE CASCADE,
+                parent_id INT REFERENCES messages(id),
+                role TEXT CHECK (role IN ('user', 'assistant', 'tool')),
+                content TEXT NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS images (
+                id SERIAL PRIMARY KEY,
+                thread_id UUID NOT NULL REFERENCES threads(thread_id) ON DELETE CASCADE,
+                parent_id INT REFERENCES messages(id) ON DELETE CASCADE,
+                url_id VARCHAR(50) NOT NULL UNIQUE,
+                role TEXT CHECK (role IN ('user', 'assistant')),
+                description TEXT,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS tool_logs (
+                id SERIAL PRIMARY KEY,
+                message_id INT REFERENCES messages(id) ON DELETE CASCADE,
+                tool_name TEXT NOT NULL,
+                input TEXT NOT NULL,
+                output TEXT,
+                used_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            );
+            """,
+        ],
+    ),
+    index_migration(
+        2,
+        "threads_user_created_index",
+        "idx_threads_user_created",
+        "threads (user_id, created_at DESC, thread_id DESC)",
+    ),
+    index_migration(
+        3,
+        "messages_thread_created_index",
+        "idx_messages_thread_created",
+        "messages (thread_id, created_at DESC)",
+    ),
+    index_migration(
+        4,
+        "images_thread_parent_index",
+        "idx_images_thread_parent",
+        "images (thread_id, parent_id)",
+    ),
+    Migration(
+        5,
+        "threads_response_cache_flag",
+        [
+            "ALTER TABLE threads ADD COLUMN IF NOT EXISTS response_cache BOOLEAN NOT NULL DEFAULT TRUE;",
+        ],
+    ),
+    Migration(
+        6,
+        "thread_summaries",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS thread_summaries (
+                thread_id UUID PRIMARY KEY REFERENCES threads(thread_id) ON DELETE CASCADE,
+                summary TEXT NOT NULL,
+                -- Highest message id folded into the summary.
+                covered_until_id INT NOT NULL,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            );
+            """,
+        ],
+    ),
+    Migration(
+        7,
+        "embedded_messages",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS embedded_messages (
+                message_id INT NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+                user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                model TEXT NOT NULL,
+                -- Contiguous little-endian float32 vector.
+                embedding BYTEA NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+                PRIMARY KEY (message_id, model)
+            );
+            """,
+            # New, empty table: a plain build is instant and safe here.
+            "CREATE INDEX IF NOT EXISTS idx_embedded_messages_user ON embedded_messages (user_id, model, message_id);",
+        ],
+    ),
+    Migration(
+        8,
+        "graph_checkpoints",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS graph_checkpoints (
+                thread_id UUID NOT NULL REFERENCES threads(thread_id) ON DELETE CASCADE,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT NOT NULL,
+                checkpoint BYTEA NOT NULL,
+                metadata_type TEXT NOT NULL,
+                metadata BYTEA NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS graph_checkpoint_writes (
+                thread_id UUID NOT NULL REFERENCES threads(thread_id) ON DELETE CASCADE,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                task_path TEXT NOT NULL DEFAULT '',
+                idx INT NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT,
+                value BYTEA,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            """,
+        ],
+    ),
+    Migration(
+        9,
+        "tool_usage_stats",
+        [
+            "ALTER TABLE tool_logs ADD COLUMN IF NOT EXISTS latency_ms INT;",
+            "ALTER TABLE tool_logs ADD COLUMN IF NOT EXISTS success BOOLEAN;",
+            "ALTER TABLE tool_logs ADD COLUMN IF NOT EXISTS output_bytes INT;",
+            """
+            CREATE TABLE IF NOT EXISTS tool_usage_hourly (
+                tool_name TEXT NOT NULL,
+                hour TIMESTAMP WITH TIME ZONE NOT NULL,
+                calls INT NOT NULL,
+                failures INT NOT NULL,
+                total_ms BIGINT NOT NULL,
+                -- Counts per TOOL_LATENCY_BUCKETS_MS bound, plus one overflow slot.
+                latency_buckets INT[] NOT NULL,
+                PRIMARY KEY (tool_name, hour)
+            );
+            """,
+        ],
+    ),
+    index_migration(
+        10,
+        "tool_logs_name_used_at_index",
+        "idx_tool_logs_name_used_at",
+        "tool_logs (tool_name, used_at)",
+    ),
+    # Range-partition messages by month. A partitioned table can only be
+    # referenced through a key that includes the partition column, so the
+    # foreign keys to messages(id) are dropped; rows that hung off a message
+    # go away with their thread (images) or are deleted explicitly
+    # (tool_logs, embedded_messages).
+    Migration(
+        11,
+        "partition_messages_by_month",
+        [
+            "ALTER TABLE messages DROP CONSTRAINT IF EXISTS messages_parent_id_fkey;",
+            "ALTER TABLE images DROP CONSTRAINT IF EXISTS images_parent_id_fkey;",
+            "ALTER TABLE tool_logs DROP CONSTRAINT IF EXISTS tool_logs_message_id_fkey;",
+            "ALTER TABLE embedded_messages DROP CONSTRAINT IF EXISTS embedded_messages_message_id_fkey;",
+            "ALTER TABLE messages RENAME TO messages_unpartitioned;",
+            "ALTER TABLE messages_unpartitioned RENAME CONSTRAINT messages_pkey TO messages_unpartitioned_pkey;",
+            """
+            CREATE TABLE messages (
+                id INT NOT NULL DEFAULT nextval('messages_id_seq'),
+                thread_id UUID NOT NULL REFERENCES threads(thread_id) ON DELETE CASCADE,
+                parent_id INT,
+                role TEXT CHECK (role IN ('user', 'assistant', 'tool')),
+                content TEXT NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at);
+            """,
+            # Monthly partitions from the oldest message to two months ahead;
+            # the archiver keeps creating them ahead of time after this. The
+            # default partition only catches rows if that ever falls behind.
+            """
+            DO $$
+            DECLARE
+                m DATE;
+                last_m DATE := (date_trunc('month', now() AT TIME ZONE 'UTC') + interval '2 months')::date;
+            BEGIN
+                SELECT date_trunc('month', COALESCE(min(created_at), now()) AT TIME ZONE 'UTC')::date
+                INTO m FROM messages_unpartitioned;
+                WHILE m <= last_m LOOP
+                    EXECUTE format(
+                        'CREATE TABLE IF NOT EXISTS %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+                        'messages_' || to_char(m, 'YYYY_MM'),
+                        m::text || ' 00:00:00+00',
+                        (m + interval '1 month')::date::text || ' 00:00:00+00'
+                    );
+                    m := (m + interval '1 month')::date;
+                END LOOP;
+            END $$;
+            """,
+            "CREATE TABLE IF NOT EXISTS messages_default PARTITION OF messages DEFAULT;",
+            """
+            INSERT INTO messages (id, thread_id, parent_id, role, content, created_at)
+            SELECT id, thread_id, parent_id, role, content, COALESCE(created_at, now())
+            FROM messages_unpartitioned;
+            """,
+            "ALTER SEQUENCE messages_id_seq OWNED BY messages.id;",
+            "DROP TABLE messages_unpartitioned;",
+            "CREATE INDEX IF NOT EXISTS idx_messages_thread_created ON messages (thread_id, created_at DESC);",
+            "ALTER TABLE threads ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP WITH TIME ZONE;",
+            "ALTER TABLE threads ADD COLUMN IF NOT EXISTS archive_path TEXT;",
+        ],
+    ),
+    index_migration(
+        12,
+        "tool_logs_message_index",
+        "idx_tool_logs_message",
+        "tool_logs (message_id)",
+    ),
+    Migration(
+        13,
+        "soft_delete",
+        [
+            "ALTER TABLE threads ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE;",
+            "ALTER TABLE users ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE;",
+        ],
+    ),
+    # Partial indexes: only the few rows waiting for the purger are indexed.
+    index_migration(
+        14,
+        "threads_deleted_index",
+        "idx_threads_deleted",
+        "threads (deleted_at) WHERE deleted_at IS NOT NULL",
+    ),
+    index_migration(
+        15,
+        "users_deleted_index",
+        "idx_users_deleted",
+        "users (deleted_at) WHERE deleted_at IS NOT NULL",
+    ),
+    Migration(
+        16,
+        "thread_listing_columns",
+        [
+            # Widening a varchar only changes the catalog; no table rewrite.
+            "ALTER TABLE threads ALTER COLUMN title TYPE VARCHAR(80);",
+            "ALTER TABLE threads ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP WITH TIME ZONE;",
+            "ALTER TABLE threads ADD COLUMN IF NOT EXISTS message_count INT NOT NULL DEFAULT 0;",
+            "ALTER TABLE threads ADD COLUMN IF NOT EXISTS preview TEXT;",
+            """
+            UPDATE threads t
+            SET message_count = s.message_count,
+                last_message_at = s.last_message_at,
+                preview = s.preview
+            FROM (
+                SELECT DISTINCT ON (thread_id)
+                    thread_id,
+                    count(*) OVER (PARTITION BY thread_id) AS message_count,
+                    created_at AS last_message_at,
+                    left(regexp_replace(content, '\\s+', ' ', 'g'), 120) AS preview
+                FROM messages
+                ORDER BY thread_id, created_at DESC, id DESC
+            ) s
+            WHERE t.thread_id = s.thread_id;
+            """,
+            "UPDATE threads SET last_message_at = COALESCE(created_at, now()) WHERE last_message_at IS NULL;",
+            "ALTER TABLE threads ALTER COLUMN last_message_at SET DEFAULT now();",
+            "ALTER TABLE threads ALTER COLUMN last_message_at SET NOT NULL;",
+        ],
+    ),
+    index_migration(
+        17,
+        "threads_user_activity_index",
+        "idx_threads_user_activity",
+        "threads (user_id, last_message_at DESC, thread_id DESC) WHERE deleted_at IS NULL",
+    ),
+    Migration(
+        18,
+        "thread_purge_backoff",
+        [
+            "ALTER TABLE threads ADD COLUMN IF NOT EXISTS purge_attempts INT NOT NULL DEFAULT 0;",
+            "ALTER TABLE threads ADD COLUMN IF NOT EXISTS purge_after TIMESTAMP WITH TIME ZONE;",
+        ],
+    ),
+]
+
+
+async def _drop_invalid_index(conn: psycopg.AsyncConnection, index_name: str) -> None:
+    cur = await conn.execute(
+        """
+            SELECT 1 FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = %s AND NOT i.indisvalid;
+        """,
+        (index_name,),
+    )
+    if await cur.fetchone():
+        print(f"⚠️ Dropping invalid index {index_name} left by an interrupted build")
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name};")
+
+
+async def _apply(conn: psycopg.AsyncConnection, migration: Migration) -> None:
+    if migration.concurrent:
+        if migration.index_name:
+            await _drop_invalid_index(conn, migration.index_name)
+        for statement in migration.statements:
+            await conn.execute(statement)
+        await conn.execute(
+            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s);",
+            (migration.version, migration.name),
+        )
+        return
+
+    async with conn.transaction():
+        for statement in migration.statements:
+            await conn.execute(statement)
+        await conn.execute(
+            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s);",
+            (migration.version, migration.name),
+        )
+
+
+async def run_migrations(migrations: List[Migration] = MIGRATIONS) -> List[int]:
+    """Apply pending migrations in version order and return the versions applied.
+
+    Runs on a dedicated autocommit connection holding a session-level advisory
+    lock, so workers that boot together wait for each other and each version is
+    applied exactly once.
+    """
+    applied_now: List[int] = []
+    async with await psycopg.AsyncConnection.connect(get_db_url(), autocommit=True) as conn:
+        await conn.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_KEY,))
+        try:
+            await conn.execute(
+                """
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version INT PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        applied_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+                    );
+                """
+            )
+            cur = await conn.execute("SELECT version FROM schema_migrations;")
+            applied = {row[0] for row in await cur.fetchall()}
+
+            for migration in sorted(migrations, key=lambda m: m.version):
+                if migration.version in applied:
+                    continue
+                print(f"⏫ Applying migration {migration.version}: {migration.name}")
+                await _apply(conn, migration)
+                applied_now.append(migration.version)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_KEY,))
+    return applied_now
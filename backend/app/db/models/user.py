@@ -1,25 +1,75 @@
-import bcrypt
+import asyncio
 import psycopg
-from app.db.connection import get_pool
+from app.db.connection import get_connection
+from app.db.purge import purger
+from app.utils.metrics import instrument_query
+from app.utils.availability import availability_index
+from app.utils.password_hasher import password_hasher
 
+# Strong references to fire-and-forget hash upgrades.
+_background_tasks: set[asyncio.Task] = set()
 
-def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password.encode("utf-8"), salt)
-    return hashed_password.decode("utf-8")
 
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
 
-def verify_password(password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(password, hashed_password)
+
+
+@instrument_query
+async def upgrade_password_hash(id: int, password: str, old_hash: str) -> None:
+    """Re-hash with the current cost factor after a successful login."""
+    try:
+        new_hash = await hash_password(password)
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                        UPDATE users SET encoded_password = %s
+                        WHERE id = %s AND encoded_password = %s;
+                    """,
+                    (new_hash, id, old_hash),
+                )
+        print(f"🔐 Upgraded password hash for user {id} to cost {password_hasher.rounds}")
+    except Exception as e:
+        print(f"⚠️ Password hash upgrade failed for user {id}: {e}")
+
+
+async def scan_accounts():
+    """Stream every (username, email) with a server-side cursor."""
+    async with get_connection() as conn:
+        async with conn.cursor(name="availability_scan") as cur:
+            cur.itersize = 5000
+            await cur.execute("SELECT username, email FROM users;")
+            async for row in cur:
+                yield row[0], row[1]
+
+
+@instrument_query
+async def load_availability_index() -> None:
+    try:
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE relname = 'users';"
+                )
+                row = await cur.fetchone()
+        await availability_index.load(scan_accounts, expected=row[0] if row else 0)
+    except Exception as e:
+        print(f"⚠️ Availability index load failed, checks will query the DB: {e}")
 
 
 # -----------------------------------------------------------------------
 
 
+@instrument_query
 async def check_if_user_present(username: str) -> bool:
+    if not availability_index.might_contain_username(username):
+        return False
     try:
-        pool = await get_pool()
-        async with pool.connection() as conn:
+        async with get_connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -29,15 +79,20 @@ async def check_if_user_present(username: str) -> bool:
                         """,
                     (username,),
                 )
-            return (await cur.fetchone()) is not None
+                present = (await cur.fetchone()) is not None
+        if not present:
+            availability_index.record_false_positive()
+        return present
     except psycopg.errors.ConnectionDoesNotExist:
         return False
 
 
+@instrument_query
 async def check_if_email_present(email: str) -> bool:
+    if not availability_index.might_contain_email(email):
+        return False
     try:
-        pool = await get_pool()
-        async with pool.connection() as conn:
+        async with get_connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -47,8 +102,10 @@ async def check_if_email_present(email: str) -> bool:
                         """,
                     (email,),
                 )
-
-            return (await cur.fetchone()) is not None
+                present = (await cur.fetchone()) is not None
+        if not present:
+            availability_index.record_false_positive()
+        return present
     except psycopg.errors.ConnectionDoesNotExist:
         return False
 
@@ -56,6 +113,7 @@ async def check_if_email_present(email: str) -> bool:
 # print(check_if_user_present(""))
 
 
+@instrument_query
 async def create_user(
     username: str,
     email: str,
@@ -64,9 +122,8 @@ async def create_user(
     last_name: str | None,
 ) -> bool:
     try:
-        hashed_pw = hash_password(password)
-        pool = await get_pool()
-        async with pool.connection() as conn:
+        hashed_pw = await hash_password(password)
+        async with get_connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -79,55 +136,77 @@ async def create_user(
                     (username, email, hashed_pw, first_name, last_name),
                 )
                 created_user = await cur.fetchone()
-            return created_user is not None
+        if created_user is not None:
+            availability_index.add(username, email)
+        return created_user is not None
     except psycopg.errors.UniqueViolation:
         return False
 
 
+@instrument_query
 async def check_user_credentials(username: str, email: str, password: str):
     try:
-        pool = await get_pool()
-        async with pool.connection() as conn:
+        async with get_connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
                             SELECT id, encoded_password, first_name, last_name FROM users 
                             WHERE username = %s
-                            AND email = %s;
+                            AND email = %s
+                            AND deleted_at IS NULL;
                         """,
                     (username, email),
                 )
                 result = await cur.fetchone()
-            if result is None:
-                return False, None
-            id, encoded_password, first_name, last_name = result
-
-            if verify_password(password, encoded_password):
-                return True, {
-                    "id": id,
-                    "first_name": first_name,
-                    "last_name": last_name,
-                }
-            else:
-                return False, None
+        # Verify after the connection is back in the pool: bcrypt may wait
+        # in the hasher's queue and must not hold a connection meanwhile.
+        if result is None:
+            return False, None
+        id, encoded_password, first_name, last_name = result
+
+        if await verify_password(password, encoded_password):
+            if password_hasher.needs_rehash(encoded_password):
+                task = asyncio.create_task(
+                    upgrade_password_hash(id, password, encoded_password)
+                )
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+            return True, {
+                "id": id,
+                "first_name": first_name,
+                "last_name": last_name,
+            }
+        else:
+            return False, None
     except psycopg.errors.UniqueViolation:
         return False, None
 
 
+@instrument_query
 async def delete_user(id: int, user_name: str):
+    # The account and its threads are hidden at once; the purger removes
+    # their rows, images and finally the user row in the background.
     try:
-        pool = await get_pool()
-        async with pool.connection() as conn:
+        async with get_connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
-                        DELETE FROM users 
-                        WHERE id = %s AND username = %s
-                        RETURNING id;
+                        WITH deleted AS (
+                            UPDATE users SET deleted_at = now()
+                            WHERE id = %(id)s AND username = %(user_name)s
+                              AND deleted_at IS NULL
+                            RETURNING id
+                        ), hidden AS (
+                            UPDATE threads SET deleted_at = now()
+                            WHERE user_id IN (SELECT id FROM deleted) AND deleted_at IS NULL
+                        )
+                        SELECT id FROM deleted;
                     """,
-                    (id, user_name),
+                    {"id": id, "user_name": user_name},
                 )
                 deleted = await cur.fetchone()
+        if deleted is not None:
+            purger.notify()
         return deleted is not None
 
     except psycopg.OperationalError as e:
@@ -0,0 +1,296 @@
+import asyncio
+import os
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+from app.db.archive import archiver
+from app.db.checkpointer import checkpointer
+from app.db.connection import get_connection
+from app.utils.availability import availability_index
+from app.utils.context_cache import context_cache
+from app.utils.metrics import PURGED_ROWS, instrument_query
+from app.utils.storage import ImageStorage, image_storage
+
+load_dotenv()
+
+
+class ThreadPurger:
+    """Removes soft-deleted threads and accounts in the background.
+
+    Deleting only sets ``deleted_at``; every read path already skips such
+    rows. This worker then deletes the stored image objects and the rows
+    ``batch_size`` at a time, each batch its own short transaction with a
+    ``pause`` between batches, so a huge thread never holds locks or writes
+    WAL in one burst. An account is removed once none of its threads remain.
+    Work left over by a failure or a restart is picked up on the next run;
+    a thread that fails is put back ``retry_delay`` seconds, doubling per
+    failed attempt up to ``max_retry_delay``, so a few threads that keep
+    failing never hold up the rest of the queue.
+    """
+
+    def __init__(
+        self,
+        storage: ImageStorage,
+        interval: float = 30.0,
+        batch_size: int = 500,
+        pause: float = 0.05,
+        threads_per_run: int = 20,
+        retry_delay: float = 60.0,
+        max_retry_delay: float = 6 * 3600.0,
+    ):
+        self.storage = storage
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self.threads_per_run = threads_per_run
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self.threads_purged = 0
+        self.users_purged = 0
+        self.storage_failures = 0
+        self.deferred = 0
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop(), name="thread-purger")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def notify(self) -> None:
+        """Start a run now instead of at the next interval."""
+        self._wake.set()
+
+    async def _loop(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"⚠️ Purge run failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_once(self) -> None:
+        for thread_id, archive_path in await self._deleted_threads():
+            try:
+                purged = await self.purge_thread(thread_id, archive_path)
+            except Exception as e:
+                purged = False
+                print(f"❌ Failed to purge thread {thread_id}: {e}")
+            if not purged:
+                await self._defer(thread_id)
+        await self.purge_users()
+
+    @instrument_query(name="find_deleted_threads")
+    async def _deleted_threads(self) -> List[Tuple[str, Optional[str]]]:
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                        SELECT thread_id::text, archive_path FROM threads
+                        WHERE deleted_at IS NOT NULL
+                          AND (purge_after IS NULL OR purge_after <= now())
+                        ORDER BY purge_attempts, deleted_at
+                        LIMIT %s;
+                    """,
+                    (self.threads_per_run,),
+                )
+                return await cur.fetchall()
+
+    @instrument_query(name="defer_thread_purge")
+    async def _defer(self, thread_id: str) -> None:
+        async with get_connection() as conn:
+            await conn.execute(
+                """
+                    UPDATE threads
+                    SET purge_attempts = purge_attempts + 1,
+                        purge_after = now() + make_interval(
+                            secs => LEAST(%s, %s * power(2, purge_attempts))
+                        )
+                    WHERE thread_id = %s AND deleted_at IS NOT NULL;
+                """,
+                (self.max_retry_delay, self.retry_delay, thread_id),
+            )
+        self.deferred += 1
+
+    async def _delete_objects(self, url_ids: List[str]) -> bool:
+        """Delete image objects from storage; False if any could not be."""
+        results = await asyncio.gather(
+            *(self.storage.delete(url_id) for url_id in url_ids), return_exceptions=True
+        )
+        failed = [e for e in results if isinstance(e, Exception)]
+        if failed:
+            self.storage_failures += len(failed)
+            print(f"⚠️ Could not delete {len(failed)} stored image(s): {failed[0]}")
+        PURGED_ROWS.labels("image_object").inc(len(url_ids) - len(failed))
+        return not failed
+
+    async def purge_thread(self, thread_id: str, archive_path: Optional[str]) -> bool:
+        """Purge one deleted thread. Returns False if image objects could not
+        be removed; the thread is then retried on a later run so no stored
+        object loses the row that points to it."""
+        if archive_path:
+            if not await self._delete_objects(await archiver.image_ids(archive_path)):
+                return False
+            message_ids = await archiver.message_ids(archive_path)
+            for start in range(0, len(message_ids), self.batch_size):
+                await self._delete_message_rows(message_ids[start : start + self.batch_size])
+                await asyncio.sleep(self.pause)
+            await archiver.remove_archive(archive_path)
+            await self._clear_archive_path(thread_id)
+
+        while True:
+            images = await self._image_batch(thread_id)
+            if not images:
+                break
+            if not await self._delete_objects([url_id for _, url_id in images]):
+                return False
+            await self._delete_images([id for id, _ in images])
+            await asyncio.sleep(self.pause)
+
+        while await self._delete_message_batch(thread_id):
+            await asyncio.sleep(self.pause)
+
+        await checkpointer.adelete_thread(thread_id)
+        if await self._delete_thread(thread_id):
+            self.threads_purged += 1
+            PURGED_ROWS.labels("thread").inc()
+        context_cache.invalidate(thread_id)
+        return True
+
+    @instrument_query(name="purge_clear_archive_path")
+    async def _clear_archive_path(self, thread_id: str) -> None:
+        async with get_connection() as conn:
+            await conn.execute(
+                "UPDATE threads SET archive_path = NULL WHERE thread_id = %s;", (thread_id,)
+            )
+
+    @instrument_query(name="purge_archived_message_rows")
+    async def _delete_message_rows(self, message_ids: List[int]) -> None:
+        """Tool logs and embeddings of archived messages, which no longer
+        have a ``messages`` row for the batch delete to find."""
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "DELETE FROM tool_logs WHERE message_id = ANY(%s);", (message_ids,)
+                )
+                await cur.execute(
+                    "DELETE FROM embedded_messages WHERE message_id = ANY(%s);", (message_ids,)
+                )
+
+    @instrument_query(name="purge_image_batch")
+    async def _image_batch(self, thread_id: str) -> List[Tuple[int, str]]:
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "SELECT id, url_id FROM images WHERE thread_id = %s ORDER BY id LIMIT %s;",
+                    (thread_id, self.batch_size),
+                )
+                return await cur.fetchall()
+
+    @instrument_query(name="purge_images")
+    async def _delete_images(self, ids: List[int]) -> None:
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("DELETE FROM images WHERE id = ANY(%s);", (ids,))
+                PURGED_ROWS.labels("image").inc(cur.rowcount)
+
+    @instrument_query(name="purge_messages")
+    async def _delete_message_batch(self, thread_id: str) -> int:
+        """Delete up to ``batch_size`` messages with their tool logs and
+        embeddings; returns the number of messages deleted."""
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                        WITH batch AS (
+                            SELECT id FROM messages WHERE thread_id = %(thread_id)s
+                            LIMIT %(limit)s
+                        ), logs AS (
+                            DELETE FROM tool_logs WHERE message_id IN (SELECT id FROM batch)
+                        ), embeddings AS (
+                            DELETE FROM embedded_messages WHERE message_id IN (SELECT id FROM batch)
+                        )
+                        DELETE FROM messages
+                        WHERE thread_id = %(thread_id)s AND id IN (SELECT id FROM batch);
+                    """,
+                    {"thread_id": thread_id, "limit": self.batch_size},
+                )
+                deleted = cur.rowcount
+        PURGED_ROWS.labels("message").inc(deleted)
+        return deleted
+
+    @instrument_query(name="purge_thread")
+    async def _delete_thread(self, thread_id: str) -> bool:
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                # Whatever is left (summaries, rows written by a generation
+                # that was still finishing) goes with the cascade.
+                await cur.execute(
+                    "DELETE FROM threads WHERE thread_id = %s AND deleted_at IS NOT NULL;",
+                    (thread_id,),
+                )
+                return cur.rowcount > 0
+
+    @instrument_query(name="purge_users")
+    async def purge_users(self) -> int:
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                # Threads a deleted account created after it was marked (an
+                # open session) are hidden too, so the account can drain.
+                await cur.execute(
+                    """
+                        UPDATE threads SET deleted_at = now()
+                        WHERE deleted_at IS NULL
+                          AND user_id IN (SELECT id FROM users WHERE deleted_at IS NOT NULL);
+                    """
+                )
+                await cur.execute(
+                    """
+                        DELETE FROM users
+                        WHERE id IN (
+                            SELECT u.id FROM users u
+                            WHERE u.deleted_at IS NOT NULL
+                              AND NOT EXISTS (SELECT 1 FROM threads t WHERE t.user_id = u.id)
+                            LIMIT %s
+                        )
+                        RETURNING username, email;
+                    """,
+                    (self.threads_per_run,),
+                )
+                deleted = await cur.fetchall()
+        for username, email in deleted:
+            availability_index.remove(username, email)
+        self.users_purged += len(deleted)
+        PURGED_ROWS.labels("user").inc(len(deleted))
+        return len(deleted)
+
+    def stats(self) -> dict:
+        return {
+            "threads_purged": self.threads_purged,
+            "users_purged": self.users_purged,
+            "storage_failures": self.storage_failures,
+            "deferred": self.deferred,
+        }
+
+
+purger = ThreadPurger(
+    image_storage,
+    interval=float(os.getenv("PURGE_INTERVAL_SECONDS", "30")),
+    batch_size=int(os.getenv("PURGE_BATCH_SIZE", "500")),
+    pause=float(os.getenv("PURGE_BATCH_PAUSE_SECONDS", "0.05")),
+    threads_per_run=int(os.getenv("PURGE_THREADS_PER_RUN", "20")),
+    retry_delay=float(os.getenv("PURGE_RETRY_DELAY_SECONDS", "60")),
+    max_retry_delay=float(os.getenv("PURGE_MAX_RETRY_DELAY_SECONDS", "21600")),
+)
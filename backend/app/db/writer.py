@@ -0,0 +1,275 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import psycopg
+from psycopg import errors
+from dotenv import load_dotenv
+from app.db.connection import get_connection
+from app.utils.llm_models.threadfuns import thread_preview
+from app.utils.llm_models.toolfuns import ToolLog, rollup_tool_logs
+from app.utils.metrics import instrument_query
+
+load_dotenv()
+
+TRANSIENT_ERRORS = (
+    psycopg.OperationalError,
+    errors.SerializationFailure,
+    errors.DeadlockDetected,
+)
+
+
+@dataclass
+class AssistantTurn:
+    thread_id: str
+    parent_id: int
+    content: str
+    created_at: str
+    image_url_id: Optional[str] = None
+    image_description: str = ""
+    tool_logs: List[ToolLog] = field(default_factory=list)
+    # Resolves to the new assistant message id once the batch is committed
+    # (None for a turn that only carries tool logs).
+    future: Optional[asyncio.Future] = None
+
+    @property
+    def has_message(self) -> bool:
+        """False for a turn that produced no text or image: only its tool
+        logs are stored, against the user message that started it."""
+        return bool(self.content or self.image_url_id)
+
+
+class PersistenceWriter:
+    """Write-behind stage for finished assistant turns.
+
+    Turns are queued and a single background task drains them in batches of
+    up to ``batch_size``, waiting at most ``max_latency`` seconds for a batch
+    to fill. Each batch is one transaction sent as a pipelined executemany.
+    Transient errors are retried with backoff, a failing batch is retried row
+    by row so one bad turn can't sink the others, and ``stop()`` flushes
+    everything still queued.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        max_latency: float = 0.05,
+        max_retries: int = 5,
+        max_queue: int = 10_000,
+    ):
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.max_retries = max_retries
+        self._queue: asyncio.Queue[Optional[AssistantTurn]] = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self.batches_written = 0
+        self.turns_written = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="persistence-writer")
+
+    async def stop(self) -> None:
+        """Flush every queued turn and stop the writer task"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, turn: AssistantTurn) -> asyncio.Future:
+        """Queue a finished turn. Await the returned future for its message id."""
+        turn.future = asyncio.get_running_loop().create_future()
+        if self._task is None or self._task.done():
+            await self.start()
+        await self._queue.put(turn)
+        return turn.future
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    turn = (
+                        self._queue.get_nowait()
+                        if remaining <= 0
+                        else await asyncio.wait_for(self._queue.get(), remaining)
+                    )
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if turn is None:
+                    stopping = True
+                    break
+                batch.append(turn)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[AssistantTurn]) -> None:
+        try:
+            ids = await self._write_with_retry(batch)
+        except Exception as e:
+            if len(batch) > 1:
+                print(f"⚠️ Batch of {len(batch)} turns failed ({e}); retrying one by one")
+                for turn in batch:
+                    await self._flush([turn])
+                return
+            self.failures += 1
+            print(f"❌ Failed to persist turn for thread {batch[0].thread_id}: {e}")
+            if batch[0].future and not batch[0].future.done():
+                batch[0].future.set_exception(e)
+            return
+
+        self.batches_written += 1
+        self.turns_written += len(batch)
+        for turn, message_id in zip(batch, ids):
+            if turn.future and not turn.future.done():
+                turn.future.set_result(message_id)
+
+    async def _write_with_retry(self, batch: List[AssistantTurn]) -> List[Optional[int]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._write(batch)
+            except TRANSIENT_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                delay = min(0.1 * 2**attempt, 5.0)
+                print(f"⚠️ Transient DB error while persisting turns ({e}); retry in {delay}s")
+                await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    @instrument_query(name="persist_turns")
+    async def _write(self, batch: List[AssistantTurn]) -> List[Optional[int]]:
+        messages = [t for t in batch if t.has_message]
+        async with get_connection() as conn:
+            async with conn.cursor() as cur:
+                inserted = []
+                if messages:
+                    await cur.executemany(
+                        """
+                            INSERT INTO messages (thread_id, parent_id, role, content, created_at)
+                            VALUES (%s, %s, 'assistant', %s, %s) RETURNING id;
+                        """,
+                        [(t.thread_id, t.parent_id, t.content, t.created_at) for t in messages],
+                        returning=True,
+                    )
+                    while True:
+                        inserted.append((await cur.fetchone())[0])
+                        if not cur.nextset():
+                            break
+                new_ids = iter(inserted)
+                ids = [next(new_ids) if t.has_message else None for t in batch]
+
+                # Listing columns move with the inserts. One row per thread,
+                # sorted so concurrent writers lock threads in the same order.
+                activity: Dict[str, list] = {}
+                for t in messages:
+                    entry = activity.setdefault(t.thread_id, [0, None, None])
+                    entry[0] += 1
+                    entry[1] = t.created_at
+                    entry[2] = thread_preview(t.content) or entry[2]
+                if activity:
+                    await cur.executemany(
+                        """
+                            UPDATE threads
+                            SET message_count = message_count + %s,
+                                last_message_at = GREATEST(last_message_at, %s::timestamptz),
+                                preview = COALESCE(%s, preview)
+                            WHERE thread_id = %s;
+                        """,
+                        [
+                            (count, last_at, preview, thread_id)
+                            for thread_id, (count, last_at, preview) in sorted(activity.items())
+                        ],
+                    )
+
+                images = [
+                    (t.thread_id, message_id, t.image_url_id, t.image_description, t.created_at)
+                    for t, message_id in zip(batch, ids)
+                    if t.image_url_id
+                ]
+                if images:
+                    await cur.executemany(
+                        """
+                            INSERT INTO images (
+                                thread_id, parent_id, url_id, role, description, created_at
+                            )
+                            VALUES (%s, %s, %s, 'assistant', %s, %s);
+                        """,
+                        images,
+                    )
+
+                tool_logs = [
+                    (
+                        message_id if message_id is not None else t.parent_id,
+                        tool_name,
+                        tool_input,
+                        tool_output,
+                        latency_ms,
+                        success,
+                        len(tool_output.encode("utf-8")) if tool_output is not None else None,
+                    )
+                    for t, message_id in zip(batch, ids)
+                    for tool_name, tool_input, tool_output, latency_ms, success in t.tool_logs
+                ]
+                if tool_logs:
+                    await cur.executemany(
+                        """
+                            INSERT INTO tool_logs (
+                                message_id, tool_name, input, output, latency_ms, success, output_bytes
+                            )
+                            VALUES (%s, %s, %s, %s, %s, %s, %s);
+                        """,
+                        tool_logs,
+                    )
+                    # Keep the hourly rollups current in the same transaction
+                    # so usage queries never scan tool_logs.
+                    hour = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+                    rollups = rollup_tool_logs((log for t in batch for log in t.tool_logs), hour)
+                    if rollups:
+                        await cur.executemany(
+                            """
+                                INSERT INTO tool_usage_hourly (
+                                    tool_name, hour, calls, failures, total_ms, latency_buckets
+                                )
+                                VALUES (%s, %s, %s, %s, %s, %s)
+                                ON CONFLICT (tool_name, hour) DO UPDATE
+                                SET calls = tool_usage_hourly.calls + EXCLUDED.calls,
+                                    failures = tool_usage_hourly.failures + EXCLUDED.failures,
+                                    total_ms = tool_usage_hourly.total_ms + EXCLUDED.total_ms,
+                                    latency_buckets = ARRAY(
+                                        SELECT a + b
+                                        FROM unnest(
+                                            tool_usage_hourly.latency_buckets,
+                                            EXCLUDED.latency_buckets
+                                        ) WITH ORDINALITY AS u(a, b, i)
+                                        ORDER BY i
+                                    );
+                            """,
+                            rollups,
+                        )
+        return ids
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "batches_written": self.batches_written,
+            "turns_written": self.turns_written,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
+
+
+persistence_writer = PersistenceWriter(
+    batch_size=int(os.getenv("PERSIST_BATCH_SIZE", "100")),
+    max_latency=float(os.getenv("PERSIST_MAX_LATENCY_MS", "50")) / 1000,
+)
@@ -10,6 +10,7 @@ from app.db.models.user import (
     create_user,
     delete_user,
 )
+from app.utils.password_hasher import HasherOverloaded
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -101,6 +102,12 @@ async def create_new_user(req: CreateUser) -> Response:
         success = await create_user(
             req.username, req.email, req.password, req.first_name, req.last_name
         )
+    except HasherOverloaded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"},
+        )
     except DatabaseError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -148,6 +155,12 @@ async def check_credentials(req: CheckCredentials) -> ResponseWithUserData:
         success, user_data = await check_user_credentials(
             req.username, req.email, req.password
         )
+    except HasherOverloaded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"},
+        )
     except DatabaseError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
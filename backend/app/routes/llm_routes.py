@@ -1,8 +1,10 @@
+import asyncio
 from datetime import datetime, timezone
 import json
+import time
 import traceback
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, Query, status
 from fastapi.responses import StreamingResponse
 from psycopg import DatabaseError
 from app.utils.workflow import workflow
@@ -14,10 +16,29 @@ from app.utils.llm_models.funs import (
     create_thread_new,
     delete_conversation,
     get_conversations_from_table,
+    get_response_cache_setting,
     insert_user_conversation,
+    set_response_cache_setting,
+)
+from app.utils.llm_models.memoryfuns import get_thread_user
+from app.utils.llm_models.threadfuns import get_threads
+from app.utils.llm_models.toolfuns import get_tool_usage
+from app.db.checkpointer import checkpointer
+from app.db.writer import AssistantTurn, persistence_writer
+from app.utils.context_cache import context_cache
+from app.utils.admission import AdmissionRejected, AdmissionSlot, admission, check_user_rate
+from app.utils.response_cache import response_cache
+from app.utils.summarizer import summarizer
+from app.utils.titler import titler
+from app.utils.memory import memory
+from app.utils.sse import SSE_HEADERS, EventStream, parse_event_id, stream_registry
+from app.utils.metrics import (
+    STREAM_CANCELLED,
+    STREAM_DURATION,
+    STREAM_ERRORS,
+    STREAM_TOKENS_PER_SECOND,
+    STREAM_TTFT,
 )
-from app.utils.llm_models.threadfuns import get_thread_ids
-from app.db.connection import get_pool
 
 router = APIRouter(prefix="/llm", tags=["LLM"])
 
@@ -45,6 +66,10 @@ class ConversationId(ThreadId):
     created_at: Optional[datetime] = None
 
 
+class ResponseCacheSetting(ThreadId):
+    enabled: bool
+
+
 class NewThread(BaseModel):
     user_id: int
     init_msg: str
@@ -57,11 +82,21 @@ class ThreadCreatedResponse(Response):
 
 class GetThreadIds(BaseModel):
     user_id: int
-    row_index: Optional[int] = None
+    cursor: Optional[str] = None
+
+
+class ThreadSummary(BaseModel):
+    thread_id: str
+    title: Optional[str] = None
+    preview: Optional[str] = None
+    message_count: int
+    last_message_at: datetime
 
 
 class ResponseThreadIds(Response):
     thread_ids: List[str]
+    threads: List[ThreadSummary] = []
+    next_cursor: Optional[str] = None
 
 
 class MessageItem(BaseModel):
@@ -86,57 +121,205 @@ class ResponseConversation(BaseModel):
 # ------------------------------------------------------
 
 
+def claim_generation(thread_id: str) -> None:
+    """Reserve the thread before the first await so two requests cannot both
+    start a job for it. Every route that claims releases in ``finally``;
+    once the stream exists the release is a no-op."""
+    if not stream_registry.claim(thread_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A response is already being generated for this thread",
+        )
+
+
+async def admit_generation(thread_id: str) -> AdmissionSlot:
+    """Charge the thread owner's rate limit and wait for a global generation
+    slot, answering 429 with Retry-After when either says no."""
+    try:
+        user_id = await get_thread_user(thread_id)
+    except Exception as e:
+        print(f"⚠️ Could not resolve owner of {thread_id} for rate limiting: {e}")
+        user_id = None
+    try:
+        check_user_rate(user_id)
+        return await admission.acquire()
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": e.retry_after_header},
+        )
+
+
+async def drop_checkpoint(thread_id: str) -> None:
+    """Forget the graph state of a turn that did not finish.
+
+    It may have stopped between a tool call and its result, which the next
+    turn would fail on. Without a checkpoint the next turn re-bootstraps from
+    the saved messages, which include whatever part of the reply is persisted
+    after this. The stream is still live, so no new turn starts in between.
+    """
+    try:
+        await asyncio.shield(checkpointer.adelete_thread(thread_id))
+    except Exception as e:
+        print(f"⚠️ Could not drop checkpoint of unfinished turn {thread_id}: {e}")
+
+
+async def use_response_cache(thread_id: str) -> bool:
+    if not response_cache.enabled:
+        return False
+    try:
+        return await get_response_cache_setting(thread_id)
+    except Exception as e:
+        print(f"⚠️ Could not read response cache setting for {thread_id}: {e}")
+        return False
+
+
 @router.post("/llm-initial-response")
-def llm_initial_response(req: LLMRequestInitial):
+async def llm_initial_response(req: LLMRequestInitial):
     print("📄📄📄📄")
-    return StreamingResponse(
-        message_generator(
+    claim_generation(req.thread_id)
+    try:
+        slot = await admit_generation(req.thread_id)
+        try:
+            use_cache = await use_response_cache(req.thread_id)
+        except BaseException:
+            slot.release()
+            raise
+        return stream_turn(
             {
-                "messages": {"role": "user", "content": req.user_input},
+                "messages": {"id": req.parent_id, "role": "user", "content": req.user_input},
             },
             req.thread_id,
             req.parent_id,
-        ),
-        media_type="text/event-stream",
-    )
+            slot,
+            use_cache=use_cache,
+        )
+    finally:
+        stream_registry.release(req.thread_id)
 
 
 @router.post("/continue-llm-response")
 async def continue_llm_response(req: LLMRequest):
+    claim_generation(req.thread_id)
+    try:
+        return await _continue_turn(req)
+    finally:
+        stream_registry.release(req.thread_id)
+
+
+async def _continue_turn(req: LLMRequest):
+    slot = await admit_generation(req.thread_id)
     try:
-        conversationData = await get_conversations_from_table(req.thread_id)
-        conversationList = conversationData["messages"]
+        # The checkpointed graph state already holds the conversation; only
+        # threads without a checkpoint yet are bootstrapped from history.
+        history = []
+        if not await checkpointer.has_checkpoint(req.thread_id):
+            history = context_cache.get(req.thread_id)
+            if history is None:
+                conversationData = await get_conversations_from_table(req.thread_id)
+                history = conversationData["messages"]
+                context_cache.put(req.thread_id, history)
 
-        conversationList.append(
+        parent_id = await insert_user_conversation(
+            thread_id=req.thread_id, message=req.user_input
+        )
+        if not parent_id:
+            # The insert skips deleted threads.
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Thread not found",
+            )
+        memory.submit(parent_id, req.thread_id, req.user_input)
+        conversationList = history + [
             {
+                "id": parent_id,
                 "created_at": datetime.now(timezone.utc).isoformat(),
                 "images": [],
                 "role": "user",
                 "content": req.user_input,
             }
+        ]
+        print("⚠️⚠️⚠️⚠️⚠️⚠️", {"messages": conversationList})
+        summary = await summarizer.get(req.thread_id)
+        return stream_turn(
+            {
+                "messages": conversationList,
+                "summary": summary or "",
+            },
+            req.thread_id,
+            parent_id=parent_id,
+            slot=slot,
+            use_cache=await use_response_cache(req.thread_id),
         )
-        parent_id = await insert_user_conversation(
-            thread_id=req.thread_id, message=req.user_input
+    except HTTPException:
+        slot.release()
+        raise
+    except Exception as e:
+        slot.release()
+        traceback.print_exc()
+        print(f"/continue-llm-response error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to continue the conversation",
         )
-        print("⚠️⚠️⚠️⚠️⚠️⚠️", {"messages": conversationList})
-        if not parent_id:
-            traceback.print_exc()
+    except BaseException:
+        # Client disconnected while we were still preparing the turn.
+        slot.release()
+        raise
+
+
+@router.get("/stream/{stream_id}")
+async def resume_stream(
+    stream_id: str,
+    last_event_id: Optional[str] = Header(default=None),
+    after: Optional[int] = None,
+):
+    """Resume a streamed turn after the event named by the Last-Event-ID
+    header (or the ``after`` sequence number) from the replay buffer."""
+    if last_event_id:
+        try:
+            event_stream_id, after = parse_event_id(last_event_id)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if event_stream_id != stream_id:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to get parent_id",
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Last-Event-ID belongs to another stream",
             )
-        return StreamingResponse(
-            message_generator(
-                {
-                    "messages": conversationList,
-                },
-                req.thread_id,
-                parent_id=parent_id,
-            ),
-            media_type="text/event-stream",
+    stream = stream_registry.get(stream_id)
+    if stream is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Stream not found or expired"
         )
-    except Exception as e:
-        print(f"/continue-llm-response error: {e}")
+    stream_registry.resumed += 1
+    return StreamingResponse(
+        stream.subscribe(after or 0), media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
+@router.get("/thread-stream/{thread_id}")
+async def attach_thread_stream(thread_id: str, after: int = 0):
+    """Attach to the generation currently running for a thread, e.g. from a
+    second tab or after a reload, replaying its events from the start."""
+    stream = stream_registry.live_for_thread(thread_id)
+    if stream is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="No response is being generated"
+        )
+    stream_registry.attached += 1
+    return StreamingResponse(
+        stream.subscribe(after), media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
+@router.post("/cancel-response")
+async def cancel_response(req: ThreadId) -> Response:
+    """Stop the running generation of a thread. Whatever was produced so far
+    is saved and every subscriber receives the final events."""
+    if stream_registry.cancel_thread(req.thread_id, "client"):
+        return Response(success=True, message="Generation cancelled.")
+    return Response(success=False, message="No response is being generated.")
 
 
 @router.post("/new-thread")
@@ -152,6 +335,7 @@ async def create_new_thread(req: NewThread) -> ThreadCreatedResponse:
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to create thread")
+    memory.submit(parent_id, thread_id, req.init_msg)
     print(
         "🙏🏻",
         ThreadCreatedResponse(
@@ -177,26 +361,34 @@ async def create_new_thread(req: NewThread) -> ThreadCreatedResponse:
 
 
 @router.post("/get-thread-ids")
-async def get_thread_ids_with_rowindex(req: GetThreadIds) -> ResponseThreadIds:
+async def get_thread_ids_with_cursor(req: GetThreadIds) -> ResponseThreadIds:
     try:
-        print("/get-thread-ids", {"user_id": req.user_id, "row_index": req.row_index})
-        thread_ids = await get_thread_ids(req.user_id, req.row_index)
+        print("/get-thread-ids", {"user_id": req.user_id, "cursor": req.cursor})
+        threads, next_cursor = await get_threads(req.user_id, req.cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except DatabaseError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Database error occurred. {e}",
         )
     except Exception as e:
-        print(f"Error in get_thread_ids_with_rowindex: {str(e)}")
+        print(f"Error in get_thread_ids_with_cursor: {str(e)}")
         traceback.print_exc()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to get thread ids",
         )
+    for thread in threads:
+        # Threads from before titling, or whose title call failed.
+        if thread["title"] is None and thread["message_count"] > 1:
+            titler.schedule(thread["thread_id"])
     return ResponseThreadIds(
         success=True,
         message="Thread ids successfully fetched.",
-        thread_ids=thread_ids,
+        thread_ids=[thread["thread_id"] for thread in threads],
+        threads=threads,
+        next_cursor=next_cursor,
     )
 
 
@@ -220,10 +412,40 @@ async def get_conversations(req: ConversationId) -> dict:
         )
 
 
+@router.post("/response-cache")
+async def update_response_cache_setting(req: ResponseCacheSetting) -> Response:
+    try:
+        updated = await set_response_cache_setting(req.thread_id, req.enabled)
+    except DatabaseError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error occurred. {e}",
+        )
+    if updated:
+        state = "enabled" if req.enabled else "disabled"
+        return Response(success=True, message=f"Response cache {state} for thread.")
+    return Response(success=False, message="Thread not found.")
+
+
+@router.get("/tool-usage")
+async def tool_usage(hours: int = Query(default=24, ge=1, le=24 * 90)) -> dict:
+    """Calls, failures and p50/p95 latency per tool over the last ``hours``."""
+    try:
+        tools = await get_tool_usage(hours)
+    except DatabaseError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error occurred. {e}",
+        )
+    return {"hours": hours, "tools": tools}
+
+
 @router.post("/delete-conversation")
 async def delete_conversation_history(req: ThreadId) -> Response:
     try:
         success = await delete_conversation(req.thread_id)
+        if success:
+            stream_registry.cancel_thread(req.thread_id, "deleted")
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(
@@ -238,17 +460,58 @@ async def delete_conversation_history(req: ThreadId) -> Response:
 # ----------------------------
 
 
-async def message_generator(initial_message, thread_id: str, parent_id: int):
+def record_stream_metrics(started: float, first_token_at: float | None, token_chunks: int):
+    finished = time.perf_counter()
+    STREAM_DURATION.observe(finished - started)
+    if first_token_at is not None and token_chunks > 1 and finished > first_token_at:
+        STREAM_TOKENS_PER_SECOND.observe(token_chunks / (finished - first_token_at))
+
+
+def stream_turn(
+    initial_message,
+    thread_id: str,
+    parent_id: int,
+    slot: AdmissionSlot,
+    use_cache: bool = False,
+) -> StreamingResponse:
+    """Run the turn as a background job and stream its SSE events. The job
+    keeps running if the client drops, which can resume from the replay
+    buffer with GET /llm/stream/{stream_id}; other clients attach with
+    GET /llm/thread-stream/{thread_id}. It is cancelled when nobody has been
+    subscribed for the registry's grace period."""
+    stream = stream_registry.create(thread_id)
+    stream.task = asyncio.create_task(
+        message_generator(stream, initial_message, thread_id, parent_id, use_cache)
+    )
+    # The admission slot is held for the whole job, not the HTTP response.
+    stream.task.add_done_callback(lambda _: slot.release())
+    return StreamingResponse(
+        stream.subscribe(), media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
+async def message_generator(
+    stream: EventStream,
+    initial_message,
+    thread_id: str,
+    parent_id: int,
+    use_cache: bool = False,
+):
     print("🎏🎏🎏")
     llm_message = ""
-    tool_logs = []  # [(tool_name, tool_input, tool_output, tool_call_id)]
+    # [tool_name, tool_input, tool_output, tool_call_id, latency_ms, success]
+    tool_logs = []
     message_to_insert = ""
     image_url_id = None
     image_description = ""
     curr_datetime = datetime.now(timezone.utc).isoformat()
+    started = time.perf_counter()
+    first_token_at = None
+    token_chunks = 0
     try:
         async for message_chunk, metadata in workflow.astream(
             initial_message,
+            config={"configurable": {"thread_id": thread_id, "response_cache": use_cache}},
             stream_mode="messages",
         ):
             if message_chunk.type == "AIMessageChunk" and getattr(
@@ -259,33 +522,32 @@ async def message_generator(initial_message, thread_id: str, parent_id: int):
                     tool_input = tool_call.get("args", {})
                     tool_call_id = tool_call.get("id", "")
                     tool_logs.append(
-                        [tool_name, json.dumps(tool_input), None, tool_call_id]
+                        [tool_name, json.dumps(tool_input), None, tool_call_id, None, None]
                     )
 
                     # Show tool usage to user
                     if tool_name!="brave_search":
                         message_to_insert += f"🛠️ Using {tool_name}...\n\n"
-                        yield message_to_insert.encode("utf-8")
+                        stream.publish("tool_start", {"tool": tool_name})
 
             elif message_chunk.type == "tool":
                 tool_name = message_chunk.name
                 tool_output = message_chunk.content
 
                 # Update tool logs with output
-                # for log in tool_logs:
-                #     if log[0] == tool_name and log[2] is None:
-                #         log[2] = tool_output
-                #         break
+                for log in tool_logs:
+                    if log[3] == message_chunk.tool_call_id and log[2] is None:
+                        log[2] = tool_output
+                        log[4] = message_chunk.response_metadata.get("latency_ms")
+                        log[5] = getattr(message_chunk, "status", "success") == "success"
+                        if tool_name == "generate_image":
+                            image_description = json.loads(log[1]).get("prompt", "")
+                        break
 
                 # Handle image generation results
                 if tool_name == "generate_image" and tool_output:
-                    for log in tool_logs:
-                        if log[0] == "generate_image" and log[2] is None:
-                            log[2] = tool_output
-                            image_description = json.loads(log[1]).get("prompt", "")
-                            break
                     if tool_output.startswith("❌"):
-                        yield f"{tool_output}\n\n".encode("utf-8")
+                        stream.publish("error", {"message": tool_output})
                         image_url_id = None  # no valid image
                     else:
                         try:
@@ -294,19 +556,25 @@ async def message_generator(initial_message, thread_id: str, parent_id: int):
                             print(f"❌ Unexpected tool output: {tool_output}")
                             image_url_id = None
 
-                        if image_url_id and isinstance(image_url_id, dict):
+                        if isinstance(image_url_id, dict) and "secure_url" in image_url_id:
                             print(
                                 f"------------🥹 Image generated: {image_url_id}, prompt: {image_description}"
                             )
-                            # initial_message["messages"][-1]["images"].append(
-                            #     {
-                            #         "role": "assistant",
-                            #         "url_id": image_url_id.get("public_id"),
-                            #         "description": image_description,
-                            #         "created_at": curr_datetime,
-                            #     }
-                            # )
-                            yield f"{image_url_id['secure_url']}\n\n".encode("utf-8")
+                            stream.publish(
+                                "image",
+                                {
+                                    "url": image_url_id["secure_url"],
+                                    "public_id": image_url_id.get("public_id"),
+                                    "description": image_description,
+                                },
+                            )
+                        elif isinstance(image_url_id, dict) and "error" in image_url_id:
+                            # Timeouts and budget refusals from the tools node.
+                            stream.publish(
+                                "error",
+                                {"message": f"❌ Image generation failed: {image_url_id['error']}"},
+                            )
+                            image_url_id = None
                         else:
                             print("⚠️ No valid image_url_id found after JSON decode")
                             image_url_id = None
@@ -314,78 +582,87 @@ async def message_generator(initial_message, thread_id: str, parent_id: int):
             elif message_chunk.type == "AIMessageChunk":
                 message = message_chunk.content
                 if message:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        STREAM_TTFT.observe(first_token_at - started)
+                    token_chunks += 1
                     llm_message += message
-                    yield message.encode("utf-8")
-
+                    stream.token(message)
+
+    except asyncio.CancelledError:
+        # Cancelling the task closes the upstream LLM request; keep what was
+        # generated so far and tell subscribers why it stopped.
+        reason = stream.cancel_reason or "shutdown"
+        STREAM_CANCELLED.labels(reason).inc()
+        stream_registry.record_cancel(reason)
+        print(f"🛑 Generation for {thread_id} cancelled ({reason})")
+        stream.publish("cancelled", {"reason": reason})
+        await drop_checkpoint(thread_id)
     except Exception as e:
+        STREAM_ERRORS.labels(type(e).__name__).inc()
         traceback.print_exc()
-        yield f"Error: {str(e)}".encode("utf-8")
-
-    # --- Save into DB ---
+        stream.publish("error", {"message": str(e)})
+        await drop_checkpoint(thread_id)
+    finally:
+        record_stream_metrics(started, first_token_at, token_chunks)
+
+    # --- Save into DB (write-behind, batched with other turns) ---
+    message_id = None
+    message_to_insert = (message_to_insert + llm_message).strip()
+    has_image = isinstance(image_url_id, dict) and image_url_id.get("public_id")
+    turn = AssistantTurn(
+        thread_id=thread_id,
+        parent_id=parent_id,
+        content=message_to_insert,
+        created_at=curr_datetime,
+        image_url_id=image_url_id["public_id"] if has_image else None,
+        image_description=image_description,
+        tool_logs=[
+            (name, args, output, latency_ms, success)
+            for name, args, output, _, latency_ms, success in tool_logs
+        ],
+    )
+    if not turn.has_message:
+        # No reply to store, but the tool calls of a turn that failed are
+        # exactly what the tool analytics are for.
+        if turn.tool_logs:
+            try:
+                await asyncio.shield(await persistence_writer.submit(turn))
+            except Exception as e:
+                print(f"⚠️ Could not save tool logs of {thread_id}: {e}")
+        stream.publish("done", {"message_id": None})
+        stream.close()
+        return
     try:
-        pool = await get_pool()
-        message_to_insert += llm_message
-        async with pool.connection() as conn:
-            async with conn.cursor() as cur:
-                if message_to_insert.strip():
-                    await cur.execute(
-                        """
-                            INSERT INTO messages (thread_id, parent_id, role, content) 
-                            VALUES (%s, %s, 'assistant', %s) returning id;
-                            """,
-                        (thread_id, parent_id, message_to_insert.strip()),
-                    )
-                    curr_parent_id = (await cur.fetchone())[0]
-                if isinstance(image_url_id, dict) and image_url_id.get("public_id"):
-                    await cur.execute(
-                        """
-                            INSERT INTO images (
-                                thread_id ,parent_id, url_id, role, description, created_at
-                            )
-                            VALUES (%s, %s, %s, %s, %s, %s);
-                            """,
-                        (
-                            thread_id,
-                            curr_parent_id,
-                            image_url_id["public_id"],
-                            "assistant",
-                            image_description,
-                            curr_datetime,
-                        ),
-                    )
-
-                # for tool_name, tool_input, tool_output in tool_logs:
-                #     if tool_output:
-                #         await cur.execute(
-                #             """
-                #                 INSERT INTO tool_logs (message_id, tool_name, input, output)
-                #                 VALUES (%s, %s, %s, %s);
-                #                 """,
-                #             (parent_id, tool_name, tool_input, tool_output),
-                #         )
-
-                # await cur.execute(
-                #     """
-                #         SELECT content FROM messages WHERE id=%s;
-                #     """,
-                #     (parent_id,),
-                # )
-                # row = await cur.fetchone()
-                # user_message = row[0]
-                # print({user_message: user_message, llm_message: llm_message})
-                # embedding = await emb.aembed_query(
-                #     f"user: {user_message}, assistant: {llm_message}"
-                # )
-                # print("🔍 Embedding type:", type(embedding))
-                # await cur.execute(
-                #     """
-                #         INSERT INTO embedded_messages (message_id, embedding)
-                #         VALUES (%s, %s);
-                #     """,
-                #     (parent_id, embedding),
-                # )
-                await conn.commit()
-                # print("✅ Successfully inserted into database")
+        pending = await persistence_writer.submit(turn)
+        # Shielded: a cancel arriving now must not lose the queued write.
+        message_id = await asyncio.shield(pending)
+        cached_images = []
+        if has_image:
+            cached_images.append(
+                {
+                    "role": "assistant",
+                    "url_id": image_url_id["public_id"],
+                    "description": image_description,
+                    "created_at": curr_datetime,
+                }
+            )
+        context_cache.append(
+            thread_id,
+            {
+                "id": message_id,
+                "role": "assistant",
+                "content": message_to_insert,
+                "created_at": curr_datetime,
+                "images": cached_images,
+            },
+        )
+        summarizer.schedule(thread_id)
+        titler.schedule(thread_id)
+        memory.submit(message_id, thread_id, message_to_insert)
     except Exception as e:
         traceback.print_exc()
         print("DB insert error:", e)
+    finally:
+        stream.publish("done", {"message_id": message_id})
+        stream.close()
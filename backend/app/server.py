@@ -1,26 +1,63 @@
+import asyncio
 from contextlib import asynccontextmanager
 import io
 from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
-from psycopg_pool import AsyncConnectionPool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from app.routes import auth_routes, llm_routes
 from app.db.init_db import initialize_database
-from app.db.connection import set_pool
-from app.db.database import get_db_url
+from app.db.connection import pool_manager
+from app.db.writer import persistence_writer
+from app.db.checkpointer import checkpointer
+from app.db.archive import archiver
+from app.db.purge import purger
+from app.db.models.user import load_availability_index
+from app.utils.availability import availability_index
 from app.utils.workflow import workflow
+from app.utils.search import search_service
+from app.utils.context_cache import context_cache
+from app.utils.response_cache import response_cache
+from app.utils.summarizer import summarizer
+from app.utils.titler import titler
+from app.utils.memory import memory
+from app.utils.sse import stream_registry
+from app.utils.admission import admission
+from app.utils import llm as llm_module
+from app.utils.llm_router import LLMRouter
+from app.utils.http_client import close_http_session
+from app.utils.password_hasher import password_hasher
+from app.utils.metrics import Gauge, registry
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with AsyncConnectionPool(get_db_url()) as pool:
-        set_pool(pool)
-        print("connection.pool:", pool)
-        try:
-            await initialize_database()
-            yield  
-        finally:
-            await pool.close()
-            print("🧹 Connection pool closed cleanly.")
+    pool = await pool_manager.open()
+    print("connection.pool:", pool)
+    availability_loader = None
+    try:
+        await initialize_database()
+        await persistence_writer.start()
+        await memory.start()
+        await checkpointer.start()
+        await archiver.start()
+        await purger.start()
+        availability_loader = asyncio.create_task(load_availability_index())
+        yield  
+    finally:
+        if availability_loader:
+            availability_loader.cancel()
+        # Running generations save their partial output before the writer stops.
+        await stream_registry.stop()
+        await archiver.stop()
+        await purger.stop()
+        await checkpointer.stop()
+        await summarizer.stop()
+        await titler.stop()
+        await memory.stop()
+        await persistence_writer.stop()
+        await close_http_session()
+        password_hasher.shutdown()
+        await pool_manager.close()
+        print("🧹 Connection pool closed cleanly.")
 
 
 app = FastAPI(lifespan=lifespan)
@@ -36,4 +73,95 @@ def root():
 @app.get("/check-workflow")
 def run_workflow():
     png_bytes = workflow.get_graph().draw_mermaid_png()
-    return StreamingResponse(io.BytesIO(png_bytes), media_type="image/png")
\ No newline at end of file
+    return StreamingResponse(io.BytesIO(png_bytes), media_type="image/png")
+
+@app.get("/cache-stats")
+def cache_stats():
+    return {
+        "search": search_service.stats(),
+        "context": context_cache.stats(),
+        "response": response_cache.stats(),
+        "summaries": summarizer.stats(),
+        "titles": titler.stats(),
+        "memory": memory.stats(),
+        "checkpoints": checkpointer.stats(),
+        "persistence": persistence_writer.stats(),
+        "archive": archiver.stats(),
+        "purge": purger.stats(),
+        "availability": availability_index.stats(),
+    }
+
+
+@app.get("/stream-stats")
+def stream_stats():
+    return stream_registry.stats()
+
+
+@app.get("/admission-stats")
+def admission_stats():
+    return admission.stats()
+
+
+@app.get("/llm-stats")
+def llm_stats():
+    if isinstance(llm_module.llm, LLMRouter):
+        return llm_module.llm.stats()
+    return {}
+
+
+@app.get("/pool-stats")
+def pool_stats():
+    return pool_manager.stats()
+
+
+Gauge(
+    "langbot_db_pool_connections",
+    "Database pool connections by state.",
+    lambda: {
+        "size": pool_manager.stats()["pool_size"],
+        "available": pool_manager.stats()["pool_available"],
+        "in_use": pool_manager.in_use,
+        "waiting": pool_manager.waiting,
+    },
+    ["state"],
+)
+Gauge(
+    "langbot_db_pool_errors",
+    "Database pool checkout timeouts, errors and reconnects since start.",
+    lambda: {
+        "checkout_timeout": pool_manager.checkout_timeouts,
+        "error": pool_manager.errors,
+        "reconnect": pool_manager.reconnects,
+    },
+    ["kind"],
+)
+Gauge(
+    "langbot_cache_hit_rate",
+    "Hit rate of in-process caches.",
+    lambda: {
+        "search": search_service.cache.stats()["hit_rate"],
+        "context": context_cache.stats()["hit_rate"],
+        "response": response_cache.cache.stats()["hit_rate"],
+    },
+    ["cache"],
+)
+Gauge("langbot_context_cache_bytes", "Bytes held by the thread context cache.", lambda: context_cache.total_bytes)
+Gauge("langbot_persistence_queue_depth", "Turns waiting to be persisted.", lambda: persistence_writer.stats()["queued"])
+Gauge(
+    "langbot_llm_backend_circuit_open",
+    "1 while an LLM backend's circuit breaker is open or half-open.",
+    lambda: {
+        name: int(stats["state"] != "closed")
+        for name, stats in (llm_module.llm.stats() if isinstance(llm_module.llm, LLMRouter) else {}).items()
+    },
+    ["backend"],
+)
+Gauge("langbot_admission_active", "Generations holding an admission slot.", lambda: admission.active)
+Gauge("langbot_admission_queue_depth", "Generations waiting for an admission slot.", lambda: admission.queued)
+Gauge("langbot_password_hash_pending", "Password hashes running or queued.", lambda: password_hasher.pending)
+Gauge("langbot_password_hash_rejected", "Password hash requests shed since start.", lambda: password_hasher.rejected)
+
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
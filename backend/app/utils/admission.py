@@ -0,0 +1,200 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable, Optional
+from dotenv import load_dotenv
+from app.utils.metrics import ADMISSION_REJECTIONS, ADMISSION_WAIT
+
+load_dotenv()
+
+
+class AdmissionRejected(Exception):
+    """Raised when a generation may not start now; the route answers 429."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Generation rejected: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    """Per-key token buckets refilled at ``rate`` tokens per second.
+
+    A bucket idle long enough to have refilled completely is identical to a
+    fresh one, so those are dropped on a periodic sweep and memory tracks
+    only recently active keys.
+    """
+
+    def __init__(self, rate: float, burst: float, sweep_interval: float = 60.0):
+        self.rate = rate
+        self.burst = burst
+        self.sweep_interval = sweep_interval
+        self._buckets: Dict[Hashable, _Bucket] = {}
+        self._last_sweep = time.monotonic()
+        self.evicted = 0
+
+    def acquire(self, key: Hashable) -> float:
+        """Take one token. Returns 0 on success, otherwise the seconds until
+        a token will be available."""
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._sweep(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.burst, now)
+        else:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0
+        return (1 - bucket.tokens) / self.rate
+
+    def _sweep(self, now: float) -> None:
+        self._last_sweep = now
+        full_after = self.burst / self.rate
+        idle = [key for key, b in self._buckets.items() if now - b.updated >= full_after]
+        for key in idle:
+            del self._buckets[key]
+        self.evicted += len(idle)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionSlot:
+    """A held generation slot. ``release`` is idempotent."""
+
+    __slots__ = ("_controller", "started", "_released")
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self.started)
+
+
+class AdmissionController:
+    """Global cap on concurrent generations with a bounded FIFO wait queue.
+
+    Up to ``max_concurrent`` generations run at once and up to ``max_queue``
+    more wait at most ``queue_timeout`` seconds for a slot; beyond that a
+    request is rejected straight away. Released slots are handed directly to
+    the oldest waiter so a new arrival cannot overtake the queue. The
+    Retry-After estimate comes from a moving average of slot hold times.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._avg_hold = 10.0
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _estimate_wait(self) -> float:
+        return self._avg_hold * (len(self._waiters) + 1) / self.max_concurrent
+
+    async def acquire(self) -> AdmissionSlot:
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            ADMISSION_WAIT.observe(0)
+            return AdmissionSlot(self)
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full", self._estimate_wait())
+        started = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over as we gave up; pass it on.
+                self._release(None)
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject("queue_timeout", self._estimate_wait())
+            raise
+        self.admitted += 1
+        ADMISSION_WAIT.observe(time.monotonic() - started)
+        return AdmissionSlot(self)
+
+    def _reject(self, reason: str, retry_after: float) -> AdmissionRejected:
+        self.rejected += 1
+        ADMISSION_REJECTIONS.labels(reason).inc()
+        return AdmissionRejected(reason, retry_after)
+
+    def _release(self, held: Optional[float]) -> None:
+        if held is not None:
+            self._avg_hold += 0.1 * (held - self._avg_hold)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_hold_seconds": round(self._avg_hold, 2),
+            "rate_limited_users": len(user_rate_limiter),
+            "rate_limiter_evicted": user_rate_limiter.evicted,
+        }
+
+
+def check_user_rate(user_id: Optional[int]) -> None:
+    """Charge one generation to the user's bucket or raise AdmissionRejected."""
+    if user_id is None:
+        return
+    wait = user_rate_limiter.acquire(user_id)
+    if wait > 0:
+        ADMISSION_REJECTIONS.labels("rate_limited").inc()
+        raise AdmissionRejected("rate_limited", wait)
+
+
+user_rate_limiter = RateLimiter(
+    rate=float(os.getenv("LLM_USER_RATE_PER_MINUTE", "20")) / 60,
+    burst=float(os.getenv("LLM_USER_BURST", "5")),
+)
+
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("LLM_MAX_CONCURRENT", "32")),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", "64")),
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10")),
+)
@@ -0,0 +1,115 @@
+import asyncio
+import os
+from typing import AsyncIterator, Callable, Optional, Tuple
+from dotenv import load_dotenv
+from app.utils.bloom import BloomFilter
+
+load_dotenv()
+
+# Streams (username, email) for every existing account.
+AccountScan = Callable[[], AsyncIterator[Tuple[str, str]]]
+
+
+class AvailabilityIndex:
+    """In-process Bloom filters of taken usernames and emails.
+
+    A negative answer is definite, so the signup availability checks can skip
+    Postgres; a positive answer is only "possibly taken" and is confirmed with
+    a query. Bloom filters cannot forget, so deletions are counted and the
+    filters are rebuilt from a fresh scan once enough entries have gone stale.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, rebuild_ratio: float):
+        self.min_capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_ratio = rebuild_ratio
+        self.usernames = BloomFilter(capacity, error_rate)
+        self.emails = BloomFilter(capacity, error_rate)
+        self.ready = False
+        self.removed = 0
+        self._scan: Optional[AccountScan] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self._pending: Optional[list[Tuple[str, str]]] = None
+        self.skipped_queries = 0
+        self.confirmed_queries = 0
+        self.false_positives = 0
+
+    async def load(self, scan: AccountScan, expected: int = 0) -> None:
+        """Build fresh filters from a streaming scan, then swap them in."""
+        self._scan = scan
+        capacity = max(self.min_capacity, expected * 2)
+        usernames = BloomFilter(capacity, self.error_rate)
+        emails = BloomFilter(capacity, self.error_rate)
+        self._pending = []
+        try:
+            async for username, email in scan():
+                usernames.add(username)
+                emails.add(email)
+            # Accounts created while the scan was running.
+            for username, email in self._pending:
+                usernames.add(username)
+                emails.add(email)
+        finally:
+            self._pending = None
+        self.usernames, self.emails = usernames, emails
+        self.removed = 0
+        self.ready = True
+        print(f"✅ Availability index loaded: {usernames.count} accounts, {len(usernames.bits) + len(emails.bits)} bytes")
+
+    def might_contain_username(self, username: str) -> bool:
+        return self._check(username, self.usernames)
+
+    def might_contain_email(self, email: str) -> bool:
+        return self._check(email, self.emails)
+
+    def _check(self, item: str, bloom: BloomFilter) -> bool:
+        if not self.ready:
+            self.confirmed_queries += 1
+            return True
+        if item in bloom:
+            self.confirmed_queries += 1
+            return True
+        self.skipped_queries += 1
+        return False
+
+    def record_false_positive(self) -> None:
+        if self.ready:
+            self.false_positives += 1
+
+    def add(self, username: str, email: str) -> None:
+        self.usernames.add(username)
+        self.emails.add(email)
+        if self._pending is not None:
+            self._pending.append((username, email))
+
+    def remove(self, username: str, email: str) -> None:
+        self.removed += 1
+        if (
+            self._scan is not None
+            and self.removed > self.rebuild_ratio * max(1, self.usernames.count)
+            and (self._rebuild_task is None or self._rebuild_task.done())
+        ):
+            self._rebuild_task = asyncio.create_task(
+                self.load(self._scan, self.usernames.count - self.removed)
+            )
+
+    def stats(self) -> dict:
+        negatives = self.skipped_queries + self.false_positives
+        return {
+            "ready": self.ready,
+            "usernames": self.usernames.stats(),
+            "emails": self.emails.stats(),
+            "bytes": len(self.usernames.bits) + len(self.emails.bits),
+            "stale_entries": self.removed,
+            "db_queries_skipped": self.skipped_queries,
+            "db_queries_confirmed": self.confirmed_queries,
+            "observed_false_positives": self.false_positives,
+            "observed_false_positive_rate": round(self.false_positives / negatives, 6) if negatives else 0.0,
+        }
+
+
+availability_index = AvailabilityIndex(
+    capacity=int(os.getenv("AVAILABILITY_FILTER_CAPACITY", "100000")),
+    error_rate=float(os.getenv("AVAILABILITY_FILTER_ERROR_RATE", "0.01")),
+    rebuild_ratio=float(os.getenv("AVAILABILITY_FILTER_REBUILD_RATIO", "0.1")),
+)
@@ -1,6 +1,14 @@
-from typing import TypedDict, Annotated
+from typing import NotRequired, TypedDict, Annotated
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 
 class ChatState(TypedDict):
-    messages: Annotated[list[BaseMessage], add_messages]
\ No newline at end of file
+    messages: Annotated[list[BaseMessage], add_messages]
+    # Rolling summary of the turns older than the context window.
+    summary: NotRequired[str]
+    # (role, content) of past messages recalled for the current turn.
+    memories: NotRequired[list[tuple[str, str]]]
+    # Tool calls made and wall-clock start of the current turn, for the
+    # per-turn tool budget enforced by the tools node.
+    turn_tool_calls: NotRequired[int]
+    turn_started_at: NotRequired[float]
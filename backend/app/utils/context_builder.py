@@ -0,0 +1,119 @@
+import os
+import re
+from typing import List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from langchain_core.messages import BaseMessage, SystemMessage
+
+load_dotenv()
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# Role markers and separators the provider adds around every message.
+MESSAGE_OVERHEAD_TOKENS = 4
+TRUNCATION_MARKER = " …[truncated]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local stand-in for the provider tokenizer. BPE vocabularies
+    average about four characters per token on English text, while code and
+    punctuation-heavy text tokenizes closer to one token per word or symbol,
+    so take whichever estimate is larger."""
+    if not text:
+        return 0
+    return max(len(text) // 4, len(_TOKEN_RE.findall(text)))
+
+
+def message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(content)
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(call["name"]) + estimate_tokens(str(call.get("args", "")))
+    return tokens
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens - estimate_tokens(TRUNCATION_MARKER))
+    text = text[: limit * 4]
+    while estimate_tokens(text) > limit:
+        # Symbol-heavy text: shrink proportionally until the estimate fits.
+        text = text[: len(text) * limit // estimate_tokens(text)]
+    return text + TRUNCATION_MARKER
+
+
+class ContextBuilder:
+    """Packs the newest messages of a conversation into a token budget.
+
+    Messages are taken newest first until the budget is spent; a single
+    message larger than ``max_message_tokens`` (typically a tool output) is
+    truncated rather than crowding out the rest. The window never starts with
+    a tool result whose tool call was cut off. The thread summary and any
+    recalled long-term memories follow the system prompt, each with its own
+    budget.
+    """
+
+    def __init__(
+        self, budget: int, max_message_tokens: int, summary_tokens: int, memory_tokens: int
+    ):
+        self.budget = budget
+        self.max_message_tokens = max_message_tokens
+        self.summary_tokens = summary_tokens
+        self.memory_tokens = memory_tokens
+
+    def _fit(self, message: BaseMessage) -> BaseMessage:
+        if not isinstance(message.content, str):
+            return message
+        content = truncate_to_tokens(message.content, self.max_message_tokens)
+        return message if content is message.content else message.model_copy(update={"content": content})
+
+    def select(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        selected: List[BaseMessage] = []
+        used = 0
+        for message in reversed(messages):
+            message = self._fit(message)
+            cost = message_tokens(message)
+            if selected and used + cost > self.budget:
+                break
+            selected.append(message)
+            used += cost
+        selected.reverse()
+        while len(selected) > 1 and selected[0].type == "tool":
+            selected.pop(0)
+        return selected
+
+    def build(
+        self,
+        system: SystemMessage,
+        messages: List[BaseMessage],
+        summary: Optional[str] = None,
+        memories: Sequence[Tuple[str, str]] = (),
+    ) -> List[BaseMessage]:
+        prompt: List[BaseMessage] = [system]
+        if summary:
+            prompt.append(
+                SystemMessage(
+                    content="Summary of the earlier conversation:\n"
+                    + truncate_to_tokens(summary, self.summary_tokens)
+                )
+            )
+        if memories:
+            per_memory = max(1, self.memory_tokens // len(memories))
+            prompt.append(
+                SystemMessage(
+                    content="Possibly relevant messages from earlier conversations:\n"
+                    + "\n".join(
+                        f"- {role}: {truncate_to_tokens(content, per_memory)}"
+                        for role, content in memories
+                    )
+                )
+            )
+        return prompt + self.select(messages)
+
+
+context_builder = ContextBuilder(
+    budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000")),
+    max_message_tokens=int(os.getenv("CONTEXT_MAX_MESSAGE_TOKENS", "1000")),
+    summary_tokens=int(os.getenv("SUMMARY_MAX_TOKENS", "300")),
+    memory_tokens=int(os.getenv("MEMORY_MAX_TOKENS", "400")),
+)
@@ -0,0 +1,88 @@
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Rough per-message bookkeeping cost on top of the content itself.
+MESSAGE_OVERHEAD_BYTES = 256
+
+
+def _message_size(message: Dict[str, Any]) -> int:
+    size = MESSAGE_OVERHEAD_BYTES + len(str(message.get("content", "")).encode("utf-8"))
+    for image in message.get("images") or []:
+        size += MESSAGE_OVERHEAD_BYTES + len(str(image.get("description") or ""))
+    return size
+
+
+class ThreadContextCache:
+    """Recent-message window of each active thread, bounded by total bytes
+    with LRU eviction. Writers append to threads that are already cached so a
+    follow-up turn can be served without reading history back from Postgres."""
+
+    def __init__(self, max_bytes: int, window: int = 10):
+        self.max_bytes = max_bytes
+        self.window = window
+        self._entries: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, thread_id: str) -> Optional[List[Dict[str, Any]]]:
+        messages = self._entries.get(thread_id)
+        if messages is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(thread_id)
+        self.hits += 1
+        return list(messages)
+
+    def put(self, thread_id: str, messages: List[Dict[str, Any]]) -> None:
+        self._store(thread_id, list(messages[-self.window :]))
+
+    def append(self, thread_id: str, message: Dict[str, Any]) -> None:
+        """Append to a cached thread; uncached threads are left to be loaded
+        from the database on their next read."""
+        messages = self._entries.get(thread_id)
+        if messages is None:
+            return
+        self._store(thread_id, (messages + [message])[-self.window :])
+
+    def invalidate(self, thread_id: str) -> None:
+        if thread_id in self._entries:
+            del self._entries[thread_id]
+            self.total_bytes -= self._sizes.pop(thread_id)
+
+    def _store(self, thread_id: str, messages: List[Dict[str, Any]]) -> None:
+        self.invalidate(thread_id)
+        size = sum(_message_size(m) for m in messages)
+        if size > self.max_bytes:
+            return
+        self._entries[thread_id] = messages
+        self._sizes[thread_id] = size
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            evicted, _ = self._entries.popitem(last=False)
+            self.total_bytes -= self._sizes.pop(evicted)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "threads": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+context_cache = ThreadContextCache(
+    max_bytes=int(os.getenv("CONTEXT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    window=int(os.getenv("CONTEXT_WINDOW_MESSAGES", "10")),
+)
@@ -1,18 +1,80 @@
-# from functools import lru_cache
-# from langchain_google_genai import GoogleGenerativeAIEmbeddings
-# from dotenv import load_dotenv
-# import os
+import hashlib
+import os
+import re
+from typing import List, Protocol
+import numpy as np
+from dotenv import load_dotenv
 
-# load_dotenv()
+load_dotenv()
 
-# model_name = "gemini-embedding-001"
+_WORD_RE = re.compile(r"\w+")
 
 
-# @lru_cache()
-# def get_emb():
-#     return GoogleGenerativeAIEmbeddings(
-#         model=model_name, google_api_key=os.getenv("GOOGLE_API_KEY")
-#     )
+class Embedder(Protocol):
+    """Turns texts into an (n, dim) float32 array of L2-normalized rows, so
+    cosine similarity is a plain dot product."""
 
+    name: str
+    dim: int
 
-# emb = get_emb()
+    async def embed(self, texts: List[str]) -> np.ndarray: ...
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class HashingEmbedder:
+    """Deterministic offline embedder: signed feature hashing of words and
+    word bigrams. No model or network, identical output on every machine, so
+    tests and load runs are reproducible. Captures lexical overlap only."""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD_RE.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def _embed_one(self, text: str, out: np.ndarray) -> None:
+        for feature in self._features(text):
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            out[digest % self.dim] += 1.0 if (digest >> 63) & 1 else -1.0
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            self._embed_one(text, vectors[i])
+        return normalize_rows(vectors)
+
+
+class GoogleEmbedder:
+    """Gemini embeddings through langchain-google-genai."""
+
+    def __init__(self, model: str = "gemini-embedding-001", dim: int = 768):
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        self.dim = dim
+        self.name = f"{model}-{dim}"
+        self._client = GoogleGenerativeAIEmbeddings(
+            model=model, google_api_key=os.getenv("GOOGLE_API_KEY")
+        )
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = await self._client.aembed_documents(texts, output_dimensionality=self.dim)
+        return normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+
+def build_embedder() -> Embedder:
+    provider = os.getenv("EMBEDDING_PROVIDER", "google" if os.getenv("GOOGLE_API_KEY") else "hashing")
+    dim = int(os.getenv("EMBEDDING_DIM", "768" if provider == "google" else "256"))
+    if provider == "google":
+        return GoogleEmbedder(model=os.getenv("EMBEDDING_MODEL", "gemini-embedding-001"), dim=dim)
+    return HashingEmbedder(dim=dim)
+
+
+embedder = build_embedder()
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import random
+import uuid
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """Local stand-in for the chat provider that streams a scripted reply
+    word by word at a fixed token rate. Used by the benchmarks so no network
+    or API key is needed.
+
+    When the latest message comes from the user the model may first answer
+    with a tool call: always if the text mentions an image/drawing
+    (generate_image) or a search (brave_search), otherwise with probability
+    ``tool_call_rate``. After a tool result it streams the scripted reply.
+    With ``failure_rate`` set, that share of calls fails before the first
+    token, which exercises the router's failover and circuit breakers.
+    """
+
+    reply: str = (
+        "This is a scripted answer from the local fake model, streamed one "
+        "token at a time so that time to first token and throughput can be "
+        "measured without calling the real provider."
+    )
+    tokens_per_second: float = 50.0
+    first_token_delay: float = 0.2
+    tool_call_rate: float = 0.0
+    failure_rate: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def _tokens(self) -> List[str]:
+        words = self.reply.split(" ")
+        return [w if i == 0 else f" {w}" for i, w in enumerate(words)]
+
+    def _scripted_tool_call(self, messages: List[BaseMessage]) -> Optional[dict]:
+        if not messages or isinstance(messages[-1], ToolMessage) or messages[-1].type != "human":
+            return None
+        text = str(messages[-1].content)
+        lowered = text.lower()
+        if "image" in lowered or "draw" in lowered:
+            name, args = "generate_image", {"prompt": text[:200]}
+        elif "search" in lowered or random.random() < self.tool_call_rate:
+            name, args = "brave_search", {"query": text[:200]}
+        else:
+            return None
+        return {"name": name, "args": json.dumps(args), "id": f"call_{uuid.uuid4().hex[:12]}", "index": 0}
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for token in self._tokens():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_delay)
+        if random.random() < self.failure_rate:
+            raise RuntimeError("Scripted failure from the fake model")
+        tool_call = self._scripted_tool_call(messages)
+        if tool_call:
+            chunk = ChatGenerationChunk(
+                message=AIMessageChunk(content="", tool_call_chunks=[tool_call])
+            )
+            if run_manager:
+                await run_manager.on_llm_new_token("", chunk=chunk)
+            yield chunk
+            return
+        interval = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        for i, token in enumerate(self._tokens()):
+            if i and interval:
+                await asyncio.sleep(interval)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    def bind_tools(self, tools, **kwargs):
+        return self
@@ -1,28 +1,97 @@
-from datetime import datetime
+import os
+import time
+from typing import Optional
+from langchain_core.messages import RemoveMessage, message_chunk_to_message
+from langchain_core.runnables import RunnableConfig
 from app.utils.chatState import ChatState
-from app.utils.llm import llm
-from langchain_core.messages import SystemMessage
+from app.utils import llm as llm_module
+from app.utils.memory import RECALL_BUDGET, memory
+from app.utils.prompt import build_prompt
+from app.utils.response_cache import response_cache
+from app.utils.summarizer import summarizer
+from app.utils.tools import tool_executor
 import traceback
 from app.utils.types import AssistantMessage
 
 
-def chat_node(state: ChatState):
-    messages = state.get("messages", [])[-10:]
-    llm_instruction = SystemMessage(
-        content=(
-            "You are a helpful, concise AI assistant that helps users through natural conversation.\n"
-            "Guidelines:\n"
-            "- Use tools (brave_search, generate_image) only when strictly necessary; tools are expensive.\n"
-            "- After receiving any tool output, do NOT call another tool; instead finalize your response.\n"
-            "- Keep answers as short and clear as possible — no filler or repetition.\n"
-            "- If uncertain, ask for clarification before answering.\n"
-            "- Do not restate instructions, disclaimers, or obvious facts.\n"
-            f"- Assume the current date and time is {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} UTC."
-        )
+# Checkpointed state keeps at most this many messages; older turns live on in
+# the thread summary and long-term memory.
+STATE_MAX_MESSAGES = int(os.getenv("STATE_MAX_MESSAGES", "40"))
+
+
+def _trim(messages, reply) -> list:
+    """RemoveMessage updates for the oldest messages once a turn is complete,
+    so the checkpointed state stays bounded."""
+    if getattr(reply, "tool_calls", None):
+        return []
+    overflow = len(messages) + 1 - STATE_MAX_MESSAGES
+    return [RemoveMessage(id=m.id) for m in messages[:overflow] if m.id] if overflow > 0 else []
+
+
+def _window_start(messages) -> Optional[int]:
+    ids = [int(m.id) for m in messages if m.id and str(m.id).isdigit()]
+    return min(ids) if ids else None
+
+
+async def recall_memories(state: ChatState, config: RunnableConfig) -> list:
+    """Memories for this turn: recalled once when the user speaks and carried
+    in the state for the follow-up call after a tool result."""
+    messages = state.get("messages", [])
+    if not messages or messages[-1].type != "human":
+        return state.get("memories") or []
+    thread_id = config.get("configurable", {}).get("thread_id")
+    if not thread_id:
+        return []
+    return await memory.recall_within(
+        thread_id, str(messages[-1].content), RECALL_BUDGET, _window_start(messages)
+    )
+
+
+async def chat_node(state: ChatState, config: RunnableConfig):
+    memories = await recall_memories(state, config)
+    prompt = build_prompt(state.get("messages", []), state.get("summary"), memories)
+    messages = state.get("messages", [])
+    thread_id = config.get("configurable", {}).get("thread_id")
+    if thread_id:
+        # Whatever the budget left out of the prompt is the summary's job.
+        summarizer.track_window(thread_id, _window_start(prompt))
+    # A new user message starts a new turn and a fresh tool budget.
+    turn = (
+        {"turn_tool_calls": 0, "turn_started_at": time.time()}
+        if messages and messages[-1].type == "human"
+        else {}
     )
     try:
-        response = llm.invoke([llm_instruction] + messages)
-        return {"messages": response}
+        model = llm_module.llm
+        if tool_executor.exhausted({**state, **turn}):
+            model = llm_module.final_answer_llm
+        cache_key = None
+        if response_cache.enabled and model is llm_module.llm:
+            if config.get("configurable", {}).get("response_cache", True):
+                cache_key = response_cache.key(model, prompt)
+                model = response_cache.lookup(cache_key) or model
+            else:
+                response_cache.bypass()
+
+        # Stream from the provider (or replay a cached answer) so every token
+        # is forwarded to workflow.astream(stream_mode="messages") as soon as
+        # it arrives, without pinning a worker thread for the whole completion.
+        response = None
+        chunks = []
+        async for chunk in model.astream(prompt, config=config):
+            response = chunk if response is None else response + chunk
+            if isinstance(chunk.content, str) and chunk.content:
+                chunks.append(chunk.content)
+        if response is None:
+            raise ValueError("LLM returned an empty stream")
+        message = message_chunk_to_message(response)
+        if cache_key and model is llm_module.llm:
+            response_cache.store(cache_key, message, chunks)
+        return {
+            "messages": _trim(state.get("messages", []), message) + [message],
+            "memories": memories,
+            **turn,
+        }
     except Exception as e:
         # Professional fallback
         traceback.print_exc()
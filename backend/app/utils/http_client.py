@@ -0,0 +1,38 @@
+import os
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+session: aiohttp.ClientSession | None = None
+
+
+def _build_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100")),
+        limit_per_host=int(os.getenv("HTTP_POOL_MAX_PER_HOST", "20")),
+        keepalive_timeout=float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30")),
+        ttl_dns_cache=300,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=float(os.getenv("HTTP_TIMEOUT_SECONDS", "120")),
+        connect=float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "10")),
+        sock_read=float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "60")),
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Get the app-lifetime HTTP session, creating it on first use"""
+    global session
+    if session is None or session.closed:
+        session = _build_session()
+    return session
+
+
+async def close_http_session() -> None:
+    """Close the shared HTTP session and its keep-alive connections"""
+    global session
+    if session is not None and not session.closed:
+        await session.close()
+    session = None
@@ -1,15 +1,101 @@
 import os
+from urllib.parse import parse_qsl
 from langchain_groq import ChatGroq
 from dotenv import load_dotenv
 
+from app.utils.llm_router import Backend, LLMRouter
 from app.utils.tools import tools
 
 load_dotenv()
 groq_api_key = os.getenv("GROQ_API_KEY")
 
-llm_base = ChatGroq(
-    model="llama-3.1-8b-instant",
-    temperature=0.5, 
-    groq_api_key=groq_api_key
+
+def build_chat_model(provider: str, model: str):
+    if provider == "fake":
+        # Local scripted model for load tests; see app/utils/fake_llm.py.
+        # Options ride along as a query string, e.g. "fake:slow?first_token_delay=2".
+        from app.utils.fake_llm import FakeStreamingChatModel
+
+        model, _, query = model.partition("?")
+        options = {key: float(value) for key, value in parse_qsl(query)}
+        return FakeStreamingChatModel(
+            tokens_per_second=options.get(
+                "tokens_per_second", float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "50"))
+            ),
+            first_token_delay=options.get(
+                "first_token_delay", float(os.getenv("FAKE_LLM_FIRST_TOKEN_DELAY", "0.2"))
+            ),
+            tool_call_rate=options.get(
+                "tool_call_rate", float(os.getenv("FAKE_LLM_TOOL_CALL_RATE", "0"))
+            ),
+            failure_rate=options.get("failure_rate", 0.0),
+        )
+    if provider == "google":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(
+            model=model,
+            temperature=0.5,
+            google_api_key=os.getenv("GOOGLE_API_KEY"),
+        )
+    if provider == "groq":
+        return ChatGroq(
+            model=model,
+            temperature=0.5, 
+            groq_api_key=groq_api_key
+            )
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+def backend_specs() -> list[tuple[str, str]]:
+    """``LLM_BACKENDS`` as (provider, model) pairs, e.g.
+    "groq:llama-3.1-8b-instant,google:gemini-2.0-flash"."""
+    default = "fake:fake" if os.getenv("LLM_PROVIDER", "groq") == "fake" else "groq:llama-3.1-8b-instant"
+    specs = []
+    for spec in os.getenv("LLM_BACKENDS", default).split(","):
+        provider, _, model = spec.strip().partition(":")
+        if provider:
+            specs.append((provider, model))
+    return specs
+
+
+def build_backends() -> list[Backend]:
+    return [
+        Backend(
+            f"{provider}:{model.partition('?')[0]}",
+            build_chat_model(provider, model),
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "3")),
+            cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30")),
+        )
+        for provider, model in backend_specs()
+    ]
+
+
+# Built once: every model below routes over the same backends, so latency,
+# error rates and circuit breakers reflect all of their traffic together.
+backends = build_backends()
+
+
+def build_llm(with_tools: bool = True, tool_choice: str = "auto"):
+    models = {
+        b.name: b.model.bind_tools(tools=tools, tool_choice=tool_choice) if with_tools else b.model
+        for b in backends
+    }
+    if len(backends) == 1:
+        return models[backends[0].name]
+    return LLMRouter(
+        backends=backends,
+        models=models,
+        model_name="router:" + ",".join(b.name for b in backends),
+        hedge=os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true",
+        hedge_delay=float(os.getenv("LLM_HEDGE_DELAY_MS", "2000")) / 1000,
+        hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "300")) / 1000,
     )
-llm = llm_base.bind_tools(tools=tools, tool_choice="auto")
+
+
+llm = build_llm()
+# Same tools in the schema (the history may contain tool calls) but none may
+# be called: used once a turn has spent its tool budget.
+final_answer_llm = build_llm(tool_choice="none")
+# Background work such as thread summaries must never call tools.
+summary_llm = build_llm(with_tools=False)
@@ -2,7 +2,13 @@ import asyncio
 from collections import defaultdict
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple, TypedDict
-from app.db.connection import get_pool
+from app.db.archive import archiver
+from app.db.connection import get_connection
+from app.db.purge import purger
+from app.utils.metrics import instrument_query
+from app.utils.cache import TTLCache
+from app.utils.context_cache import context_cache
+from app.utils.llm_models.threadfuns import thread_preview
 
 
 class Message(TypedDict):
@@ -11,19 +17,31 @@ class Message(TypedDict):
     created_at: datetime
 
 
+def _cached_message(
+    id: int, role: str, content: str, created_at: Optional[datetime], images=None
+) -> Dict[str, Any]:
+    return {
+        "id": id,
+        "role": role,
+        "content": content,
+        "created_at": created_at.isoformat() if created_at else None,
+        "images": images or [],
+    }
+
+
+@instrument_query
 async def create_thread_new(
     user_id: int, init_msg: str
 ) -> Tuple[str, int | None, bool]:
-    pool = await get_pool()
-    async with pool.connection() as conn:
+    async with get_connection() as conn:
         async with conn.cursor() as cur:
             await cur.execute(
                 """
-                    INSERT INTO threads (user_id) 
-                    VALUES (%s)  
+                    INSERT INTO threads (user_id, message_count, preview) 
+                    VALUES (%s, 1, %s)  
                     RETURNING thread_id;
                     """,
-                (user_id,),
+                (user_id, thread_preview(init_msg)),
             )
             row = await cur.fetchone()
             if not row:
@@ -34,7 +52,7 @@ async def create_thread_new(
             await cur.execute(
                 """
                 INSERT INTO messages (thread_id, role, content) 
-                VALUES (%s, 'user', %s) RETURNING id;
+                VALUES (%s, 'user', %s) RETURNING id, created_at;
                 """,
                 (thread_id, init_msg),
             )
@@ -42,27 +60,44 @@ async def create_thread_new(
             print("😶‍🌫️", rowMsg)
             parent_id = int(rowMsg[0]) if rowMsg else None
             await conn.commit()
+        if parent_id:
+            context_cache.put(
+                thread_id, [_cached_message(parent_id, "user", init_msg, rowMsg[1])]
+            )
         return thread_id, parent_id, True
 
 
+@instrument_query
 async def get_conversations_from_table(
     thread_id: str, created_at: Optional[datetime] = None
 ) -> Dict[str, Any]:
+    page, archived = await _fetch_conversation_page(thread_id, created_at)
+    if archived and await archiver.rehydrate(thread_id):
+        page, _ = await _fetch_conversation_page(thread_id, created_at)
+    return page
+
+
+async def _fetch_conversation_page(
+    thread_id: str, created_at: Optional[datetime]
+) -> Tuple[Dict[str, Any], bool]:
+    """One page of messages, newest first, and whether the thread has
+    messages in an archive. Reaching the start of the history is the only
+    way to miss archived messages, so only then is the thread looked up."""
     max_retries = 2
     page_size = 10
     limit = page_size + 1
     for retry_count in range(max_retries):
         try:
-            pool = await get_pool()
-            async with pool.connection() as conn:
+            async with get_connection() as conn:
                 async with conn.cursor() as cur:
                     await cur.execute(
                         f"""
-                            SELECT id, role, content, created_at
-                            FROM messages
-                            WHERE thread_id = %s
-                            { 'AND created_at < %s' if created_at else '' }
-                            ORDER BY created_at DESC
+                            SELECT m.id, m.role, m.content, m.created_at
+                            FROM messages m
+                            JOIN threads t ON t.thread_id = m.thread_id AND t.deleted_at IS NULL
+                            WHERE m.thread_id = %s
+                            { 'AND m.created_at < %s' if created_at else '' }
+                            ORDER BY m.created_at DESC
                             LIMIT {limit};
                         """,
                         (thread_id, created_at) if created_at else (thread_id,),
@@ -71,8 +106,19 @@ async def get_conversations_from_table(
                     messages_data = await cur.fetchall()
                     has_more = len(messages_data) > page_size
                     messages_to_return = messages_data[:page_size]
+                    archived = False
+                    if not has_more:
+                        await cur.execute(
+                            """
+                                SELECT 1 FROM threads
+                                WHERE thread_id = %s
+                                  AND archived_at IS NOT NULL AND deleted_at IS NULL;
+                            """,
+                            (thread_id,),
+                        )
+                        archived = await cur.fetchone() is not None
                     if not messages_to_return:
-                        return {"messages": [], "has_more": False}
+                        return {"messages": [], "has_more": False}, archived
 
                     parent_ids = [row[0] for row in messages_to_return]
 
@@ -114,7 +160,7 @@ async def get_conversations_from_table(
             ]
 
             # has_more is true if we got a full page
-            return {"messages": result, "has_more": has_more}
+            return {"messages": result, "has_more": has_more}, archived
 
         except Exception as e:
             print(
@@ -127,40 +173,97 @@ async def get_conversations_from_table(
             await asyncio.sleep(0.5 * (retry_count + 1))
 
 
+@instrument_query
 async def delete_conversation(thread_id: str):
-    pool = await get_pool()
-    async with pool.connection() as conn:
+    # Only hides the thread; the purger removes its rows and images later.
+    async with get_connection() as conn:
         async with conn.cursor() as cur:
             await cur.execute(
                 """
-                    DELETE FROM threads
-                    WHERE thread_id = %s;
+                    UPDATE threads SET deleted_at = now()
+                    WHERE thread_id = %s AND deleted_at IS NULL;
                 """,
                 (thread_id,),
             )
             deleted_count = cur.rowcount
+    context_cache.invalidate(thread_id)
     if deleted_count > 0:
-        print(f"✅ Deleted {deleted_count} thread(s) from threads table: {thread_id}.")
+        purger.notify()
+        print(f"✅ Marked {deleted_count} thread(s) as deleted: {thread_id}.")
         return True
     else:
         print(f"⚠️ No thread found in threads table for ID: {thread_id}.")
         return False
 
 
+@instrument_query
 async def insert_user_conversation(thread_id: str, message: str):
-    pool = await get_pool()
-    async with pool.connection() as conn:
+    async with get_connection() as conn:
         async with conn.cursor() as cur:
             await cur.execute(
                 """
-                        INSERT INTO messages 
-                        (thread_id, role, content ) 
-                        VALUES (%s, 'user', %s) RETURNING id;
+                        WITH inserted AS (
+                            INSERT INTO messages 
+                            (thread_id, role, content ) 
+                            SELECT thread_id, 'user', %(message)s FROM threads
+                            WHERE thread_id = %(thread_id)s AND deleted_at IS NULL
+                            RETURNING id, thread_id, created_at
+                        ), touched AS (
+                            UPDATE threads t
+                            SET message_count = t.message_count + 1,
+                                last_message_at = GREATEST(t.last_message_at, i.created_at),
+                                preview = %(preview)s
+                            FROM inserted i
+                            WHERE t.thread_id = i.thread_id
+                        )
+                        SELECT id, created_at FROM inserted;
                     """,
-                (thread_id, message),
+                {"message": message, "thread_id": thread_id, "preview": thread_preview(message)},
             )
             row = await cur.fetchone()
             parent_id = row[0] if row else None
             if not parent_id:
                 return None
-        return int(parent_id)
+    context_cache.append(
+        thread_id, _cached_message(int(parent_id), "user", message, row[1])
+    )
+    return int(parent_id)
+
+
+# Per-thread response cache opt-out, memoized briefly so the flag costs no
+# query on most turns. Other workers pick up a change within the TTL.
+_response_cache_flags = TTLCache(max_entries=10_000, ttl=60.0)
+
+
+@instrument_query
+async def get_response_cache_setting(thread_id: str) -> bool:
+    enabled = _response_cache_flags.get(thread_id)
+    if enabled is not None:
+        return enabled
+    async with get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT response_cache FROM threads WHERE thread_id = %s;",
+                (thread_id,),
+            )
+            row = await cur.fetchone()
+    enabled = bool(row[0]) if row else True
+    _response_cache_flags.set(thread_id, enabled)
+    return enabled
+
+
+@instrument_query
+async def set_response_cache_setting(thread_id: str, enabled: bool) -> bool:
+    async with get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                    UPDATE threads SET response_cache = %s
+                    WHERE thread_id = %s;
+                """,
+                (enabled, thread_id),
+            )
+            updated = cur.rowcount
+    if updated:
+        _response_cache_flags.set(thread_id, enabled)
+    return updated > 0
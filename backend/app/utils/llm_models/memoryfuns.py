@@ -0,0 +1,92 @@
+from typing import AsyncIterator, List, Optional, Tuple
+from app.db.connection import get_connection
+from app.utils.cache import TTLCache
+from app.utils.metrics import instrument_query
+
+# A thread never changes owner, so lookups can be cached for a long time.
+_thread_users = TTLCache(max_entries=50_000, ttl=3600.0)
+
+
+@instrument_query
+async def get_thread_user(thread_id: str) -> Optional[int]:
+    user_id = _thread_users.get(thread_id)
+    if user_id is not None:
+        return user_id
+    async with get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT user_id FROM threads WHERE thread_id = %s;", (thread_id,)
+            )
+            row = await cur.fetchone()
+    if row is None:
+        return None
+    _thread_users.set(thread_id, row[0])
+    return row[0]
+
+
+async def scan_user_embeddings(
+    user_id: int, model: str, batch_size: int = 5000
+) -> AsyncIterator[List[Tuple[int, bytes]]]:
+    """Stream (message_id, float32 bytes) for one user in batches through a
+    server-side cursor, oldest first."""
+    async with get_connection() as conn:
+        async with conn.cursor(name=f"embeddings_{user_id}") as cur:
+            await cur.execute(
+                """
+                    SELECT message_id, embedding
+                    FROM embedded_messages
+                    WHERE user_id = %s AND model = %s
+                    ORDER BY message_id;
+                """,
+                (user_id, model),
+            )
+            while True:
+                rows = await cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+
+@instrument_query(name="insert_embeddings")
+async def insert_embeddings(
+    rows: List[Tuple[int, str, str, bytes]],
+) -> List[Tuple[int, int]]:
+    """Insert (message_id, thread_id, model, embedding) rows in one pipelined
+    batch and return (message_id, user_id) for those whose thread still
+    exists."""
+    stored = []
+    async with get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.executemany(
+                """
+                    INSERT INTO embedded_messages (message_id, user_id, model, embedding)
+                    SELECT %s, user_id, %s, %s FROM threads WHERE thread_id = %s
+                    ON CONFLICT (message_id, model) DO NOTHING
+                    RETURNING message_id, user_id;
+                """,
+                [(message_id, model, embedding, thread_id) for message_id, thread_id, model, embedding in rows],
+                returning=True,
+            )
+            while True:
+                row = await cur.fetchone()
+                if row:
+                    stored.append((row[0], row[1]))
+                if not cur.nextset():
+                    break
+    return stored
+
+
+@instrument_query
+async def get_messages_by_ids(ids: List[int]) -> List[Tuple[int, str, str, str]]:
+    async with get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                    SELECT m.id, m.thread_id, m.role, m.content
+                    FROM messages m
+                    JOIN threads t ON t.thread_id = m.thread_id AND t.deleted_at IS NULL
+                    WHERE m.id = ANY(%s);
+                """,
+                (ids,),
+            )
+            return [(row[0], str(row[1]), row[2], row[3]) for row in await cur.fetchall()]
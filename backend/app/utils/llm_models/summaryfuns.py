@@ -0,0 +1,87 @@
+from typing import List, Optional, Tuple
+from app.db.connection import get_connection
+from app.utils.metrics import instrument_query
+
+
+@instrument_query
+async def get_thread_summary(thread_id: str) -> Optional[Tuple[str, int]]:
+    async with get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                    SELECT summary, covered_until_id
+                    FROM thread_summaries
+                    WHERE thread_id = %s;
+                """,
+                (thread_id,),
+            )
+            row = await cur.fetchone()
+    return (row[0], row[1]) if row else None
+
+
+@instrument_query
+async def get_unsummarized_messages(
+    thread_id: str,
+    covered_until_id: int,
+    keep_recent: int,
+    limit: int,
+    before_id: Optional[int] = None,
+) -> List[Tuple[int, str, str]]:
+    """Oldest messages not yet folded into the summary. With ``before_id``
+    (the oldest message the last prompt still sent verbatim) everything
+    older is returned; otherwise the ``keep_recent`` newest are excluded."""
+    async with get_connection() as conn:
+        async with conn.cursor() as cur:
+            if before_id is not None:
+                await cur.execute(
+                    """
+                        SELECT id, role, content
+                        FROM messages
+                        WHERE thread_id = %s
+                          AND id > %s
+                          AND id < %s
+                        ORDER BY id
+                        LIMIT %s;
+                    """,
+                    (thread_id, covered_until_id, before_id, limit),
+                )
+            else:
+                await cur.execute(
+                    """
+                        WITH recent AS (
+                            SELECT id FROM messages
+                            WHERE thread_id = %s
+                            ORDER BY created_at DESC, id DESC
+                            LIMIT %s
+                        )
+                        SELECT id, role, content
+                        FROM messages
+                        WHERE thread_id = %s
+                          AND id > %s
+                          AND id NOT IN (SELECT id FROM recent)
+                        ORDER BY id
+                        LIMIT %s;
+                    """,
+                    (thread_id, keep_recent, thread_id, covered_until_id, limit),
+                )
+            return await cur.fetchall()
+
+
+@instrument_query
+async def save_thread_summary(thread_id: str, summary: str, covered_until_id: int) -> bool:
+    """Upsert the summary unless another worker already folded further."""
+    async with get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                    INSERT INTO thread_summaries (thread_id, summary, covered_until_id)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (thread_id) DO UPDATE
+                    SET summary = EXCLUDED.summary,
+                        covered_until_id = EXCLUDED.covered_until_id,
+                        updated_at = now()
+                    WHERE thread_summaries.covered_until_id < EXCLUDED.covered_until_id;
+                """,
+                (thread_id, summary, covered_until_id),
+            )
+            return cur.rowcount > 0
@@ -1,27 +1,108 @@
-from app.db.connection import get_pool
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.db.connection import get_connection
+from app.utils.metrics import instrument_query
 
+PAGE_SIZE = 20
+TITLE_LENGTH = 80
+PREVIEW_LENGTH = 120
 
-async def get_thread_ids(user_id: int, row_index: int = 0):
-    print('/get_thread_ids', {'user_id': user_id, 'row_index': row_index})
+
+def thread_preview(content: str) -> str:
+    """Single-line excerpt of a message shown under the thread title."""
+    return " ".join(content.split())[:PREVIEW_LENGTH]
+
+
+def encode_cursor(last_message_at: datetime, thread_id: str) -> str:
+    raw = json.dumps([last_message_at.isoformat(), thread_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
     try:
-        pool = await get_pool()
-        async with pool.connection() as conn:
+        last_message_at, thread_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(last_message_at), str(thread_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+@instrument_query
+async def get_threads(
+    user_id: int, cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Return one page of a user's threads with their title, preview and
+    message count, most recently active first, plus the cursor for the next
+    page (None on the last page). Keyset pagination on (last_message_at,
+    thread_id) keeps every page one range scan of idx_threads_user_activity."""
+    print('/get_threads', {'user_id': user_id, 'cursor': cursor})
+    after = decode_cursor(cursor) if cursor else None
+    try:
+        async with get_connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
-                    """
-                        SELECT thread_id FROM threads 
-                        WHERE user_id=%s ORDER BY thread_id 
-                        LIMIT 20 OFFSET %s;
+                    f"""
+                        SELECT thread_id, title, preview, message_count, last_message_at
+                        FROM threads
+                        WHERE user_id = %s AND deleted_at IS NULL
+                        { 'AND (last_message_at, thread_id) < (%s, %s)' if after else '' }
+                        ORDER BY last_message_at DESC, thread_id DESC
+                        LIMIT {PAGE_SIZE + 1};
                     """,
-                    (user_id, row_index),
+                    (user_id, *after) if after else (user_id,),
                 )
                 rows = await cur.fetchall()
-            print(f'Rows fetched: {rows}')
-            thread_ids = [str(row[0]) for row in rows]
-        print('Returning thread_ids:', thread_ids)
-        return thread_ids
+        page = rows[:PAGE_SIZE]
+        threads = [
+            {
+                "thread_id": str(thread_id),
+                "title": title,
+                "preview": preview,
+                "message_count": message_count,
+                "last_message_at": last_message_at.isoformat(),
+            }
+            for thread_id, title, preview, message_count, last_message_at in page
+        ]
+        next_cursor = (
+            encode_cursor(page[-1][4], str(page[-1][0])) if len(rows) > PAGE_SIZE else None
+        )
+        return threads, next_cursor
     except Exception as e:
-        print(f"Error in get_thread_ids: {str(e)}")
+        print(f"Error in get_threads: {str(e)}")
         import traceback
         traceback.print_exc()
-        raise
\ No newline at end of file
+        raise
+
+
+@instrument_query
+async def get_title_source(thread_id: str, limit: int = 4) -> Optional[List[Tuple[str, str]]]:
+    """First messages of a thread that still has no title, or None if it
+    already has one (or is gone)."""
+    async with get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                    SELECT m.role, m.content
+                    FROM threads t
+                    JOIN messages m ON m.thread_id = t.thread_id
+                    WHERE t.thread_id = %s AND t.title IS NULL AND t.deleted_at IS NULL
+                    ORDER BY m.created_at, m.id
+                    LIMIT %s;
+                """,
+                (thread_id, limit),
+            )
+            rows = await cur.fetchall()
+    return rows or None
+
+
+@instrument_query
+async def save_thread_title(thread_id: str, title: str) -> bool:
+    """Set the title unless one was set meanwhile."""
+    async with get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "UPDATE threads SET title = %s WHERE thread_id = %s AND title IS NULL;",
+                (title[:TITLE_LENGTH], thread_id),
+            )
+            return cur.rowcount > 0
@@ -0,0 +1,90 @@
+import bisect
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.db.connection import get_connection
+from app.utils.metrics import instrument_query
+
+# Upper bounds (ms) of the latency histogram kept per tool and hour in
+# tool_usage_hourly; one extra slot counts everything slower.
+TOOL_LATENCY_BUCKETS_MS = (
+    10, 25, 50, 100, 250, 500, 1000, 2000, 3000, 5000, 7500, 10000, 15000, 20000, 30000, 45000, 60000,
+)
+
+# (tool_name, input, output, latency_ms, success)
+ToolLog = Tuple[str, str, Optional[str], Optional[int], Optional[bool]]
+
+
+def rollup_tool_logs(logs: Iterable[ToolLog], hour: datetime) -> List[tuple]:
+    """Aggregate tool calls into (tool, hour, calls, failures, total_ms,
+    buckets) rows for one upsert into tool_usage_hourly. Calls that never
+    finished (no latency) are left out."""
+    rows: Dict[str, list] = {}
+    for tool_name, _, _, latency_ms, success in logs:
+        if latency_ms is None:
+            continue
+        row = rows.get(tool_name)
+        if row is None:
+            row = rows[tool_name] = [0, 0, 0, [0] * (len(TOOL_LATENCY_BUCKETS_MS) + 1)]
+        row[0] += 1
+        row[1] += 0 if success else 1
+        row[2] += latency_ms
+        row[3][bisect.bisect_left(TOOL_LATENCY_BUCKETS_MS, latency_ms)] += 1
+    # Sorted so concurrent writers lock rollup rows in the same order.
+    return [(name, hour, *rows[name]) for name in sorted(rows)]
+
+
+def bucket_percentile(buckets: List[int], q: float) -> Optional[float]:
+    """Estimate the q-quantile (0..1) in ms from histogram counts,
+    interpolating linearly inside the bucket that holds it."""
+    total = sum(buckets)
+    if total == 0:
+        return None
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(buckets):
+        if count and seen + count >= rank:
+            lower = TOOL_LATENCY_BUCKETS_MS[i - 1] if i > 0 else 0
+            if i >= len(TOOL_LATENCY_BUCKETS_MS):
+                return float(lower)
+            upper = TOOL_LATENCY_BUCKETS_MS[i]
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+    return float(TOOL_LATENCY_BUCKETS_MS[-1])
+
+
+@instrument_query
+async def get_tool_usage(hours: int) -> List[dict]:
+    """Call count, failures and latency percentiles per tool over the last
+    ``hours`` hours, read from the hourly rollups (at most ``hours`` + 1
+    rows per tool, whatever the traffic)."""
+    since = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours)
+    async with get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                    SELECT tool_name, calls, failures, total_ms, latency_buckets
+                    FROM tool_usage_hourly
+                    WHERE hour >= %s
+                    ORDER BY tool_name;
+                """,
+                (since,),
+            )
+            rows = await cur.fetchall()
+    totals: Dict[str, list] = {}
+    for tool_name, calls, failures, total_ms, buckets in rows:
+        entry = totals.setdefault(tool_name, [0, 0, 0, [0] * len(buckets)])
+        entry[0] += calls
+        entry[1] += failures
+        entry[2] += total_ms
+        entry[3] = [a + b for a, b in zip(entry[3], buckets)]
+    return [
+        {
+            "tool": tool_name,
+            "calls": calls,
+            "failures": failures,
+            "avg_ms": round(total_ms / calls, 1) if calls else None,
+            "p50_ms": bucket_percentile(buckets, 0.5),
+            "p95_ms": bucket_percentile(buckets, 0.95),
+        }
+        for tool_name, (calls, failures, total_ms, buckets) in totals.items()
+    ]
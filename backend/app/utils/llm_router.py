@@ -0,0 +1,278 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, message_chunk_to_message
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from app.utils.metrics import LLM_BACKEND_REQUESTS, LLM_BACKEND_TTFT, LLM_HEDGES
+
+# Inner models must not report tokens themselves: the router re-emits the
+# winning stream, so a hedged loser would otherwise leak into the output.
+_SILENT = {"callbacks": []}
+
+
+class Backend:
+    """One provider/model with its health: EWMAs of time to first token and
+    of the error rate, a window of recent TTFTs for the hedge deadline and a
+    circuit breaker that opens after ``failure_threshold`` consecutive
+    failures and lets a single trial through after ``cooldown`` seconds."""
+
+    def __init__(
+        self,
+        name: str,
+        model,
+        alpha: float = 0.2,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+    ):
+        self.name = name
+        self.model = model
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.ewma_ttft: Optional[float] = None
+        self.ewma_errors = 0.0
+        self.recent_ttft: Deque[float] = deque(maxlen=64)
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def available(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.trial_running)
+
+    def score(self) -> float:
+        # Untried backends score 0 so each gets sampled once.
+        return (self.ewma_ttft or 0.0) * (1 + 4 * self.ewma_errors)
+
+    def p95_ttft(self) -> Optional[float]:
+        if len(self.recent_ttft) < 5:
+            return None
+        ordered = sorted(self.recent_ttft)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def record_ttft(self, seconds: float) -> None:
+        self.recent_ttft.append(seconds)
+        self.ewma_ttft = seconds if self.ewma_ttft is None else self.ewma_ttft + self.alpha * (seconds - self.ewma_ttft)
+        LLM_BACKEND_TTFT.labels(self.name).observe(seconds)
+
+    def record_success(self) -> None:
+        self.ewma_errors += self.alpha * (0.0 - self.ewma_errors)
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        LLM_BACKEND_REQUESTS.labels(self.name, "ok").inc()
+
+    def record_failure(self) -> None:
+        self.ewma_errors += self.alpha * (1.0 - self.ewma_errors)
+        self.consecutive_failures += 1
+        self.trial_running = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"⚠️ LLM backend {self.name} circuit opened")
+            self.opened_at = time.monotonic()
+        LLM_BACKEND_REQUESTS.labels(self.name, "error").inc()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "ewma_ttft": round(self.ewma_ttft, 3) if self.ewma_ttft is not None else None,
+            "p95_ttft": self.p95_ttft(),
+            "error_rate": round(self.ewma_errors, 3),
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class _Attempt:
+    """A started stream on one backend and the task fetching its first chunk."""
+
+    def __init__(self, backend: Backend, model, messages, stop, kwargs, hedge: bool = False):
+        self.backend = backend
+        self.hedge = hedge
+        self.started = time.perf_counter()
+        if backend.state == "half_open":
+            backend.trial_running = True
+        self.stream = model.astream(messages, config=_SILENT, stop=stop, **kwargs).__aiter__()
+        self.first = asyncio.ensure_future(self.stream.__anext__())
+
+    async def abandon(self) -> None:
+        self.first.cancel()
+        try:
+            await self.first
+        except BaseException:
+            pass
+        try:
+            await self.stream.aclose()
+        except Exception:
+            pass
+        self.backend.trial_running = False
+
+
+class LLMRouter(BaseChatModel):
+    """Chat model that spreads turns over several provider backends.
+
+    Each call goes to the healthy backend with the best latency/error score.
+    If its first token has not arrived by the backend's p95 TTFT (or
+    ``hedge_delay`` until enough samples exist), the same request is sent to
+    the next backend and whichever answers first is streamed; the other is
+    cancelled. Failures before the first token fail over to the next backend;
+    once tokens have been streamed an error is raised as usual.
+
+    Several routers may share the same ``Backend`` objects (and so one set
+    of latency and breaker state) while calling differently bound models,
+    given in ``models`` by backend name.
+    """
+
+    backends: List[Any]
+    models: Dict[str, Any] = {}
+    model_name: str = "router"
+    hedge: bool = True
+    hedge_delay: float = 2.0
+    hedge_min_delay: float = 0.3
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-router"
+
+    def _model(self, backend: Backend):
+        return self.models.get(backend.name, backend.model)
+
+    def ranked(self) -> List[Backend]:
+        healthy = [b for b in self.backends if b.available()]
+        if not healthy:
+            # Every circuit is open: try the one that failed longest ago.
+            return sorted(self.backends, key=lambda b: b.opened_at or 0.0)[:1]
+        return sorted(healthy, key=lambda b: b.score())
+
+    def _deadline(self, backend: Backend) -> float:
+        p95 = backend.p95_ttft()
+        return max(self.hedge_min_delay, p95 if p95 is not None else self.hedge_delay)
+
+    async def _first_chunk(self, messages, stop, kwargs) -> Tuple[_Attempt, Any]:
+        candidates = self.ranked()
+        attempts: List[_Attempt] = []
+        errors = []
+        hedged = False
+        try:
+            while True:
+                if not attempts:
+                    if not candidates:
+                        raise RuntimeError(f"All LLM backends failed: {errors}")
+                    backend = candidates.pop(0)
+                    attempts.append(_Attempt(backend, self._model(backend), messages, stop, kwargs))
+                can_hedge = self.hedge and len(attempts) == 1 and candidates
+                timeout = self._deadline(attempts[0].backend) if can_hedge else None
+                done, _ = await asyncio.wait(
+                    [a.first for a in attempts], timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = True
+                    LLM_HEDGES.labels("sent").inc()
+                    backend = candidates.pop(0)
+                    attempts.append(
+                        _Attempt(backend, self._model(backend), messages, stop, kwargs, hedge=True)
+                    )
+                    continue
+                for attempt in [a for a in attempts if a.first in done]:
+                    attempts.remove(attempt)
+                    try:
+                        chunk = attempt.first.result()
+                    except StopAsyncIteration:
+                        chunk = None
+                    except Exception as e:
+                        attempt.backend.record_failure()
+                        errors.append(f"{attempt.backend.name}: {e}")
+                        print(f"⚠️ LLM backend {attempt.backend.name} failed: {e}")
+                        continue
+                    attempt.backend.record_ttft(time.perf_counter() - attempt.started)
+                    if hedged:
+                        # "won": the hedge answered first; "lost": the original did.
+                        LLM_HEDGES.labels("won" if attempt.hedge else "lost").inc()
+                    return attempt, chunk
+        finally:
+            for loser in attempts:
+                if hedged:
+                    # Slower than the winner: count the time waited as a lower
+                    # bound so a backend that always loses stops ranking first.
+                    loser.backend.record_ttft(time.perf_counter() - loser.started)
+                await loser.abandon()
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        attempt, chunk = await self._first_chunk(messages, stop, kwargs)
+        try:
+            while chunk is not None:
+                generation = ChatGenerationChunk(message=chunk)
+                if run_manager:
+                    await run_manager.on_llm_new_token(
+                        chunk.content if isinstance(chunk.content, str) else "", chunk=generation
+                    )
+                yield generation
+                try:
+                    chunk = await attempt.stream.__anext__()
+                except StopAsyncIteration:
+                    chunk = None
+        except Exception:
+            attempt.backend.record_failure()
+            raise
+        finally:
+            # A cancelled or abandoned stream (a BaseException) counts as
+            # neither outcome, but must not leave a half-open trial claimed.
+            attempt.backend.trial_running = False
+            await attempt.stream.aclose()
+        attempt.backend.record_success()
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        response = None
+        async for generation in self._astream(messages, stop=stop, **kwargs):
+            response = generation.message if response is None else response + generation.message
+        if response is None:
+            raise ValueError("LLM returned an empty stream")
+        return ChatResult(generations=[ChatGeneration(message=message_chunk_to_message(response))])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Sync callers get plain failover without hedging.
+        errors = []
+        for backend in self.ranked():
+            try:
+                message = self._model(backend).invoke(messages, config=_SILENT, stop=stop, **kwargs)
+            except Exception as e:
+                backend.record_failure()
+                errors.append(f"{backend.name}: {e}")
+                continue
+            backend.record_success()
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        raise RuntimeError(f"All LLM backends failed: {errors}")
+
+    def stats(self) -> dict:
+        return {b.name: b.stats() for b in self.backends}
@@ -0,0 +1,299 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from app.utils.embedding import Embedder, embedder
+from app.utils.llm_models.memoryfuns import (
+    get_messages_by_ids,
+    get_thread_user,
+    insert_embeddings,
+    scan_user_embeddings,
+)
+from app.utils.metrics import MEMORY_RECALL_DURATION, MEMORY_RECALLS, instrument_query
+from app.utils.vector_index import VectorIndex
+
+load_dotenv()
+
+# (role, content) of a recalled message.
+Memory = Tuple[str, str]
+
+
+@dataclass
+class PendingEmbedding:
+    message_id: int
+    thread_id: str
+    text: str
+
+
+class ConversationMemory:
+    """Long-term recall over every message a user has sent or received.
+
+    Ingestion is off the request path: messages are queued and a background
+    task embeds them in batches, stores the float32 vectors in
+    ``embedded_messages`` and appends them to the user's index if it is
+    loaded. Indexes are loaded from Postgres on first recall, kept in an LRU
+    bounded by ``max_bytes`` and searched with VectorIndex, whose IVF layer
+    is trained in a worker thread so k-means never blocks the event loop.
+    ``recall_within``
+    enforces a hard latency budget; a cold load that misses it keeps running
+    so the next turn finds the index warm.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        enabled: bool = True,
+        k: int = 3,
+        min_score: float = 0.3,
+        min_chars: int = 20,
+        max_bytes: int = 256 * 1024 * 1024,
+        ann_threshold: int = 20_000,
+        nprobe: int = 8,
+        batch_size: int = 64,
+        max_latency: float = 0.2,
+        max_queue: int = 10_000,
+    ):
+        self.embedder = embedder
+        self.enabled = enabled
+        self.k = k
+        self.min_score = min_score
+        self.min_chars = min_chars
+        self.max_bytes = max_bytes
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self._queue: asyncio.Queue[Optional[PendingEmbedding]] = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._indexes: "OrderedDict[int, VectorIndex]" = OrderedDict()
+        self._loading: Dict[int, asyncio.Task] = {}
+        # Vectors stored while the user's index was still loading.
+        self._pending: Dict[int, List[Tuple[int, np.ndarray]]] = {}
+        self._building: Dict[int, asyncio.Task] = {}
+        self.embedded = 0
+        self.dropped = 0
+        self.failures = 0
+        self.evictions = 0
+
+    # --- Ingestion -----------------------------------------------------------
+
+    async def start(self) -> None:
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run(), name="memory-ingest")
+
+    async def stop(self) -> None:
+        for task in [*self._loading.values(), *self._building.values()]:
+            task.cancel()
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    def submit(self, message_id: Optional[int], thread_id: str, text: str) -> None:
+        """Queue a stored message for embedding. Never blocks: when the queue
+        is full the message is simply not remembered."""
+        if not self.enabled or not message_id or len(text.strip()) < self.min_chars:
+            return
+        try:
+            self._queue.put_nowait(PendingEmbedding(message_id, thread_id, text))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = (
+                        self._queue.get_nowait()
+                        if remaining <= 0
+                        else await asyncio.wait_for(self._queue.get(), remaining)
+                    )
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[PendingEmbedding]) -> None:
+        try:
+            vectors = await self.embedder.embed([item.text for item in batch])
+            stored = await insert_embeddings(
+                [
+                    (item.message_id, item.thread_id, self.embedder.name, vector.astype("<f4").tobytes())
+                    for item, vector in zip(batch, vectors)
+                ]
+            )
+        except Exception as e:
+            self.failures += 1
+            print(f"⚠️ Embedding batch of {len(batch)} failed: {e}")
+            return
+        self.embedded += len(stored)
+        by_id = {item.message_id: vector for item, vector in zip(batch, vectors)}
+        by_user: Dict[int, List[int]] = {}
+        for message_id, user_id in stored:
+            by_user.setdefault(user_id, []).append(message_id)
+        for user_id, message_ids in by_user.items():
+            index = self._indexes.get(user_id)
+            if index is not None:
+                index.add(np.array(message_ids, dtype=np.int64), np.stack([by_id[m] for m in message_ids]))
+                self._maybe_build(user_id, index)
+            elif user_id in self._loading:
+                self._pending.setdefault(user_id, []).extend((m, by_id[m]) for m in message_ids)
+
+    # --- Index loading -------------------------------------------------------
+
+    async def _index_for(self, user_id: int) -> VectorIndex:
+        index = self._indexes.get(user_id)
+        if index is not None:
+            self._indexes.move_to_end(user_id)
+            return index
+        task = self._loading.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._load(user_id))
+            self._loading[user_id] = task
+        # Shielded so a recall that times out does not abort the load.
+        return await asyncio.shield(task)
+
+    @instrument_query(name="load_user_embeddings")
+    async def _load(self, user_id: int) -> VectorIndex:
+        try:
+            index = VectorIndex(self.embedder.dim, self.ann_threshold, self.nprobe)
+            async for rows in scan_user_embeddings(user_id, self.embedder.name):
+                ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+                vectors = np.frombuffer(b"".join(row[1] for row in rows), dtype="<f4")
+                index.add(ids, vectors.reshape(len(rows), self.embedder.dim))
+            pending = self._pending.pop(user_id, [])
+            if pending:
+                index.add(
+                    np.array([m for m, _ in pending], dtype=np.int64),
+                    np.stack([v for _, v in pending]),
+                )
+            self._indexes[user_id] = index
+            self._evict()
+            self._maybe_build(user_id, index)
+            return index
+        finally:
+            self._loading.pop(user_id, None)
+            self._pending.pop(user_id, None)
+
+    def _maybe_build(self, user_id: int, index: VectorIndex) -> None:
+        if index.needs_build and user_id not in self._building:
+            self._building[user_id] = asyncio.create_task(self._build(user_id, index))
+
+    async def _build(self, user_id: int, index: VectorIndex) -> None:
+        try:
+            centroids, lists = await asyncio.to_thread(index.train, len(index))
+            index.install(centroids, lists)
+        except Exception as e:
+            print(f"⚠️ Vector index build failed for user {user_id}: {e}")
+        finally:
+            self._building.pop(user_id, None)
+
+    def _evict(self) -> None:
+        total = sum(index.nbytes for index in self._indexes.values())
+        while total > self.max_bytes and len(self._indexes) > 1:
+            _, index = self._indexes.popitem(last=False)
+            total -= index.nbytes
+            self.evictions += 1
+
+    # --- Recall --------------------------------------------------------------
+
+    async def recall(
+        self, thread_id: str, query: str, window_start: Optional[int] = None
+    ) -> List[Memory]:
+        """Top-k past messages of the thread owner most similar to ``query``.
+        Messages of this thread from ``window_start`` on are already in the
+        prompt and skipped (all of them when ``window_start`` is None)."""
+        user_id = await get_thread_user(thread_id)
+        if user_id is None:
+            return []
+        index = await self._index_for(user_id)
+        query_vector = (await self.embedder.embed([query]))[0]
+        # Over-fetch to make room for hits that belong to the current window.
+        hits = [
+            (message_id, score)
+            for message_id, score in index.search(query_vector, self.k * 4)
+            if score >= self.min_score
+        ]
+        if not hits:
+            return []
+        rows = {row[0]: row for row in await get_messages_by_ids([m for m, _ in hits])}
+        memories: List[Memory] = []
+        seen = set()
+        for message_id, _ in hits:
+            row = rows.get(message_id)
+            if row is None or message_id in seen:
+                continue
+            seen.add(message_id)
+            _, row_thread, role, content = row
+            if row_thread == thread_id and (window_start is None or message_id >= window_start):
+                continue
+            memories.append((role, content))
+            if len(memories) == self.k:
+                break
+        return memories
+
+    async def recall_within(
+        self, thread_id: str, query: str, budget: float, window_start: Optional[int] = None
+    ) -> List[Memory]:
+        if not self.enabled:
+            return []
+        started = time.perf_counter()
+        try:
+            memories = await asyncio.wait_for(self.recall(thread_id, query, window_start), budget)
+            MEMORY_RECALLS.labels("hit" if memories else "empty").inc()
+            return memories
+        except asyncio.TimeoutError:
+            MEMORY_RECALLS.labels("timeout").inc()
+            return []
+        except Exception as e:
+            MEMORY_RECALLS.labels("error").inc()
+            print(f"⚠️ Memory recall failed for {thread_id}: {e}")
+            return []
+        finally:
+            MEMORY_RECALL_DURATION.observe(time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "embedder": self.embedder.name,
+            "queued": self._queue.qsize(),
+            "embedded": self.embedded,
+            "dropped": self.dropped,
+            "failures": self.failures,
+            "users_loaded": len(self._indexes),
+            "users_loading": len(self._loading),
+            "indexes_building": len(self._building),
+            "vectors": sum(len(index) for index in self._indexes.values()),
+            "bytes": sum(index.nbytes for index in self._indexes.values()),
+            "evictions": self.evictions,
+        }
+
+
+memory = ConversationMemory(
+    embedder,
+    enabled=os.getenv("MEMORY_ENABLED", "true").lower() == "true",
+    k=int(os.getenv("MEMORY_TOP_K", "3")),
+    min_score=float(os.getenv("MEMORY_MIN_SCORE", "0.3")),
+    max_bytes=int(os.getenv("MEMORY_MAX_BYTES", str(256 * 1024 * 1024))),
+    ann_threshold=int(os.getenv("MEMORY_ANN_THRESHOLD", "20000")),
+    nprobe=int(os.getenv("MEMORY_ANN_NPROBE", "8")),
+    batch_size=int(os.getenv("MEMORY_EMBED_BATCH_SIZE", "64")),
+    max_latency=float(os.getenv("MEMORY_EMBED_MAX_LATENCY_MS", "200")) / 1000,
+)
+
+RECALL_BUDGET = float(os.getenv("MEMORY_RECALL_BUDGET_MS", "150")) / 1000
@@ -0,0 +1,316 @@
+import bisect
+import functools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Recording is lock-free: every thread writes into its own shard (a plain
+# list keyed by thread id) and shards are only summed when /metrics is
+# scraped. On the event loop thread that makes an observation a dict lookup,
+# a bisect and two list increments.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 400, 800, 1600)
+ROW_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 500, 1000, 10000)
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("_shards",)
+
+    def __init__(self):
+        self._shards: Dict[int, List[float]] = {}
+
+    def inc(self, amount: float = 1) -> None:
+        shard = self._shards.get(threading.get_ident())
+        if shard is None:
+            shard = self._shards.setdefault(threading.get_ident(), [0.0])
+        shard[0] += amount
+
+    def value(self) -> float:
+        return sum(shard[0] for shard in list(self._shards.values()))
+
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_shards")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        self._shards: Dict[int, List[float]] = {}
+
+    def observe(self, value: float) -> None:
+        shard = self._shards.get(threading.get_ident())
+        if shard is None:
+            # One slot per bucket, +Inf, then sum and count.
+            shard = self._shards.setdefault(threading.get_ident(), [0.0] * (len(self._buckets) + 3))
+        shard[bisect.bisect_left(self._buckets, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+
+    def snapshot(self) -> List[float]:
+        total = [0.0] * (len(self._buckets) + 3)
+        for shard in list(self._shards.values()):
+            for i, v in enumerate(shard):
+                total[i] += v
+        return total
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        registry.register(self)
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def render(self) -> Iterable[str]:
+        yield from super().render()
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value())}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def render(self) -> Iterable[str]:
+        yield from super().render()
+        for values, child in list(self._children.items()):
+            snapshot = child.snapshot()
+            cumulative = 0.0
+            for bound, count in zip(list(self.buckets) + ["+Inf"], snapshot[:-2]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {_format_value(cumulative)}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(snapshot[-2])}"
+            yield f"{self.name}_count{labels} {_format_value(snapshot[-1])}"
+
+
+class Gauge(_Metric):
+    """Gauge read from a callback at scrape time. The callback returns either
+    a number or a dict mapping label tuples to numbers."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], object], labelnames: Sequence[str] = ()):
+        self.fn = fn
+        super().__init__(name, help, labelnames)
+
+    def render(self) -> Iterable[str]:
+        try:
+            value = self.fn()
+        except Exception as e:
+            print(f"⚠️ Gauge {self.name} failed: {e}")
+            return
+        yield from super().render()
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for values, v in items:
+            values = values if isinstance(values, tuple) else (values,)
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(v or 0)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- Streaming -------------------------------------------------------------
+
+STREAM_TTFT = Histogram(
+    "langbot_stream_ttft_seconds", "Time from request to first streamed token."
+)
+STREAM_DURATION = Histogram(
+    "langbot_stream_duration_seconds", "Total duration of a streamed response."
+)
+STREAM_TOKENS_PER_SECOND = Histogram(
+    "langbot_stream_tokens_per_second",
+    "Streamed chunks per second after the first token.",
+    buckets=RATE_BUCKETS,
+)
+STREAM_ERRORS = Counter(
+    "langbot_stream_errors_total", "Errors raised while streaming, by exception type.", ["type"]
+)
+
+STREAM_CANCELLED = Counter(
+    "langbot_stream_cancelled_total",
+    "Generations cancelled before finishing, by reason (client, abandoned, deleted, shutdown).",
+    ["reason"],
+)
+
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "langbot_response_cache_lookups_total",
+    "Response cache lookups by result (hit, miss, bypass).",
+    ["result"],
+)
+
+# --- LLM backends ------------------------------------------------------------
+
+LLM_BACKEND_TTFT = Histogram(
+    "langbot_llm_backend_ttft_seconds", "Time to first chunk per LLM backend.", ["backend"]
+)
+LLM_BACKEND_REQUESTS = Counter(
+    "langbot_llm_backend_requests_total", "LLM backend calls by result (ok, error).", ["backend", "result"]
+)
+LLM_HEDGES = Counter(
+    "langbot_llm_hedges_total", "Hedged LLM requests (sent) and which call answered first (won, lost).", ["result"]
+)
+
+# --- Admission -------------------------------------------------------------
+
+ADMISSION_WAIT = Histogram(
+    "langbot_admission_wait_seconds", "Time a generation waited for a slot."
+)
+ADMISSION_REJECTIONS = Counter(
+    "langbot_admission_rejections_total",
+    "Generations rejected with 429, by reason (rate_limited, queue_full, queue_timeout).",
+    ["reason"],
+)
+
+# --- Memory ----------------------------------------------------------------
+
+MEMORY_RECALL_DURATION = Histogram(
+    "langbot_memory_recall_seconds", "Long-term memory recall latency, including timeouts."
+)
+MEMORY_RECALLS = Counter(
+    "langbot_memory_recalls_total", "Memory recalls by result (hit, empty, timeout, error).", ["result"]
+)
+
+# --- Tools -----------------------------------------------------------------
+
+TOOL_DURATION = Histogram("langbot_tool_duration_seconds", "Tool call latency.", ["tool"])
+TOOL_FAILURES = Counter("langbot_tool_failures_total", "Failed tool calls.", ["tool"])
+TOOL_TIMEOUTS = Counter("langbot_tool_timeouts_total", "Tool calls cut off by their timeout.", ["tool"])
+TOOL_REJECTIONS = Counter(
+    "langbot_tool_rejections_total",
+    "Tool calls refused by the per-turn budget, by reason (budget_calls, budget_time).",
+    ["reason"],
+)
+
+# --- Purge -----------------------------------------------------------------
+
+PURGED_ROWS = Counter(
+    "langbot_purged_rows_total", "Rows and stored objects removed by the background purger.", ["kind"]
+)
+
+# --- Database --------------------------------------------------------------
+
+DB_QUERY_DURATION = Histogram(
+    "langbot_db_query_duration_seconds", "Statement execution latency.", ["query"]
+)
+DB_QUERY_ROWS = Histogram(
+    "langbot_db_query_rows", "Rows returned or affected per statement.", ["query"], buckets=ROW_BUCKETS
+)
+
+current_query: ContextVar[str] = ContextVar("current_query", default="other")
+
+
+def instrument_query(fn=None, *, name: str | None = None):
+    """Label every statement executed inside ``fn`` with ``name`` (defaults
+    to the function name)."""
+
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            token = current_query.set(label)
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                current_query.reset(token)
+
+        return wrapper
+
+    return decorator(fn) if fn is not None else decorator
+
+
+def observe_query(elapsed: float, rows: int) -> None:
+    name = current_query.get()
+    DB_QUERY_DURATION.labels(name).observe(elapsed)
+    if rows >= 0:
+        DB_QUERY_ROWS.labels(name).observe(rows)
+
+
+def instrument_tool(name: str, failed: Callable[[object], bool] = lambda result: False):
+    """Record latency and failures of an async tool function. Tools here
+    report errors in their return value, so ``failed`` inspects it."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception:
+                TOOL_FAILURES.labels(name).inc()
+                raise
+            finally:
+                TOOL_DURATION.labels(name).observe(time.perf_counter() - started)
+            if failed(result):
+                TOOL_FAILURES.labels(name).inc()
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,100 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class HasherOverloaded(Exception):
+    """Raised when the hashing queue is full and the request should be shed."""
+
+
+def _hashpw(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _checkpw(password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+def hash_rounds(hashed_password: str) -> int:
+    """Cost factor of a bcrypt hash such as ``$2b$12$...``"""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded executor so it never blocks the event loop.
+
+    At most ``max_workers`` hashes run at once and at most ``max_queue`` more
+    may wait; anything beyond that raises HasherOverloaded immediately so the
+    route can answer 503 instead of piling up work.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, rounds: int, use_processes: bool = False):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self.use_processes = use_processes
+        self._executor: Executor | None = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # bcrypt releases the GIL while hashing, so threads scale across
+            # cores; processes are available for interpreters where it doesn't.
+            self._executor = (
+                ProcessPoolExecutor(max_workers=self.max_workers)
+                if self.use_processes
+                else ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+            )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise HasherOverloaded("Password hashing queue is full")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hashpw, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(_checkpw, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        return hash_rounds(hashed_password) < self.rounds
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "rounds": self.rounds,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher(
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    max_queue=int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64")),
+    rounds=int(os.getenv("BCRYPT_ROUNDS", "12")),
+    use_processes=os.getenv("PASSWORD_HASH_EXECUTOR", "thread") == "process",
+)
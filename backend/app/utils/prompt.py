@@ -0,0 +1,35 @@
+import functools
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple
+from langchain_core.messages import BaseMessage, SystemMessage
+from app.utils.context_builder import context_builder
+
+# Everything before the date is identical for every request, so providers
+# that cache prompt prefixes can reuse it. Volatile data goes last and is
+# coarsened to the day so the full system message only changes once a day.
+SYSTEM_PREFIX = (
+    "You are a helpful, concise AI assistant that helps users through natural conversation.\n"
+    "Guidelines:\n"
+    "- Use tools (brave_search, generate_image) only when strictly necessary; tools are expensive.\n"
+    "- After receiving any tool output, do NOT call another tool; instead finalize your response.\n"
+    "- Keep answers as short and clear as possible — no filler or repetition.\n"
+    "- If uncertain, ask for clarification before answering.\n"
+    "- Do not restate instructions, disclaimers, or obvious facts.\n"
+)
+
+
+def current_day() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+@functools.lru_cache(maxsize=2)
+def system_message(day: str) -> SystemMessage:
+    return SystemMessage(content=f"{SYSTEM_PREFIX}- Assume the current date is {day} (UTC).")
+
+
+def build_prompt(
+    messages: List[BaseMessage],
+    summary: Optional[str] = None,
+    memories: Sequence[Tuple[str, str]] = (),
+) -> List[BaseMessage]:
+    return context_builder.build(system_message(current_day()), messages, summary, memories)
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from dotenv import load_dotenv
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from app.utils.cache import TTLCache
+from app.utils.metrics import RESPONSE_CACHE_LOOKUPS
+
+load_dotenv()
+
+
+class ReplayChatModel(BaseChatModel):
+    """Streams a cached answer back chunk by chunk. Running it as a chat model
+    means the replay emits the same callbacks as a live completion, so
+    workflow.astream(stream_mode="messages") forwards it unchanged."""
+
+    chunks: List[str]
+
+    @property
+    def _llm_type(self) -> str:
+        return "response-cache-replay"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self.chunks)))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for text in self.chunks:
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for text in self.chunks:
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+
+def _normalize(message: BaseMessage) -> Dict[str, Any]:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, sort_keys=True)
+    entry: Dict[str, Any] = {"role": message.type, "content": " ".join(content.split())}
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        # Tool call ids are random per call, so only name and args count.
+        entry["tool_calls"] = [[call["name"], call.get("args", {})] for call in tool_calls]
+    if message.type == "tool":
+        entry["name"] = getattr(message, "name", None)
+    return entry
+
+
+def model_fingerprint(llm) -> str:
+    """Settings that change the answer: model class, name, temperature and
+    bound kwargs such as the tool schemas."""
+    model = getattr(llm, "bound", llm)
+    return json.dumps(
+        {
+            "type": type(model).__name__,
+            "model": getattr(model, "model_name", None) or getattr(model, "model", None),
+            "temperature": getattr(model, "temperature", None),
+            "kwargs": getattr(llm, "kwargs", {}),
+        },
+        sort_keys=True,
+        default=str,
+    )
+
+
+class ResponseCache:
+    """Exact-match cache of final assistant answers.
+
+    Keys are a sha256 of the model settings plus the normalized prompt (system
+    prefix and context window), values are the streamed chunks so a hit is
+    replayed with the original granularity. Only plain text answers are
+    stored; a response that calls a tool always goes to the provider.
+    """
+
+    def __init__(self, enabled: bool, max_entries: int, ttl: float):
+        self.enabled = enabled
+        self.cache = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._fingerprints: Dict[int, str] = {}
+        self.bypassed = 0
+
+    def key(self, llm, prompt: List[BaseMessage]) -> str:
+        fingerprint = self._fingerprints.get(id(llm))
+        if fingerprint is None:
+            fingerprint = self._fingerprints.setdefault(id(llm), model_fingerprint(llm))
+        payload = json.dumps([fingerprint, [_normalize(m) for m in prompt]], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> Optional[ReplayChatModel]:
+        chunks = self.cache.get(key)
+        RESPONSE_CACHE_LOOKUPS.labels("hit" if chunks is not None else "miss").inc()
+        return ReplayChatModel(chunks=chunks) if chunks is not None else None
+
+    def bypass(self) -> None:
+        self.bypassed += 1
+        RESPONSE_CACHE_LOOKUPS.labels("bypass").inc()
+
+    def store(self, key: str, message: BaseMessage, chunks: List[str]) -> None:
+        if getattr(message, "tool_calls", None) or not isinstance(message.content, str) or not message.content:
+            return
+        self.cache.set(key, chunks)
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, **self.cache.stats(), "bypassed": self.bypassed}
+
+
+response_cache = ResponseCache(
+    enabled=os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true",
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+)
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import threading
+from typing import Dict, List, Protocol
+from ddgs import DDGS
+from dotenv import load_dotenv
+from app.utils.cache import TTLCache
+
+load_dotenv()
+
+SearchResult = Dict[str, str]
+
+
+class SearchBackend(Protocol):
+    async def search(self, query: str, max_results: int) -> List[SearchResult]: ...
+
+
+class DDGSBackend:
+    """DuckDuckGo backend. DDGS is synchronous, so calls run in the default
+    executor and every worker thread keeps one client alive for reuse."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _client(self) -> DDGS:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = DDGS()
+            self._local.client = client
+        return client
+
+    def _search(self, query: str, max_results: int) -> List[SearchResult]:
+        return [
+            {"title": r["title"], "url": r["href"], "snippet": r["body"][:200]}
+            for r in self._client().text(query, max_results=max_results)
+        ]
+
+    async def search(self, query: str, max_results: int) -> List[SearchResult]:
+        return await asyncio.to_thread(self._search, query, max_results)
+
+
+class LocalSearchBackend:
+    """Offline stand-in that returns canned results and counts upstream calls."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    async def search(self, query: str, max_results: int) -> List[SearchResult]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [
+            {
+                "title": f"Result {i + 1} for {query}",
+                "url": f"https://example.com/search/{i + 1}",
+                "snippet": f"Local stand-in result {i + 1} for '{query}'.",
+            }
+            for i in range(max_results)
+        ]
+
+
+def _retrieve_exception(future: asyncio.Future) -> None:
+    # Mark the exception as retrieved when every waiter was cancelled.
+    if not future.cancelled():
+        future.exception()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class SearchService:
+    """Cached, coalescing front for a SearchBackend.
+
+    Results are kept in a bounded LRU+TTL cache keyed on the normalized query,
+    and concurrent lookups of the same query share a single upstream call.
+    """
+
+    def __init__(
+        self,
+        backend: SearchBackend,
+        max_entries: int = 1024,
+        ttl: float = 900.0,
+        max_results: int = 3,
+    ):
+        self.backend = backend
+        self.max_results = max_results
+        self.cache = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    async def search(self, query: str) -> List[SearchResult]:
+        key = normalize_query(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+        else:
+            # The fetch runs as its own task and every caller, the first one
+            # included, waits on it shielded: a caller that is cancelled
+            # leaves the fetch running for the others.
+            pending = asyncio.ensure_future(self._fetch(key))
+            pending.add_done_callback(_retrieve_exception)
+            self._inflight[key] = pending
+        return await asyncio.shield(pending)
+
+    async def _fetch(self, key: str) -> List[SearchResult]:
+        try:
+            self.upstream_calls += 1
+            results = await self.backend.search(key, self.max_results)
+            self.cache.set(key, results)
+            return results
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            **self.cache.stats(),
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
+
+
+def build_search_service() -> SearchService:
+    backend_name = os.getenv("SEARCH_BACKEND", "ddgs")
+    backend: SearchBackend = (
+        LocalSearchBackend(latency=float(os.getenv("SEARCH_LOCAL_LATENCY_MS", "0")) / 1000)
+        if backend_name == "local"
+        else DDGSBackend()
+    )
+    return SearchService(
+        backend,
+        max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024")),
+        ttl=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "900")),
+    )
+
+
+search_service = build_search_service()
@@ -0,0 +1,291 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Deque, Dict, Optional, Set, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    # Stop nginx-style proxies from buffering the whole response.
+    "X-Accel-Buffering": "no",
+}
+
+
+def format_event(event_id: str, event: str, data: dict) -> bytes:
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n".encode("utf-8")
+
+
+def parse_event_id(last_event_id: str) -> Tuple[str, int]:
+    """Split a ``<stream_id>:<seq>`` event id. Raises ValueError."""
+    stream_id, _, seq = last_event_id.rpartition(":")
+    if not stream_id:
+        raise ValueError("Invalid Last-Event-ID")
+    return stream_id, int(seq)
+
+
+class EventStream:
+    """One generation job: the background task producing a turn and its
+    numbered SSE frames in a bounded replay buffer.
+
+    The producer publishes independently of any HTTP connection; any number
+    of clients subscribe from a sequence number, so a reconnect with
+    Last-Event-ID (or a second tab) replays what it missed from the ring
+    buffer and then follows live. Tokens are coalesced before framing: the
+    first token goes out at once, later ones are held until
+    ``coalesce_bytes`` accumulate or ``coalesce_delay`` passes, and any other
+    event flushes them first. When the last subscriber leaves, the job is
+    cancelled unless someone attaches within ``abandon_grace`` seconds; the
+    same holds from creation until the first subscriber arrives.
+    """
+
+    def __init__(
+        self,
+        stream_id: str,
+        thread_id: str,
+        max_events: int = 1024,
+        coalesce_bytes: int = 512,
+        coalesce_delay: float = 0.05,
+        abandon_grace: float = 30.0,
+    ):
+        self.stream_id = stream_id
+        self.thread_id = thread_id
+        self.coalesce_bytes = coalesce_bytes
+        self.coalesce_delay = coalesce_delay
+        self.abandon_grace = abandon_grace
+        self.subscribers = 0
+        self.cancel_reason: Optional[str] = None
+        self._abandon_handle: Optional[asyncio.TimerHandle] = None
+        self.events: Deque[Tuple[int, bytes]] = deque(maxlen=max_events)
+        self.seq = 0
+        self.closed = False
+        self.closed_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.frames_sent = 0
+        self.tokens_in = 0
+        self._pending: list[str] = []
+        self._pending_bytes = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._changed = asyncio.get_running_loop().create_future()
+        # Armed from the start: a client that leaves before the response body
+        # begins never subscribes, and the job must not outlive it.
+        self._arm_abandon()
+
+    def _wake(self) -> None:
+        if not self._changed.done():
+            self._changed.set_result(None)
+        self._changed = asyncio.get_running_loop().create_future()
+
+    def publish(self, event: str, data: dict) -> None:
+        self._flush_tokens()
+        self._append(event, data)
+
+    def _append(self, event: str, data: dict) -> None:
+        self.seq += 1
+        self.events.append((self.seq, format_event(f"{self.stream_id}:{self.seq}", event, data)))
+        self.frames_sent += 1
+        self._wake()
+
+    def token(self, text: str) -> None:
+        self.tokens_in += 1
+        self._pending.append(text)
+        self._pending_bytes += len(text.encode("utf-8"))
+        if self.tokens_in == 1 or self._pending_bytes >= self.coalesce_bytes:
+            self._flush_tokens()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.coalesce_delay, self._flush_tokens
+            )
+
+    def _flush_tokens(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending.clear()
+        self._pending_bytes = 0
+        self._append("token", {"text": text})
+
+    def close(self) -> None:
+        self._flush_tokens()
+        if self._abandon_handle is not None:
+            self._abandon_handle.cancel()
+            self._abandon_handle = None
+        self.closed = True
+        self.closed_at = time.monotonic()
+        self._wake()
+
+    def cancel(self, reason: str) -> bool:
+        """Abort the producer task, which stops the upstream LLM call."""
+        if self.closed or self.task is None or self.task.done():
+            return False
+        self.cancel_reason = reason
+        self.task.cancel()
+        return True
+
+    def _arm_abandon(self) -> None:
+        self._abandon_handle = asyncio.get_running_loop().call_later(
+            self.abandon_grace, self._abandoned
+        )
+
+    def _abandoned(self) -> None:
+        self._abandon_handle = None
+        if self.subscribers == 0:
+            self.cancel("abandoned")
+
+    async def subscribe(self, after: int = 0) -> AsyncIterator[bytes]:
+        self.subscribers += 1
+        if self._abandon_handle is not None:
+            self._abandon_handle.cancel()
+            self._abandon_handle = None
+        try:
+            async for frame in self._frames(after):
+                yield frame
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.closed:
+                self._arm_abandon()
+
+    async def _frames(self, after: int) -> AsyncIterator[bytes]:
+        while True:
+            if self.events and self.events[0][0] > after + 1:
+                # The client fell further behind than the buffer reaches.
+                yield format_event(
+                    f"{self.stream_id}:{after}",
+                    "error",
+                    {"message": "Replay window exceeded; some output was lost."},
+                )
+                after = self.events[0][0] - 1
+            changed = self._changed
+            first = self.events[0][0] if self.events else self.seq + 1
+            for seq, frame in list(islice(self.events, max(0, after + 1 - first), None)):
+                after = seq
+                yield frame
+            if self.closed and after >= self.seq:
+                return
+            if after >= self.seq:
+                # Shared by every subscriber: shielded so one client
+                # disconnecting doesn't cancel it under the others.
+                await asyncio.shield(changed)
+
+
+class StreamRegistry:
+    """Live and recently finished generation jobs, by stream id and by
+    thread, so clients can resume, attach from another tab or cancel."""
+
+    def __init__(
+        self,
+        max_events: int,
+        retention: float,
+        coalesce_bytes: int,
+        coalesce_delay: float,
+        abandon_grace: float,
+    ):
+        self.max_events = max_events
+        self.retention = retention
+        self.coalesce_bytes = coalesce_bytes
+        self.coalesce_delay = coalesce_delay
+        self.abandon_grace = abandon_grace
+        self._streams: Dict[str, EventStream] = {}
+        self._live: Dict[str, str] = {}
+        # Threads whose request passed the live check and has not created
+        # its stream yet (it may still be waiting for admission).
+        self._claimed: Set[str] = set()
+        self.resumed = 0
+        self.attached = 0
+        self.cancelled: Dict[str, int] = {}
+
+    def claim(self, thread_id: str) -> bool:
+        """Reserve the thread for one new generation. Synchronous, so a
+        check-and-claim done before the request's first await cannot race
+        another request for the same thread. False if it is taken."""
+        if thread_id in self._claimed or self.live_for_thread(thread_id) is not None:
+            return False
+        self._claimed.add(thread_id)
+        return True
+
+    def release(self, thread_id: str) -> None:
+        """Drop a claim that did not lead to a stream; no-op after create."""
+        self._claimed.discard(thread_id)
+
+    def create(self, thread_id: str) -> EventStream:
+        self._expire()
+        self._claimed.discard(thread_id)
+        stream = EventStream(
+            uuid.uuid4().hex,
+            thread_id,
+            max_events=self.max_events,
+            coalesce_bytes=self.coalesce_bytes,
+            coalesce_delay=self.coalesce_delay,
+            abandon_grace=self.abandon_grace,
+        )
+        self._streams[stream.stream_id] = stream
+        self._live[thread_id] = stream.stream_id
+        return stream
+
+    def get(self, stream_id: str) -> Optional[EventStream]:
+        self._expire()
+        return self._streams.get(stream_id)
+
+    def live_for_thread(self, thread_id: str) -> Optional[EventStream]:
+        stream = self._streams.get(self._live.get(thread_id, ""))
+        if stream is None or stream.closed:
+            self._live.pop(thread_id, None)
+            return None
+        return stream
+
+    def cancel_thread(self, thread_id: str, reason: str = "client") -> bool:
+        stream = self.live_for_thread(thread_id)
+        return stream is not None and stream.cancel(reason)
+
+    def record_cancel(self, reason: str) -> None:
+        self.cancelled[reason] = self.cancelled.get(reason, 0) + 1
+
+    async def stop(self) -> None:
+        """Cancel every running job and wait for them to save what they have."""
+        tasks = []
+        for stream in list(self._streams.values()):
+            if stream.cancel("shutdown"):
+                tasks.append(stream.task)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.retention
+        for stream_id, stream in list(self._streams.items()):
+            if stream.closed and stream.closed_at is not None and stream.closed_at < cutoff:
+                del self._streams[stream_id]
+                if self._live.get(stream.thread_id) == stream_id:
+                    del self._live[stream.thread_id]
+
+    def stats(self) -> dict:
+        live = sum(1 for s in self._streams.values() if not s.closed)
+        frames = sum(s.frames_sent for s in self._streams.values())
+        tokens = sum(s.tokens_in for s in self._streams.values())
+        return {
+            "live": live,
+            "claimed": len(self._claimed),
+            "retained": len(self._streams) - live,
+            "subscribers": sum(s.subscribers for s in self._streams.values()),
+            "resumed": self.resumed,
+            "attached": self.attached,
+            "cancelled": dict(self.cancelled),
+            "tokens_per_frame": round(tokens / frames, 2) if frames else 0.0,
+        }
+
+
+stream_registry = StreamRegistry(
+    max_events=int(os.getenv("SSE_REPLAY_EVENTS", "1024")),
+    retention=float(os.getenv("SSE_REPLAY_RETENTION_SECONDS", "120")),
+    coalesce_bytes=int(os.getenv("SSE_COALESCE_BYTES", "512")),
+    coalesce_delay=float(os.getenv("SSE_COALESCE_MS", "50")) / 1000,
+    abandon_grace=float(os.getenv("STREAM_ABANDON_GRACE_SECONDS", "30")),
+)
@@ -0,0 +1,113 @@
+import asyncio
+import base64
+import mimetypes
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Dict, Protocol
+import cloudinary
+import cloudinary.uploader
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHUNK_SIZE = 64 * 1024
+# Base64 slices must be a multiple of 4 characters to decode independently.
+B64_CHUNK_SIZE = (CHUNK_SIZE // 3) * 4
+SPOOL_MAX_BYTES = 1024 * 1024
+FOLDER = "lang-bot"
+
+UploadResult = Dict[str, str]  # {"secure_url", "public_id"}
+
+
+class ImageStorage(Protocol):
+    async def upload(self, chunks: AsyncIterator[bytes], content_type: str) -> UploadResult: ...
+
+    async def delete(self, public_id: str) -> None: ...
+
+
+async def iter_base64_chunks(encoded: str) -> AsyncIterator[bytes]:
+    """Decode a base64 payload slice by slice instead of materializing it."""
+    for start in range(0, len(encoded), B64_CHUNK_SIZE):
+        yield base64.b64decode(encoded[start : start + B64_CHUNK_SIZE])
+
+
+class CloudinaryStorage:
+    """Cloudinary backend. The SDK is blocking, so the payload is spooled
+    (in memory up to SPOOL_MAX_BYTES, then on disk) and the upload itself
+    runs in a worker thread, as does every spool write, since past the
+    threshold those are disk writes."""
+
+    def __init__(self):
+        cloudinary.config(
+            cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            api_key=os.getenv("CLOUDINARY_API_KEY"),
+            api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+        )
+
+    async def upload(self, chunks: AsyncIterator[bytes], content_type: str) -> UploadResult:
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(spool.write, chunk)
+            await asyncio.to_thread(spool.seek, 0)
+            response = await asyncio.to_thread(
+                cloudinary.uploader.upload,
+                spool,
+                folder=FOLDER,
+                resource_type="image",
+            )
+        finally:
+            await asyncio.to_thread(spool.close)
+        return {
+            "secure_url": response.get("secure_url"),
+            "public_id": response.get("public_id"),
+        }
+
+    async def delete(self, public_id: str) -> None:
+        await asyncio.to_thread(
+            cloudinary.uploader.destroy, public_id, resource_type="image"
+        )
+
+
+class LocalFileStorage:
+    """Filesystem stand-in for tests and local benchmarks."""
+
+    def __init__(self, root: str, base_url: str | None = None):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/") if base_url else None
+
+    def _path(self, public_id: str) -> Path:
+        return self.root / public_id
+
+    async def upload(self, chunks: AsyncIterator[bytes], content_type: str) -> UploadResult:
+        extension = mimetypes.guess_extension(content_type.split(";")[0].strip()) or ".bin"
+        public_id = f"{FOLDER}/{uuid.uuid4().hex}{extension}"
+        path = self._path(public_id)
+        await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+        f = await asyncio.to_thread(open, path, "wb")
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(f.write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+        secure_url = (
+            f"{self.base_url}/{public_id}" if self.base_url else path.resolve().as_uri()
+        )
+        return {"secure_url": secure_url, "public_id": public_id}
+
+    async def delete(self, public_id: str) -> None:
+        await asyncio.to_thread(self._path(public_id).unlink, missing_ok=True)
+
+
+def build_image_storage() -> ImageStorage:
+    if os.getenv("IMAGE_STORAGE_BACKEND", "cloudinary") == "local":
+        return LocalFileStorage(
+            os.getenv("IMAGE_STORAGE_DIR", "./.images"),
+            os.getenv("IMAGE_STORAGE_BASE_URL"),
+        )
+    return CloudinaryStorage()
+
+
+image_storage = build_image_storage()
@@ -0,0 +1,164 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage, SystemMessage
+from app.utils import llm as llm_module
+from app.utils.cache import TTLCache
+from app.utils.context_builder import truncate_to_tokens
+from app.utils.context_cache import context_cache
+from app.utils.llm_models.summaryfuns import (
+    get_thread_summary,
+    get_unsummarized_messages,
+    save_thread_summary,
+)
+
+load_dotenv()
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an assistant.\n"
+    "Update the current summary with the new messages. Keep facts, names, decisions, "
+    "open questions and user preferences; drop greetings and filler.\n"
+    "Reply with the updated summary only, at most {max_words} words."
+)
+
+# Per-message cap inside the transcript handed to the summarizer.
+TRANSCRIPT_MESSAGE_TOKENS = 200
+
+
+class ThreadSummarizer:
+    """Maintains a rolling per-thread summary of the turns that have fallen
+    out of the verbatim context window.
+
+    After each persisted turn the thread is scheduled in the background; once
+    at least ``min_batch`` messages are older than the oldest one the context
+    builder kept in the last prompt (see ``track_window``; the ``keep_recent``
+    newest when no prompt was built here yet), they are folded into the existing summary with one LLM call and the
+    summary row records the highest message id it covers. The summary is
+    extended, never regenerated from scratch, so each update costs one
+    bounded prompt regardless of thread length.
+    """
+
+    def __init__(self, keep_recent: int, min_batch: int, max_batch: int, max_tokens: int):
+        self.keep_recent = keep_recent
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.max_tokens = max_tokens
+        self._summaries = TTLCache(max_entries=10_000, ttl=300.0)
+        self._windows = TTLCache(max_entries=10_000, ttl=3600.0)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._rerun: Set[str] = set()
+        self.updates = 0
+        self.folded_messages = 0
+        self.fallbacks = 0
+        self.failures = 0
+
+    async def get(self, thread_id: str) -> Optional[str]:
+        cached: Optional[Tuple[str, int]] = self._summaries.get(thread_id)
+        if cached is None:
+            cached = await get_thread_summary(thread_id) or ("", 0)
+            self._summaries.set(thread_id, cached)
+        return cached[0] or None
+
+    def track_window(self, thread_id: str, window_start: Optional[int]) -> None:
+        """Record the oldest message the prompt sent verbatim. The builder
+        drops messages by token budget, so this rather than a message count
+        decides what must be in the summary."""
+        if window_start is not None:
+            self._windows.set(thread_id, window_start)
+
+    def schedule(self, thread_id: str) -> None:
+        task = self._tasks.get(thread_id)
+        if task is not None and not task.done():
+            # One update per thread at a time; catch up once it finishes.
+            self._rerun.add(thread_id)
+            return
+        self._tasks[thread_id] = asyncio.create_task(self._run(thread_id))
+
+    async def _run(self, thread_id: str) -> None:
+        try:
+            while True:
+                self._rerun.discard(thread_id)
+                await self._update(thread_id)
+                if thread_id not in self._rerun:
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            print(f"⚠️ Summary update failed for {thread_id}: {e}")
+        finally:
+            self._tasks.pop(thread_id, None)
+
+    async def _update(self, thread_id: str) -> None:
+        summary, covered = await get_thread_summary(thread_id) or ("", 0)
+        while True:
+            rows = await get_unsummarized_messages(
+                thread_id, covered, self.keep_recent, self.max_batch,
+                before_id=self._windows.get(thread_id),
+            )
+            if len(rows) < self.min_batch:
+                return
+            summary = await self._fold(summary, rows)
+            covered = rows[-1][0]
+            if not await save_thread_summary(thread_id, summary, covered):
+                # Another worker got further; its summary wins.
+                self._summaries.pop(thread_id)
+                return
+            self._summaries.set(thread_id, (summary, covered))
+            self.updates += 1
+            self.folded_messages += len(rows)
+            if len(rows) < self.max_batch:
+                return
+
+    async def _fold(self, summary: str, rows: List[Tuple[int, str, str]]) -> str:
+        transcript = "\n".join(
+            f"{role}: {truncate_to_tokens(content, TRANSCRIPT_MESSAGE_TOKENS)}"
+            for _, role, content in rows
+        )
+        prompt = [
+            SystemMessage(content=SUMMARY_INSTRUCTIONS.format(max_words=self.max_tokens * 3 // 4)),
+            HumanMessage(
+                content=f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"
+            ),
+        ]
+        text = ""
+        try:
+            result = await llm_module.summary_llm.ainvoke(prompt, config={"callbacks": []})
+            text = result.content.strip() if isinstance(result.content, str) else ""
+        except Exception as e:
+            print(f"⚠️ Summary LLM call failed: {e}")
+        if not text:
+            # Keep the thread moving with an extractive summary rather than
+            # retrying the same batch on every turn.
+            self.fallbacks += 1
+            text = "\n".join(
+                filter(None, [summary] + [f"{role}: {content[:160]}" for _, role, content in rows])
+            )
+            text = text[-self.max_tokens * 4 :]
+        return truncate_to_tokens(text, self.max_tokens)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "cached": len(self._summaries),
+            "running": len(self._tasks),
+            "updates": self.updates,
+            "folded_messages": self.folded_messages,
+            "fallbacks": self.fallbacks,
+            "failures": self.failures,
+        }
+
+
+summarizer = ThreadSummarizer(
+    # Fallback window when no prompt was built in this process for a thread.
+    keep_recent=context_cache.window,
+    min_batch=int(os.getenv("SUMMARY_MIN_BATCH", "4")),
+    max_batch=int(os.getenv("SUMMARY_MAX_BATCH", "20")),
+    max_tokens=int(os.getenv("SUMMARY_MAX_TOKENS", "300")),
+)
@@ -0,0 +1,113 @@
+import asyncio
+import os
+from typing import Dict, List, Tuple
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage, SystemMessage
+from app.utils import llm as llm_module
+from app.utils.cache import TTLCache
+from app.utils.context_builder import truncate_to_tokens
+from app.utils.llm_models.threadfuns import TITLE_LENGTH, get_title_source, save_thread_title
+
+load_dotenv()
+
+TITLE_INSTRUCTIONS = (
+    "Write a title of at most {max_words} words for the conversation below. "
+    "Reply with the title only: no quotes, no trailing punctuation."
+)
+
+# Per-message cap inside the excerpt handed to the titler.
+TITLE_MESSAGE_TOKENS = 150
+
+
+def _clean_title(text: str) -> str:
+    title = " ".join(text.split()).strip("\"'`*# ").rstrip(".!:;,")
+    return title[:TITLE_LENGTH]
+
+
+def _fallback_title(rows: List[Tuple[str, str]], max_words: int) -> str:
+    first = next((content for role, content in rows if role == "user"), rows[0][1])
+    words = first.split()
+    return _clean_title(" ".join(words[:max_words]) + ("…" if len(words) > max_words else ""))
+
+
+class ThreadTitler:
+    """Names threads in the background.
+
+    Once a thread has a finished turn it is scheduled; if it still has no
+    title, its first few messages go to the summary model in one short
+    prompt and the result is stored unless another worker got there first.
+    Threads known to be titled are remembered so later turns cost nothing,
+    and at most ``concurrency`` title calls run at once.
+    """
+
+    def __init__(self, max_words: int = 6, concurrency: int = 2):
+        self.max_words = max_words
+        self._limit = asyncio.Semaphore(concurrency)
+        self._titled = TTLCache(max_entries=50_000, ttl=3600.0)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.titled = 0
+        self.fallbacks = 0
+        self.failures = 0
+
+    def schedule(self, thread_id: str) -> None:
+        if self._titled.get(thread_id) or thread_id in self._tasks:
+            return
+        self._tasks[thread_id] = asyncio.create_task(self._run(thread_id))
+
+    async def _run(self, thread_id: str) -> None:
+        try:
+            async with self._limit:
+                rows = await get_title_source(thread_id)
+                if rows is None:
+                    self._titled.set(thread_id, True)
+                    return
+                title = await self._generate(rows)
+                if title and await save_thread_title(thread_id, title):
+                    self.titled += 1
+                self._titled.set(thread_id, True)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            print(f"⚠️ Title generation failed for {thread_id}: {e}")
+        finally:
+            self._tasks.pop(thread_id, None)
+
+    async def _generate(self, rows: List[Tuple[str, str]]) -> str:
+        excerpt = "\n".join(
+            f"{role}: {truncate_to_tokens(content, TITLE_MESSAGE_TOKENS)}" for role, content in rows
+        )
+        prompt = [
+            SystemMessage(content=TITLE_INSTRUCTIONS.format(max_words=self.max_words)),
+            HumanMessage(content=excerpt),
+        ]
+        title = ""
+        try:
+            result = await llm_module.summary_llm.ainvoke(prompt, config={"callbacks": []})
+            title = _clean_title(result.content) if isinstance(result.content, str) else ""
+        except Exception as e:
+            print(f"⚠️ Title LLM call failed: {e}")
+        if not title:
+            self.fallbacks += 1
+            title = _fallback_title(rows, self.max_words)
+        return title
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "running": len(self._tasks),
+            "titled": self.titled,
+            "fallbacks": self.fallbacks,
+            "failures": self.failures,
+        }
+
+
+titler = ThreadTitler(
+    max_words=int(os.getenv("TITLE_MAX_WORDS", "6")),
+    concurrency=int(os.getenv("TITLE_MAX_CONCURRENCY", "2")),
+)
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List
+from dotenv import load_dotenv
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from app.utils.chatState import ChatState
+from app.utils.metrics import TOOL_REJECTIONS, TOOL_TIMEOUTS
+
+load_dotenv()
+
+
+def _per_tool(value: str, cast=float) -> Dict[str, float]:
+    """Parse "brave_search=10,generate_image=60" style settings."""
+    settings = {}
+    for item in value.split(","):
+        name, _, setting = item.partition("=")
+        if name.strip() and setting.strip():
+            settings[name.strip()] = cast(setting)
+    return settings
+
+
+def _error(tool: str, error: str, **details) -> str:
+    return json.dumps({"error": error, "tool": tool, **details})
+
+
+def _reports_error(content: str) -> bool:
+    # The tools return their own failures as "❌ ..." or {"error": ...}.
+    return content.startswith("❌") or content.startswith('{"error"')
+
+
+class ToolExecutor:
+    """Graph node that runs the tool calls of the last AI message.
+
+    Calls run concurrently, each under its tool's timeout and concurrency
+    limit (time spent waiting for a slot counts against the timeout). A turn
+    may make at most ``max_calls`` tool calls within ``turn_budget`` seconds
+    of its start; calls over the budget, timeouts and failures come back to
+    the model as JSON ``{"error": ...}`` tool results instead of raising.
+    """
+
+    def __init__(
+        self,
+        tools: list,
+        timeouts: Dict[str, float],
+        concurrency: Dict[str, int],
+        default_timeout: float = 20.0,
+        default_concurrency: int = 16,
+        max_calls: int = 6,
+        turn_budget: float = 90.0,
+    ):
+        self.tools = {tool.name: tool for tool in tools}
+        self.timeouts = {name: timeouts.get(name, default_timeout) for name in self.tools}
+        self.limits = {
+            name: asyncio.Semaphore(int(concurrency.get(name, default_concurrency)))
+            for name in self.tools
+        }
+        self.max_calls = max_calls
+        self.turn_budget = turn_budget
+
+    def remaining(self, state: ChatState) -> tuple[int, float]:
+        """Tool calls and seconds left in the current turn."""
+        used = state.get("turn_tool_calls", 0)
+        started = state.get("turn_started_at") or time.time()
+        return self.max_calls - used, self.turn_budget - (time.time() - started)
+
+    def exhausted(self, state: ChatState) -> bool:
+        calls, seconds = self.remaining(state)
+        return calls <= 0 or seconds <= 0
+
+    async def _run_one(self, call: dict, timeout: float, config: RunnableConfig) -> ToolMessage:
+        name = call["name"]
+        tool = self.tools.get(name)
+        started = time.perf_counter()
+        if tool is None:
+            content, status = _error(name, f"Unknown tool: {name}"), "error"
+        else:
+            try:
+                content = await asyncio.wait_for(self._invoke(tool, call, config), timeout)
+                status = "error" if isinstance(content, str) and _reports_error(content) else "success"
+            except asyncio.TimeoutError:
+                TOOL_TIMEOUTS.labels(name).inc()
+                print(f"⏱️ Tool {name} timed out after {timeout:.1f}s")
+                content = _error(name, "timeout", timeout_seconds=round(timeout, 1))
+                status = "error"
+            except Exception as e:
+                print(f"❌ Tool {name} failed: {e}")
+                content, status = _error(name, str(e)), "error"
+        if not isinstance(content, str):
+            content = json.dumps(content, default=str)
+        return ToolMessage(
+            content=content,
+            name=name,
+            tool_call_id=call["id"],
+            status=status,
+            response_metadata={"latency_ms": round((time.perf_counter() - started) * 1000)},
+        )
+
+    async def _invoke(self, tool, call: dict, config: RunnableConfig):
+        async with self.limits[tool.name]:
+            return await tool.ainvoke(call["args"], config)
+
+    async def run(self, state: ChatState, config: RunnableConfig):
+        message = state["messages"][-1]
+        calls: List[dict] = list(getattr(message, "tool_calls", None) or [])
+        calls_left, seconds_left = self.remaining(state)
+        allowed, results = [], {}
+        for call in calls:
+            if len(allowed) >= max(calls_left, 0) or seconds_left <= 0:
+                reason = "budget_time" if seconds_left <= 0 else "budget_calls"
+                TOOL_REJECTIONS.labels(reason).inc()
+                results[call["id"]] = ToolMessage(
+                    content=_error(call["name"], "tool_budget_exceeded", reason=reason),
+                    name=call["name"],
+                    tool_call_id=call["id"],
+                    status="error",
+                    response_metadata={"latency_ms": 0},
+                )
+            else:
+                allowed.append(call)
+        messages = await asyncio.gather(
+            *(
+                self._run_one(call, min(self.timeouts.get(call["name"], seconds_left), seconds_left), config)
+                for call in allowed
+            )
+        )
+        results.update((m.tool_call_id, m) for m in messages)
+        return {
+            # Keep the order of the calls the model made.
+            "messages": [results[call["id"]] for call in calls],
+            "turn_tool_calls": state.get("turn_tool_calls", 0) + len(allowed),
+        }
+
+
+def build_tool_executor(tools: list) -> ToolExecutor:
+    return ToolExecutor(
+        tools,
+        timeouts=_per_tool(os.getenv("TOOL_TIMEOUTS", "brave_search=15,generate_image=60")),
+        concurrency=_per_tool(os.getenv("TOOL_CONCURRENCY", "generate_image=4"), int),
+        default_timeout=float(os.getenv("TOOL_TIMEOUT_SECONDS", "20")),
+        default_concurrency=int(os.getenv("TOOL_MAX_CONCURRENCY", "16")),
+        max_calls=int(os.getenv("TURN_MAX_TOOL_CALLS", "6")),
+        turn_budget=float(os.getenv("TURN_TOOL_BUDGET_SECONDS", "90")),
+    )
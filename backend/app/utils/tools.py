@@ -1,43 +1,30 @@
-import base64
-from io import BytesIO
 import json
 import os
 from langchain_core.tools import tool
-from langgraph.prebuilt import ToolNode
-from ddgs import DDGS
-import aiohttp
-import cloudinary
-import cloudinary.uploader
 from langsmith import traceable
 from typing import Annotated
 from urllib.parse import quote
 from dotenv import load_dotenv
+from app.utils.search import search_service
+from app.utils.metrics import instrument_tool
+from app.utils.http_client import get_http_session
+from app.utils.storage import CHUNK_SIZE, image_storage, iter_base64_chunks
+from app.utils.tool_executor import build_tool_executor
 
 load_dotenv()
 IMAGE_GENERATER_API = os.getenv("IMAGE_GENERATER_API")
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-)
 
 
 @tool("brave_search")
 @traceable
-def duckduckgo_search(
+@instrument_tool("brave_search", failed=lambda result: '"error"' in result[:12])
+async def duckduckgo_search(
     query: Annotated[str, "Text search query"],
     # safesearch: Annotated[str, "on/off/moderate"] = "moderate",
 ) -> str:
     """Search the web using DuckDuckGo and return top results."""
     try:
-        with DDGS() as ddgs:
-            results = []
-            for r in ddgs.text(query, max_results=3):
-                results.append({
-                    "title": r["title"],
-                    "url": r["href"],
-                    "snippet": r["body"][:200]
-                })
+        results = await search_service.search(query)
         return json.dumps({"results": results})
     except Exception as e:
         print(f"[duckduckgo_search] Error: {e}")
@@ -46,52 +33,46 @@ def duckduckgo_search(
 
 @tool("generate_image")
 @traceable
+@instrument_tool("generate_image", failed=lambda result: result.startswith("❌"))
 async def generate_image(prompt: Annotated[str, "Prompt to generate image"]):
     """Generate an image using the deployed cloudflare Worker and after uploading in cloudinary returns {secure_url, public_id}."""
     try:
         prompt_encoded = quote(prompt)
         url = f"{IMAGE_GENERATER_API}?p={prompt_encoded}"
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                if resp.status != 200:
-                    error_text = await resp.text()
-                    print(f"❌ Worker error: {error_text}")
-                    return f"❌ Error: Worker returned status {resp.status}"
-
-                # Check content type to determine response format
-                content_type = resp.headers.get("Content-Type", "")
-
-                if "image/" in content_type:
-                    # Worker returns image directly
-                    print(f"✅ Received image directly: {content_type}")
-                    image_bytes = await resp.read()
-                else:
-                    # Worker returns JSON with base64 image
-                    print(f"✅ Received JSON response")
-                    data = await resp.json()
-                    if "image" not in data:
-                        print(f"❌ No image in response: {data}")
-                        return "❌ Error: No image data received from worker"
-                    image_bytes = base64.b64decode(data["image"])
-
-        # Create BytesIO object from image bytes
-        image_file = BytesIO(image_bytes)
-        image_file.seek(0)  # Reset position to beginning
-
-        # Upload to Cloudinary
-        print(f"📤 Uploading to Cloudinary...")
-        response = cloudinary.uploader.upload(
-            image_file,
-            folder="lang-bot",
-            resource_type="image",
-        )
+        session = await get_http_session()
+        async with session.get(url) as resp:
+            if resp.status != 200:
+                error_text = await resp.text()
+                print(f"❌ Worker error: {error_text}")
+                return f"❌ Error: Worker returned status {resp.status}"
+
+            # Check content type to determine response format
+            content_type = resp.headers.get("Content-Type", "")
+
+            print(f"📤 Uploading to image storage...")
+            if "image/" in content_type:
+                # Worker returns image directly: stream it straight to storage
+                print(f"✅ Received image directly: {content_type}")
+                response = await image_storage.upload(
+                    resp.content.iter_chunked(CHUNK_SIZE), content_type
+                )
+            else:
+                # Worker returns JSON with base64 image
+                print(f"✅ Received JSON response")
+                data = await resp.json()
+                if "image" not in data:
+                    print(f"❌ No image in response: {data}")
+                    return "❌ Error: No image data received from worker"
+                response = await image_storage.upload(
+                    iter_base64_chunks(data.pop("image")), "image/png"
+                )
 
         secure_url = response.get("secure_url")
         public_id = response.get("public_id")
         if not secure_url:
             print(f"❌ No secure_url in response: {response}")
-            return "❌ Error: Failed to get secure_url from Cloudinary"
+            return "❌ Error: Failed to get secure_url from image storage"
 
         print(f"✅ Image uploaded successfully: {secure_url}---{public_id}")
         return json.dumps({"secure_url": secure_url, "public_id": public_id})
@@ -105,4 +86,5 @@ async def generate_image(prompt: Annotated[str, "Prompt to generate image"]):
 
 
 tools = [duckduckgo_search, generate_image]
-tool_node = ToolNode(tools)
+tool_executor = build_tool_executor(tools)
+tool_node = tool_executor.run
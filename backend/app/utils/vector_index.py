@@ -0,0 +1,128 @@
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 20_000
+
+
+class VectorIndex:
+    """One user's message embeddings as a contiguous float32 matrix.
+
+    Search is a single vectorized matrix-vector product plus argpartition.
+    Once the index holds ``ann_threshold`` vectors it also builds an IVF
+    layer (spherical k-means centroids, sqrt(n) lists) and only scores rows
+    in the ``nprobe`` closest lists; the layer is rebuilt whenever the index
+    has doubled since the last build. The build itself is left to the owner
+    (``needs_build``, ``train`` off the event loop, then ``install``); until
+    it lands, search stays flat or keeps using the previous layer.
+    """
+
+    def __init__(self, dim: int, ann_threshold: int = 20_000, nprobe: int = 8):
+        self.dim = dim
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        self.size = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self._centroids: Optional[np.ndarray] = None
+        self._lists = np.empty(0, dtype=np.int32)
+        self._built_at = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        centroids = self._centroids.nbytes if self._centroids is not None else 0
+        return self.ids.nbytes + self.vectors.nbytes + self._lists.nbytes + centroids
+
+    def _reserve(self, needed: int) -> None:
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 64)
+        ids = np.empty(capacity, dtype=np.int64)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        lists = np.empty(capacity, dtype=np.int32)
+        ids[: self.size] = self.ids[: self.size]
+        vectors[: self.size] = self.vectors[: self.size]
+        lists[: self.size] = self._lists[: self.size]
+        self.ids, self.vectors, self._lists = ids, vectors, lists
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        count = len(ids)
+        if count == 0:
+            return
+        start, end = self.size, self.size + count
+        self._reserve(end)
+        self.ids[start:end] = ids
+        self.vectors[start:end] = vectors
+        self.size = end
+        if self._centroids is not None:
+            self._lists[start:end] = np.argmax(self.vectors[start:end] @ self._centroids.T, axis=1)
+
+    @property
+    def needs_build(self) -> bool:
+        if self._centroids is None:
+            return self.size >= self.ann_threshold
+        return self.size >= 2 * self._built_at
+
+    def train(self, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Centroids for the first ``size`` rows and the list of each row.
+        Only reads those rows, which ``add`` never rewrites, so it can run in
+        a worker thread while vectors keep being appended."""
+        data = self.vectors[:size]
+        rng = np.random.default_rng(0)
+        nlist = max(1, int(np.sqrt(size)))
+        sample = data[rng.choice(size, min(size, KMEANS_SAMPLE), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+        centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        return centroids, np.argmax(data @ centroids.T, axis=1)
+
+    def install(self, centroids: np.ndarray, lists: np.ndarray) -> None:
+        """Swap in a layer from ``train``; rows added since are assigned here."""
+        size = len(lists)
+        self._lists[:size] = lists
+        if self.size > size:
+            self._lists[size : self.size] = np.argmax(
+                self.vectors[size : self.size] @ centroids.T, axis=1
+            )
+        self._centroids = centroids
+        self._built_at = size
+
+    def search(
+        self, query: np.ndarray, k: int, exclude: Iterable[int] = ()
+    ) -> List[Tuple[int, float]]:
+        if self.size == 0 or k <= 0:
+            return []
+        exclude = set(exclude)
+        query = np.asarray(query, dtype=np.float32)
+        if self._centroids is not None:
+            nprobe = min(self.nprobe, len(self._centroids))
+            probe = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+            rows = np.flatnonzero(np.isin(self._lists[: self.size], probe))
+            scores = self.vectors[rows] @ query
+        else:
+            rows = None
+            scores = self.vectors[: self.size] @ query
+        want = min(k + len(exclude), len(scores))
+        if want == 0:
+            return []
+        top = np.argpartition(-scores, want - 1)[:want]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for i in top:
+            message_id = int(self.ids[rows[i] if rows is not None else i])
+            if message_id in exclude:
+                continue
+            results.append((message_id, float(scores[i])))
+            if len(results) == k:
+                break
+        return results
@@ -1,12 +1,11 @@
-# from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import StateGraph, START, END
 
+from app.db.checkpointer import checkpointer
 from app.utils.chatState import ChatState
 from app.utils.functions import chat_node
 from app.utils.tools import tool_node
 from langgraph.prebuilt import tools_condition
 
-# checkpointer = MemorySaver()
 graph = StateGraph(ChatState)
 
 graph.add_node('chat_node', chat_node)
@@ -17,4 +16,5 @@ graph.add_edge(START, 'chat_node')
 graph.add_conditional_edges('chat_node', tools_condition)
 graph.add_edge('tools', 'chat_node')
 
-workflow = graph.compile()
\ No newline at end of file
+# State is checkpointed per thread_id, so a turn only sends the new message.
+workflow = graph.compile(checkpointer=checkpointer)
\ No newline at end of file
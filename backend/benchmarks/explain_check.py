@@ -0,0 +1,143 @@
+"""EXPLAIN check for the hot read queries.
+
+Seeds a dataset inside a transaction, runs ANALYZE, and verifies that the
+thread listing, message page and image lookup queries are planned as index
+scans rather than sequential scans. Everything is rolled back at the end.
+
+    cd backend
+    python -m benchmarks.explain_check --threads 200 --messages 50
+"""
+
+import argparse
+import asyncio
+import sys
+import psycopg
+from app.db.database import get_db_url
+from app.db.migrations import run_migrations
+
+HOT_QUERIES = {
+    "thread listing": (
+        "threads",
+        """
+            SELECT thread_id, created_at FROM threads
+            WHERE user_id = %(user_id)s
+            ORDER BY created_at DESC, thread_id DESC
+            LIMIT 21;
+        """,
+    ),
+    "message page": (
+        "messages",
+        """
+            SELECT id, role, content, created_at
+            FROM messages
+            WHERE thread_id = %(thread_id)s
+            ORDER BY created_at DESC
+            LIMIT 11;
+        """,
+    ),
+    "message images": (
+        "images",
+        """
+            SELECT parent_id, role, url_id, description, created_at
+            FROM images
+            WHERE thread_id = %(thread_id)s AND parent_id = ANY(%(parent_ids)s);
+        """,
+    ),
+}
+
+INDEX_NODES = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+
+def walk(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+async def seed(cur, users: int, threads: int, messages: int):
+    await cur.execute(
+        """
+            INSERT INTO users (username, email, encoded_password)
+            SELECT 'explain_' || g, 'explain_' || g || '@example.com', 'x'
+            FROM generate_series(1, %s) g
+            RETURNING id;
+        """,
+        (users,),
+    )
+    user_ids = [row[0] for row in await cur.fetchall()]
+    await cur.execute(
+        """
+            INSERT INTO threads (user_id, created_at)
+            SELECT u, now() - (g || ' minutes')::interval
+            FROM unnest(%s::int[]) u, generate_series(1, %s) g;
+        """,
+        (user_ids, threads),
+    )
+    await cur.execute(
+        """
+            INSERT INTO messages (thread_id, role, content, created_at)
+            SELECT t.thread_id, CASE WHEN g %% 2 = 0 THEN 'assistant' ELSE 'user' END,
+                   repeat('lorem ipsum ', 20), t.created_at + (g || ' seconds')::interval
+            FROM threads t
+            JOIN users u ON u.id = t.user_id AND u.username LIKE 'explain\\_%%'
+            CROSS JOIN generate_series(1, %s) g;
+        """,
+        (messages,),
+    )
+    await cur.execute(
+        """
+            INSERT INTO images (thread_id, parent_id, url_id, role, description)
+            SELECT m.thread_id, m.id, 'explain/' || m.id, 'assistant', 'seeded'
+            FROM messages m
+            WHERE m.role = 'assistant' AND m.id % 5 = 0
+              AND m.content = repeat('lorem ipsum ', 20);
+        """
+    )
+    await cur.execute("ANALYZE users, threads, messages, images;")
+    await cur.execute(
+        """
+            SELECT t.user_id, t.thread_id FROM threads t
+            JOIN users u ON u.id = t.user_id
+            WHERE u.username = 'explain_1' LIMIT 1;
+        """
+    )
+    user_id, thread_id = await cur.fetchone()
+    await cur.execute(
+        "SELECT id FROM messages WHERE thread_id = %s ORDER BY created_at DESC LIMIT 10;",
+        (thread_id,),
+    )
+    parent_ids = [row[0] for row in await cur.fetchall()]
+    return {"user_id": user_id, "thread_id": thread_id, "parent_ids": parent_ids}
+
+
+async def main(args) -> int:
+    await run_migrations()
+    failures = 0
+    async with await psycopg.AsyncConnection.connect(get_db_url()) as conn:
+        try:
+            async with conn.cursor() as cur:
+                params = await seed(cur, args.users, args.threads, args.messages)
+                for label, (table, query) in HOT_QUERIES.items():
+                    await cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                    plan = (await cur.fetchone())[0][0]["Plan"]
+                    nodes = [
+                        (node["Node Type"], node.get("Index Name"))
+                        for node in walk(plan)
+                        if node.get("Relation Name") == table or node["Node Type"] == "Bitmap Index Scan"
+                    ]
+                    uses_index = any(node_type in INDEX_NODES for node_type, _ in nodes)
+                    seq_scan = any(node_type == "Seq Scan" for node_type, _ in nodes)
+                    ok = uses_index and not seq_scan
+                    failures += not ok
+                    print(f"{'✅' if ok else '❌'} {label}: {nodes}")
+        finally:
+            await conn.rollback()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=200, help="threads per user")
+    parser.add_argument("--messages", type=int, default=50, help="messages per thread")
+    sys.exit(asyncio.run(main(parser.parse_args())))
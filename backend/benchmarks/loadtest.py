@@ -0,0 +1,353 @@
+"""End-to-end load test for app.server:app against local fakes.
+
+Starts a fake image worker, launches the API under uvicorn with the scripted
+fake chat model (LLM_PROVIDER=fake), the local search backend and local image
+storage, then drives a weighted mix of chat and auth requests at rising
+concurrency. Postgres is still real: point DATABASE_URL at a scratch database.
+
+Results (throughput, latency percentiles, TTFT for streaming endpoints) are
+written as JSON tagged with the current git commit so runs can be compared.
+
+    cd backend
+    DATABASE_URL=postgresql://... python -m benchmarks.loadtest \\
+        --levels 10 50 100 --duration 30 --out loadtest.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+import aiohttp
+from aiohttp import web
+
+DEFAULT_MIX = "continue=30,new_thread=10,get_conversation=20,thread_ids=15,check_user=10,check_email=10,login=5"
+
+PROMPTS = [
+    "Explain how connection pooling works.",
+    "Give me three tips for writing clean Python.",
+    "What is the difference between a process and a thread?",
+    "Summarize the plot of a heist movie in two sentences.",
+]
+SEARCH_PROMPTS = ["search the latest news about open source databases"]
+IMAGE_PROMPTS = ["draw an image of a lighthouse at dusk"]
+
+# Smallest valid PNG (1x1 transparent pixel), padded to a realistic size.
+PNG_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c63000100000500010d0a2db40000000049454e44ae426082"
+)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] * 1000, 2)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+# --- Fakes -------------------------------------------------------------------
+
+
+async def start_fake_image_worker(port: int, latency: float, size: int) -> web.AppRunner:
+    payload = PNG_BYTES + b"\0" * max(0, size - len(PNG_BYTES))
+
+    async def handle(request: web.Request) -> web.StreamResponse:
+        if latency:
+            await asyncio.sleep(latency)
+        return web.Response(body=payload, content_type="image/png")
+
+    app = web.Application()
+    app.router.add_get("/", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+def start_api(args, worker_url: str, image_dir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "LLM_PROVIDER": "fake",
+        "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "loadtest-placeholder"),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(args.tps),
+        "FAKE_LLM_FIRST_TOKEN_DELAY": str(args.first_token_delay),
+        "FAKE_LLM_TOOL_CALL_RATE": "0",
+        "SEARCH_BACKEND": "local",
+        "SEARCH_LOCAL_LATENCY_MS": str(args.search_latency_ms),
+        "IMAGE_GENERATER_API": worker_url,
+        "IMAGE_STORAGE_BACKEND": "local",
+        "IMAGE_STORAGE_DIR": image_dir,
+        # Measure the server, not the limiter, unless asked to.
+        "LLM_USER_RATE_PER_MINUTE": os.environ.get("LLM_USER_RATE_PER_MINUTE", "1000000"),
+        "LLM_USER_BURST": os.environ.get("LLM_USER_BURST", "10000"),
+        "LLM_MAX_CONCURRENT": os.environ.get("LLM_MAX_CONCURRENT", "10000"),
+    }
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.server:app",
+            "--host", "127.0.0.1", "--port", str(args.port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL if args.quiet else None,
+    )
+
+
+async def wait_until_up(session: aiohttp.ClientSession, base: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base}/") as resp:
+                if resp.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("API did not start in time")
+
+
+# --- Load generation -----------------------------------------------------------
+
+
+# Frames are "id: ...\nevent: <name>\ndata: ...\n\n"; TTFT is taken at the
+# first token, not at the first byte (which may be a tool_start frame).
+TOKEN_FRAME = b"\nevent: token\n"
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.ttfts = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def summary(self, wall: float) -> dict:
+        ops = {}
+        total = 0
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            latencies = self.latencies[name]
+            total += len(latencies)
+            ops[name] = {
+                "count": len(latencies),
+                "errors": self.errors[name],
+                "rps": round(len(latencies) / wall, 2),
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "p99_ms": percentile(latencies, 99),
+            }
+            if self.ttfts[name]:
+                ops[name].update(
+                    ttft_p50_ms=percentile(self.ttfts[name], 50),
+                    ttft_p95_ms=percentile(self.ttfts[name], 95),
+                    ttft_p99_ms=percentile(self.ttfts[name], 99),
+                )
+        return {"throughput_rps": round(total / wall, 2), "ops": ops}
+
+
+class VirtualUser:
+    def __init__(self, session, base, account, recorder, tool_rate):
+        self.session = session
+        self.base = base
+        self.account = account
+        self.recorder = recorder
+        self.tool_rate = tool_rate
+        self.threads = []
+
+    def prompt(self) -> str:
+        roll = random.random()
+        if roll < self.tool_rate / 2:
+            return random.choice(SEARCH_PROMPTS)
+        if roll < self.tool_rate:
+            return random.choice(IMAGE_PROMPTS)
+        return random.choice(PROMPTS)
+
+    async def timed(self, name, coro):
+        started = time.perf_counter()
+        try:
+            ttft = await coro
+            self.recorder.latencies[name].append(time.perf_counter() - started)
+            if ttft is not None:
+                self.recorder.ttfts[name].append(ttft - started)
+        except Exception:
+            self.recorder.errors[name] += 1
+
+    async def post_json(self, path, body):
+        async with self.session.post(f"{self.base}{path}", json=body) as resp:
+            data = await resp.json(content_type=None)
+            if resp.status >= 400:
+                raise RuntimeError(f"{path} -> {resp.status}")
+            return data
+
+    async def post_stream(self, path, body):
+        """Drain an SSE response; returns when the first token frame arrived
+        (None if the turn produced no tokens)."""
+        first = None
+        pending = b""
+        async with self.session.post(f"{self.base}{path}", json=body) as resp:
+            if resp.status >= 400:
+                raise RuntimeError(f"{path} -> {resp.status}")
+            async for chunk in resp.content.iter_any():
+                if first is not None:
+                    continue
+                # Keep a short tail so a marker split across chunks still matches.
+                pending = pending[-len(TOKEN_FRAME):] + chunk
+                if TOKEN_FRAME in pending:
+                    first = time.perf_counter()
+        return first
+
+    async def new_thread(self):
+        prompt = self.prompt()
+        data = await self.post_json(
+            "/llm/new-thread", {"user_id": self.account["id"], "init_msg": prompt}
+        )
+        self.threads.append(data["thread_id"])
+        # The frontend resends the first message here; it is the user turn
+        # the model answers, so an empty one would skew every measurement.
+        return await self.post_stream(
+            "/llm/llm-initial-response",
+            {"thread_id": data["thread_id"], "parent_id": data["parent_id"], "user_input": prompt},
+        )
+
+    async def continue_thread(self):
+        return await self.post_stream(
+            "/llm/continue-llm-response",
+            {"thread_id": random.choice(self.threads), "user_input": self.prompt()},
+        )
+
+    async def run_op(self, op: str):
+        if op in ("continue", "get_conversation") and not self.threads:
+            op = "new_thread"
+        if op == "new_thread":
+            await self.timed(op, self.new_thread())
+        elif op == "continue":
+            await self.timed(op, self.continue_thread())
+        elif op == "get_conversation":
+            await self.timed(op, self._none(self.post_json("/llm/get-conversation", {"thread_id": random.choice(self.threads)})))
+        elif op == "thread_ids":
+            await self.timed(op, self._none(self.post_json("/llm/get-thread-ids", {"user_id": self.account["id"]})))
+        elif op == "check_user":
+            await self.timed(op, self._none(self.post_json("/auth/check-user", {"username": f"u{uuid.uuid4().hex[:12]}"})))
+        elif op == "check_email":
+            await self.timed(op, self._none(self.post_json("/auth/check-email", {"email": f"{uuid.uuid4().hex[:12]}@example.com"})))
+        elif op == "login":
+            await self.timed(op, self._none(self.post_json("/auth/check-user-credentials", {
+                "username": self.account["username"],
+                "email": self.account["email"],
+                "password": self.account["password"],
+            })))
+
+    @staticmethod
+    async def _none(coro):
+        await coro
+        return None
+
+
+async def create_accounts(session, base, count: int, run_id: str):
+    accounts = []
+    for i in range(count):
+        account = {
+            "username": f"lt{run_id}{i}"[:20],
+            "email": f"lt{run_id}{i}@example.com",
+            "password": "loadtest-password",
+        }
+        async with session.post(f"{base}/auth/create-user", json=account) as resp:
+            await resp.read()
+        async with session.post(f"{base}/auth/check-user-credentials", json=account) as resp:
+            data = await resp.json()
+        if not data.get("success"):
+            raise RuntimeError(f"Could not create load-test account {account['username']}")
+        accounts.append({**account, "id": data["user"]["id"]})
+    return accounts
+
+
+async def run_stage(session, base, accounts, concurrency, duration, mix, tool_rate):
+    recorder = Recorder()
+    ops, weights = zip(*mix.items())
+    deadline = time.monotonic() + duration
+
+    async def worker(i):
+        user = VirtualUser(session, base, accounts[i % len(accounts)], recorder, tool_rate)
+        while time.monotonic() < deadline:
+            await user.run_op(random.choices(ops, weights)[0])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {"concurrency": concurrency, "duration_s": round(wall, 2), **recorder.summary(wall)}
+
+
+def parse_mix(text: str) -> dict:
+    return {name: float(weight) for name, weight in (part.split("=") for part in text.split(","))}
+
+
+async def main(args):
+    worker = await start_fake_image_worker(args.worker_port, args.worker_latency_ms / 1000, args.image_bytes)
+    image_dir = tempfile.mkdtemp(prefix="loadtest-images-")
+    api = start_api(args, f"http://127.0.0.1:{args.worker_port}/", image_dir)
+    base = f"http://127.0.0.1:{args.port}"
+    results = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "stages": [],
+    }
+    try:
+        connector = aiohttp.TCPConnector(limit=0)
+        timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            await wait_until_up(session, base)
+            accounts = await create_accounts(session, base, args.accounts, uuid.uuid4().hex[:8])
+            mix = parse_mix(args.mix)
+            for level in args.levels:
+                stage = await run_stage(session, base, accounts, level, args.duration, mix, args.tool_rate)
+                results["stages"].append(stage)
+                print(f"{level:>5} users | {stage['throughput_rps']} req/s")
+                for name, op in stage["ops"].items():
+                    ttft = f" ttft p50 {op['ttft_p50_ms']} p95 {op['ttft_p95_ms']}" if "ttft_p50_ms" in op else ""
+                    print(
+                        f"        {name:<16} n={op['count']:<6} err={op['errors']:<4} "
+                        f"p50 {op['p50_ms']} p95 {op['p95_ms']} p99 {op['p99_ms']} ms{ttft}"
+                    )
+    finally:
+        api.terminate()
+        api.wait(timeout=30)
+        await worker.cleanup()
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--duration", type=float, default=30, help="seconds per concurrency level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="op=weight pairs")
+    parser.add_argument("--tool-rate", type=float, default=0.1, help="fraction of prompts that trigger a tool")
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--tps", type=float, default=50, help="fake model tokens per second")
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--search-latency-ms", type=float, default=150)
+    parser.add_argument("--worker-latency-ms", type=float, default=500)
+    parser.add_argument("--image-bytes", type=int, default=256 * 1024)
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--worker-port", type=int, default=8801)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--quiet", action="store_true", help="silence API stdout")
+    parser.add_argument("--out", default="loadtest.json")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,126 @@
+"""Login-storm benchmark for password hashing.
+
+Starts a small FastAPI app with a bcrypt-backed ``/login`` endpoint and an
+unrelated ``/ping`` endpoint, fires a burst of concurrent logins, and
+measures ``/ping`` latency while the burst is running. It compares hashing
+inline on the event loop with the bounded PasswordHasher executor.
+
+    cd backend
+    python -m benchmarks.login_storm --logins 200 --rounds 12
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import aiohttp
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from app.utils.password_hasher import HasherOverloaded, PasswordHasher, _checkpw, _hashpw
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def build_app(mode: str, hasher: PasswordHasher, stored_hash: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.post("/login")
+    async def login():
+        if mode == "inline":
+            return {"ok": _checkpw("benchmark-password", stored_hash)}
+        try:
+            return {"ok": await hasher.verify("benchmark-password", stored_hash)}
+        except HasherOverloaded:
+            raise HTTPException(status_code=503, headers={"Retry-After": "1"})
+
+    return app
+
+
+async def run_mode(mode: str, args) -> dict:
+    hasher = PasswordHasher(max_workers=args.workers, max_queue=args.max_queue, rounds=args.rounds)
+    stored_hash = _hashpw("benchmark-password", args.rounds)
+    server = uvicorn.Server(
+        uvicorn.Config(build_app(mode, hasher, stored_hash), port=args.port, log_level="warning")
+    )
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    base = f"http://127.0.0.1:{args.port}"
+    ping_latencies, statuses = [], []
+    storm_done = asyncio.Event()
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+
+        async def pinger():
+            while not storm_done.is_set():
+                started = time.perf_counter()
+                async with session.get(f"{base}/ping") as resp:
+                    await resp.read()
+                ping_latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(args.ping_interval)
+
+        async def login():
+            async with session.post(f"{base}/login") as resp:
+                await resp.read()
+                statuses.append(resp.status)
+
+        ping_task = asyncio.create_task(pinger())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(args.logins)))
+        storm_seconds = time.perf_counter() - started
+        storm_done.set()
+        await ping_task
+
+    server.should_exit = True
+    await serve
+    hasher.shutdown()
+    return {
+        "mode": mode,
+        "logins": args.logins,
+        "storm_s": round(storm_seconds, 3),
+        "login_ok": statuses.count(200),
+        "login_shed_503": statuses.count(503),
+        "ping_samples": len(ping_latencies),
+        "ping_p50_ms": round(statistics.median(ping_latencies), 2) if ping_latencies else None,
+        "ping_p99_ms": round(percentile(ping_latencies, 99), 2),
+        "ping_max_ms": round(max(ping_latencies), 2) if ping_latencies else None,
+    }
+
+
+async def main(args):
+    results = []
+    for mode in args.modes:
+        result = await run_mode(mode, args)
+        results.append(result)
+        print(
+            f"{mode:>8} | logins ok {result['login_ok']} shed {result['login_shed_503']} "
+            f"in {result['storm_s']} s | /ping p50 {result['ping_p50_ms']} ms "
+            f"p99 {result['ping_p99_ms']} ms max {result['ping_max_ms']} ms"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["inline", "executor"])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--ping-interval", type=float, default=0.01)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", help="write results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+"""Concurrency benchmark for the streaming chat workflow.
+
+Runs N concurrent conversations through ``workflow.astream(stream_mode="messages")``
+against a local fake streaming model and reports time-to-first-token and
+token throughput.
+
+    cd backend
+    python -m benchmarks.stream_concurrency --levels 10 100 500 --tps 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import uuid
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark-placeholder")
+# Recall would query Postgres now that every stream carries a thread_id.
+os.environ.setdefault("MEMORY_ENABLED", "false")
+
+from app.utils import llm as llm_module  # noqa: E402
+from app.utils.fake_llm import FakeStreamingChatModel  # noqa: E402
+from app.utils.workflow import graph  # noqa: E402
+
+# The app checkpoints to Postgres; the benchmark only needs per-stream state.
+workflow = graph.compile(checkpointer=InMemorySaver())
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_stream(i: int):
+    started = time.perf_counter()
+    first_token = None
+    tokens = 0
+    async for message_chunk, _ in workflow.astream(
+        {"messages": [{"role": "user", "content": f"benchmark question {i}"}]},
+        config={"configurable": {"thread_id": f"benchmark-{uuid.uuid4()}"}},
+        stream_mode="messages",
+    ):
+        if message_chunk.type == "AIMessageChunk" and message_chunk.content:
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            tokens += 1
+    return first_token, tokens, time.perf_counter() - started
+
+
+async def run_level(concurrency: int):
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run_stream(i) for i in range(concurrency)))
+    wall = time.perf_counter() - started
+    ttfts = [r[0] for r in results if r[0] is not None]
+    total_tokens = sum(r[1] for r in results)
+    return {
+        "concurrency": concurrency,
+        "completed": len(ttfts),
+        "ttft_p50_ms": round(statistics.median(ttfts) * 1000, 2) if ttfts else None,
+        "ttft_p95_ms": round(percentile(ttfts, 95) * 1000, 2),
+        "ttft_p99_ms": round(percentile(ttfts, 99) * 1000, 2),
+        "wall_s": round(wall, 3),
+        "tokens_per_s": round(total_tokens / wall, 1) if wall else 0.0,
+        "streams_per_s": round(concurrency / wall, 1) if wall else 0.0,
+    }
+
+
+async def main(args):
+    llm_module.llm = FakeStreamingChatModel(
+        tokens_per_second=args.tps, first_token_delay=args.first_token_delay
+    )
+    results = []
+    for level in args.levels:
+        result = await run_level(level)
+        results.append(result)
+        print(
+            f"{result['concurrency']:>5} streams | "
+            f"TTFT p50 {result['ttft_p50_ms']} ms p95 {result['ttft_p95_ms']} ms "
+            f"p99 {result['ttft_p99_ms']} ms | "
+            f"{result['tokens_per_s']} tok/s | wall {result['wall_s']} s"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--tps", type=float, default=50.0, help="fake tokens per second per stream")
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--json", help="write results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,138 @@
+import asyncio
+from typing import Any, AsyncIterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from app.utils.llm_router import Backend, LLMRouter
+
+
+class ScriptedModel(BaseChatModel):
+    """Streams ``reply`` word by word after ``delay`` seconds, or fails
+    before the first token. Records how each call ended in ``log``."""
+
+    reply: str = "hello there"
+    delay: float = 0.0
+    token_delay: float = 0.0
+    fail: bool = False
+    log: List[str]
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    async def _astream(
+        self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        self.log.append("started")
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("provider down")
+            for i, word in enumerate(self.reply.split(" ")):
+                if i:
+                    await asyncio.sleep(self.token_delay)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else f" {word}"))
+        except (asyncio.CancelledError, GeneratorExit):
+            self.log.append("cancelled")
+            raise
+        self.log.append("finished")
+
+
+def _router(*backends: Backend, **kwargs) -> LLMRouter:
+    return LLMRouter(backends=list(backends), **kwargs)
+
+
+async def _text(router: LLMRouter) -> str:
+    chunks = [chunk.content async for chunk in router.astream([HumanMessage(content="hi")])]
+    return "".join(chunks)
+
+
+def test_hedge_is_sent_after_the_deadline_and_the_loser_cancelled():
+    slow = ScriptedModel(reply="slow answer", delay=1.0, log=[])
+    fast = ScriptedModel(reply="fast answer", delay=0.01, log=[])
+    router = _router(
+        Backend("slow", slow), Backend("fast", fast), hedge_delay=0.05, hedge_min_delay=0.01
+    )
+
+    assert asyncio.run(_text(router)) == "fast answer"
+    assert slow.log == ["started", "cancelled"]
+    assert fast.log == ["started", "finished"]
+
+
+def test_hedge_is_not_sent_before_the_deadline():
+    primary = ScriptedModel(reply="primary", delay=0.01, log=[])
+    spare = ScriptedModel(log=[])
+    router = _router(Backend("primary", primary), Backend("spare", spare), hedge_delay=0.5)
+
+    assert asyncio.run(_text(router)) == "primary"
+    assert spare.log == []
+
+
+def test_failure_before_the_first_token_fails_over():
+    broken = ScriptedModel(fail=True, log=[])
+    healthy = ScriptedModel(reply="from healthy", log=[])
+    first, second = Backend("broken", broken), Backend("healthy", healthy)
+    router = _router(first, second, hedge=False)
+
+    assert asyncio.run(_text(router)) == "from healthy"
+    assert first.consecutive_failures == 1
+    assert second.consecutive_failures == 0
+
+
+def test_breaker_opens_and_lets_one_half_open_trial_through():
+    model = ScriptedModel(fail=True, log=[])
+    backend = Backend("only", model, failure_threshold=2, cooldown=0.05)
+    router = _router(backend, hedge=False)
+
+    async def scenario():
+        for _ in range(2):
+            try:
+                await _text(router)
+            except RuntimeError:
+                pass
+        assert backend.state == "open"
+        assert not backend.available()
+
+        await asyncio.sleep(0.06)
+        assert backend.state == "half_open"
+        model.fail = False
+        model.delay = 0.05
+        trial = asyncio.create_task(_text(router))
+        await asyncio.sleep(0.01)
+        # The trial is in flight: no second request may probe the backend.
+        assert backend.trial_running
+        assert not backend.available()
+        assert await trial == "hello there"
+        assert backend.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_stream_releases_the_half_open_trial():
+    model = ScriptedModel(reply="a b c d", token_delay=0.5, log=[])
+    backend = Backend("only", model, failure_threshold=1, cooldown=0.0)
+    backend.record_failure()
+    router = _router(backend, hedge=False)
+
+    async def scenario():
+        assert backend.state == "half_open"
+        started = asyncio.Event()
+
+        async def consume():
+            async for _ in router.astream([HumanMessage(content="hi")]):
+                started.set()
+
+        task = asyncio.create_task(consume())
+        await asyncio.wait_for(started.wait(), 1)
+        assert backend.trial_running
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    # Neither a success nor a failure, but the trial slot is free again.
+    assert not backend.trial_running
+    assert backend.state == "half_open"
+    assert backend.consecutive_failures == 1
@@ -0,0 +1,46 @@
+import asyncio
+from app.utils.sse import EventStream
+
+
+async def _collect(stream: EventStream, after: int, out: list) -> None:
+    async for frame in stream.subscribe(after):
+        out.append(frame)
+
+
+def test_cancelled_subscriber_does_not_break_the_others():
+    async def scenario():
+        stream = EventStream("s", "t", coalesce_delay=0.0)
+        stream.publish("token", {"text": "a"})
+        a_frames, b_frames = [], []
+        a = asyncio.create_task(_collect(stream, 0, a_frames))
+        b = asyncio.create_task(_collect(stream, 0, b_frames))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        a.cancel()
+        await asyncio.gather(a, return_exceptions=True)
+
+        # A Last-Event-ID resume waiting on the same future.
+        resumed_frames = []
+        resumed = asyncio.create_task(_collect(stream, 1, resumed_frames))
+        await asyncio.sleep(0)
+
+        stream.publish("token", {"text": "b"})
+        stream.close()
+        await asyncio.wait_for(asyncio.gather(b, resumed), 1)
+        return b_frames, resumed_frames
+
+    b_frames, resumed_frames = asyncio.run(scenario())
+    assert len(b_frames) == 2
+    assert len(resumed_frames) == 1
+
+
+def test_job_without_subscribers_is_abandoned():
+    async def scenario():
+        stream = EventStream("s", "t", abandon_grace=0.01)
+        stream.task = asyncio.create_task(asyncio.sleep(10))
+        await asyncio.sleep(0.05)
+        return stream
+
+    stream = asyncio.run(scenario())
+    assert stream.cancel_reason == "abandoned"
+    assert stream.task.cancelled()
@@ -0,0 +1,26 @@
+import numpy as np
+from app.utils.vector_index import VectorIndex
+
+
+def _unit(rng, n, dim):
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_layer_trained_while_rows_arrive_covers_every_row():
+    rng = np.random.default_rng(1)
+    index = VectorIndex(dim=16, ann_threshold=400, nprobe=4)
+    first = _unit(rng, 400, 16)
+    index.add(np.arange(400), first)
+    assert index.needs_build
+
+    centroids, lists = index.train(len(index))
+    # Rows added while the layer was training, before it is installed.
+    late = _unit(rng, 50, 16)
+    index.add(np.arange(400, 450), late)
+    index.install(centroids, lists)
+
+    assert not index.needs_build
+    for i in (0, 399, 449):
+        vector = first[i] if i < 400 else late[i - 400]
+        assert index.search(vector, 1)[0][0] == i
@@ -65,6 +65,36 @@ function loadMessagesFromCache(thread_id: string) {
   }
 }
 
+interface StreamEvent {
+  id: string;
+  event: string;
+  data: any;
+}
+
+// Splits complete SSE frames off the buffer; the incomplete tail is returned.
+function parseSSE(buffer: string): { events: StreamEvent[]; rest: string } {
+  const events: StreamEvent[] = [];
+  let index: number;
+  while ((index = buffer.indexOf("\n\n")) !== -1) {
+    const block = buffer.slice(0, index);
+    buffer = buffer.slice(index + 2);
+    let id = "";
+    let event = "message";
+    let data = "";
+    for (const line of block.split("\n")) {
+      if (line.startsWith("id:")) id = line.slice(3).trim();
+      else if (line.startsWith("event:")) event = line.slice(6).trim();
+      else if (line.startsWith("data:")) data += line.slice(5).trimStart();
+    }
+    try {
+      events.push({ id, event, data: data ? JSON.parse(data) : {} });
+    } catch (error) {
+      console.error("Bad SSE frame:", error);
+    }
+  }
+  return { events, rest: buffer };
+}
+
 export default function ChatInterface({ thread_id }: { thread_id: string }) {
   const queryClient = useQueryClient();
   const [message, setMessage] = useState("");
@@ -77,6 +107,7 @@ export default function ChatInterface({ thread_id }: { thread_id: string }) {
   const router = useRouter();
   const conversationControllerRef = useRef<AbortController | null>(null);
   const llmControllerRef = useRef<AbortController | null>(null);
+  const attachedRef = useRef(false);
 
   function isValidUUID(id: string): boolean {
     return /^[0-9a-f]{8}-[0-9a-f]{4}-[1-5][0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$/i.test(
@@ -198,16 +229,71 @@ export default function ChatInterface({ thread_id }: { thread_id: string }) {
     }
   }, [data, thread_id]);
 
+  useEffect(() => {
+    if (isNewChat || attachedRef.current || !data?.messages?.length) return;
+    attachedRef.current = true;
+    attachToRunningResponse();
+  }, [data, isNewChat]);
+
   // useEffect(() => {
   //   if (data?.redirect) {
   //     router.replace(data.redirect);
   //   }
   // }, [data, router]);
 
+  const appendToLastMessage = (text: string) => {
+    queryClient.setQueryData<MessagesState>([thread_id], (old) => {
+      if (!old) return { messages: [], has_more: false };
+      const updated = [...old.messages];
+      const lastIndex = updated.length - 1;
+      if (lastIndex >= 0) {
+        updated[lastIndex] = {
+          ...updated[lastIndex],
+          content: updated[lastIndex].content + text,
+        };
+      }
+      return { messages: updated, has_more: old.has_more };
+    });
+  };
+
+  // Reads SSE events until the stream ends. Returns the last event id seen
+  // and whether the server sent its final "done" event.
+  const readStreamEvents = async (
+    reader: ReadableStreamDefaultReader<Uint8Array>,
+    state: { lastEventId: string; done: boolean; sawImage: boolean }
+  ) => {
+    const decoder = new TextDecoder();
+    let buffer = "";
+    try {
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const { events, rest } = parseSSE(buffer);
+        buffer = rest;
+        for (const { id, event, data } of events) {
+          if (id) state.lastEventId = id;
+          if (event === "token") appendToLastMessage(data.text ?? "");
+          else if (event === "tool_start")
+            appendToLastMessage(`🛠️ Using ${data.tool}...\n\n`);
+          else if (event === "image") {
+            state.sawImage = true;
+            appendToLastMessage(`${data.url}\n\n`);
+          } else if (event === "error")
+            appendToLastMessage(`${data.message}\n\n`);
+          else if (event === "cancelled")
+            appendToLastMessage("\n\n_(stopped)_");
+          else if (event === "done") state.done = true;
+        }
+      }
+    } finally {
+      reader.releaseLock();
+    }
+  };
+
   const streamAssistantResponse = async (
     reader: ReadableStreamDefaultReader<Uint8Array>
   ) => {
-    const decoder = new TextDecoder();
     queryClient.setQueryData<MessagesState>([thread_id], (old) => ({
       messages: [
         ...(old?.messages ?? []),
@@ -216,66 +302,84 @@ export default function ChatInterface({ thread_id }: { thread_id: string }) {
       has_more: old?.has_more ?? false,
     }));
 
+    const state = { lastEventId: "", done: false, sawImage: false };
     try {
-      while (true) {
-        const { done, value } = await reader.read();
-        if (done) break;
-        const chunk = decoder.decode(value, { stream: true });
-
-        queryClient.setQueryData<MessagesState>([thread_id], (old) => {
-          if (!old) return { messages: [], has_more: false };
-          const updated = [...old.messages];
-          const lastIndex = updated.length - 1;
-          if (lastIndex >= 0) {
-            updated[lastIndex] = {
-              ...updated[lastIndex],
-              content: updated[lastIndex].content + chunk,
-            };
-          }
-          return { messages: updated, has_more: old.has_more };
-        });
+      await readStreamEvents(reader, state);
+    } catch (error) {
+      console.error("Stream reading error:", error);
+    }
+
+    // The turn keeps running on the server if the connection drops, so pick
+    // it up again from the last event we saw.
+    for (let attempt = 0; !state.done && state.lastEventId && attempt < 3; attempt++) {
+      try {
+        const res = await fetch(
+          `/api/resume_llm_response?last_event_id=${encodeURIComponent(state.lastEventId)}`
+        );
+        if (!res.ok || !res.body) break;
+        await readStreamEvents(res.body.getReader(), state);
+      } catch (error) {
+        console.error("Stream resume error:", error);
       }
-      const finalData = queryClient.getQueryData<MessagesState>([thread_id]);
-      if (finalData && finalData.messages.length > 0) {
-        const last = finalData.messages[finalData.messages.length - 1];
-        if (
-          last.role === "assistant" &&
-          last.content.startsWith("🛠️") &&
-          last.content.includes("https://res.cloudinary.com/")
-        ) {
-          console.log("🐦‍🔥 image present");
-          const refreshed = await fetchFreshConversation();
-          queryClient.setQueryData<MessagesState>([thread_id], (old) => {
-            if (!old) return refreshed;
-
-            const updated = [...old.messages];
-            const lastIndex = updated.length - 1;
-
-            const refreshedLastMessage =
-              refreshed.messages[refreshed.messages.length - 1];
-            if (lastIndex >= 0 && refreshedLastMessage) {
-              updated[lastIndex] = refreshedLastMessage;
-            }
-            const existingIds = new Set(updated.map((m) => m.id || m.content));
-
-            const additional = refreshed.messages.filter(
-              (m) => !existingIds.has(m.id || m.content)
-            );
-
-            const mergedState = {
-              ...refreshed,
-              messages: [...updated, ...additional],
-            };
-
-            saveMessagesToCache(thread_id, mergedState);
-            return mergedState;
-          });
+    }
+
+    if (state.sawImage) {
+      console.log("🐦‍🔥 image present");
+      const refreshed = await fetchFreshConversation();
+      queryClient.setQueryData<MessagesState>([thread_id], (old) => {
+        if (!old) return refreshed;
+
+        const updated = [...old.messages];
+        const lastIndex = updated.length - 1;
+
+        const refreshedLastMessage =
+          refreshed.messages[refreshed.messages.length - 1];
+        if (lastIndex >= 0 && refreshedLastMessage) {
+          updated[lastIndex] = refreshedLastMessage;
         }
-      }
+        const existingIds = new Set(updated.map((m) => m.id || m.content));
+
+        const additional = refreshed.messages.filter(
+          (m) => !existingIds.has(m.id || m.content)
+        );
+
+        const mergedState = {
+          ...refreshed,
+          messages: [...updated, ...additional],
+        };
+
+        saveMessagesToCache(thread_id, mergedState);
+        return mergedState;
+      });
+    }
+  };
+
+  const cancelLLMResponse = async () => {
+    try {
+      await fetch("/api/cancel_llm_response", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ thread_id }),
+      });
     } catch (error) {
-      console.error("Stream reading error:", error);
+      console.error("Failed to cancel response:", error);
+    }
+  };
+
+  // Follow a response that is still being generated for this thread, e.g.
+  // one started in another tab or before a reload.
+  const attachToRunningResponse = async () => {
+    try {
+      const res = await fetch(
+        `/api/resume_llm_response?thread_id=${encodeURIComponent(thread_id)}`
+      );
+      if (!res.ok || !res.body) return;
+      setIsTyping(true);
+      await streamAssistantResponse(res.body.getReader());
+    } catch (error) {
+      console.error("Failed to attach to response:", error);
     } finally {
-      reader.releaseLock();
+      setIsTyping(false);
     }
   };
 
@@ -572,6 +676,24 @@ export default function ChatInterface({ thread_id }: { thread_id: string }) {
               handleInput();
             }}
           />
+          {isTyping && (
+            <button
+              aria-label="Stop response"
+              type="button"
+              className={styles.sendButton}
+              onClick={cancelLLMResponse}
+            >
+              <svg
+                width="20"
+                height="20"
+                viewBox="0 0 24 24"
+                fill="none"
+                xmlns="http://www.w3.org/2000/svg"
+              >
+                <rect x="6" y="6" width="12" height="12" rx="2" fill="currentColor" />
+              </svg>
+            </button>
+          )}
           <button
             aria-label="Sent Message"
             type="submit"
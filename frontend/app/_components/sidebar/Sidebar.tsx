@@ -3,12 +3,12 @@ import { memo, useState } from "react";
 import { usePathname } from "next/navigation";
 import styles from "./sidebar.module.css";
 import Link from "next/link";
-import { useThreads } from "@/app/_lib/hooks";
+import { ThreadSummary, useThreads } from "@/app/_lib/hooks";
 import dynamic from "next/dynamic";
 const Profile = dynamic(() => import("../profile/Profile"));
 
 const Sidebar = () => {
-  const { threadIds, deleteThread, pending } = useThreads();
+  const { threads, deleteThread, loadMore, hasMore, pending } = useThreads();
   const [displaySideBar, setDisplaySideBar] = useState<boolean>(false);
   const pathname = usePathname();
   const currentThreadId = pathname.split("/").pop() as string | undefined;
@@ -74,13 +74,15 @@ const Sidebar = () => {
 
       <div className={styles.chatListContainer}>
         <DisplayThreads
-          threadIds={threadIds}
+          threads={threads}
           deleteThread={deleteThread}
+          loadMore={loadMore}
+          hasMore={hasMore}
           pending={pending}
           currentThreadId={currentThreadId ?? ""}
         />
 
-        {threadIds.length === 0 && displaySideBar && (
+        {threads.length === 0 && displaySideBar && (
           <div className={styles.emptyState}>No conversations yet</div>
         )}
       </div>
@@ -90,21 +92,36 @@ const Sidebar = () => {
 };
 const DisplayThreads = memo(
   ({
-    threadIds,
+    threads,
     deleteThread,
+    loadMore,
+    hasMore,
     pending,
     currentThreadId,
   }: {
-    threadIds: string[];
+    threads: ThreadSummary[];
     deleteThread: (id: string, currentThreadId: string) => Promise<void>;
+    loadMore: () => Promise<void>;
+    hasMore: boolean;
     pending: boolean;
     currentThreadId: string;
   }) => {
     return (
-      <ul className={styles.chatList}>
-        {threadIds.map((id, i) => (
+      <ul
+        className={styles.chatList}
+        onScroll={(e) => {
+          const list = e.currentTarget;
+          if (
+            hasMore &&
+            list.scrollTop + list.clientHeight >= list.scrollHeight - 80
+          ) {
+            loadMore();
+          }
+        }}
+      >
+        {threads.map(({ thread_id: id, title, preview }) => (
           <li
-            key={i}
+            key={id}
             className={`${styles.chatItem} ${
               currentThreadId === id ? styles.chatItemActive : ""
             }`}
@@ -117,12 +134,15 @@ const DisplayThreads = memo(
                 if (pending) e.preventDefault();
               }}
             >
-              <p className={styles.thread}>{id}</p>
+              <p className={styles.thread}>{title || preview || "New chat"}</p>
+              {title && preview ? (
+                <p className={styles.threadPreview}>{preview}</p>
+              ) : null}
             </Link>
             <button
               className={styles.delete}
               onClick={() => deleteThread(id, currentThreadId || "")}
-              aria-label={`Delete chat ${id}`}
+              aria-label={`Delete chat ${title || id}`}
               disabled={pending}
             >
               <svg
@@ -151,6 +171,13 @@ const DisplayThreads = memo(
             </button>
           </li>
         ))}
+        {hasMore ? (
+          <li>
+            <button className={styles.loadMore} onClick={() => loadMore()}>
+              Show more
+            </button>
+          </li>
+        ) : null}
       </ul>
     );
   }
@@ -3,7 +3,7 @@
 import { verifySession } from "@/app/_lib/session";
 import { cookies } from "next/headers";
 
-export async function fetchThreadIdsAction(row_index: number) {
+export async function fetchThreadIdsAction(cursor: string | null = null) {
   console.log("fetchThreadIdsAction called");
   const API = process.env.DOCKER_BACKEND_URL;
   try {
@@ -23,12 +23,12 @@ export async function fetchThreadIdsAction(row_index: number) {
 
     console.log("---------API-------", API, {
       user_id: session.id,
-      row_index: row_index,
+      cursor: cursor,
     });
 
     const response = await fetch(`${API}/llm/get-thread-ids`, {
       method: "POST",
-      body: JSON.stringify({ user_id: session.id, row_index: row_index }),
+      body: JSON.stringify({ user_id: session.id, cursor: cursor }),
       headers: { "Content-Type": "application/json" },
       // next: {
       //   revalidate: 30,
@@ -39,7 +39,7 @@ export async function fetchThreadIdsAction(row_index: number) {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
     const data = await response.json();
-    return data.thread_ids;
+    return { threads: data.threads, next_cursor: data.next_cursor ?? null };
   } catch (error) {
     console.error("Chat API (get thread ids) Error:", error);
     throw error;
@@ -5,8 +5,20 @@ import { deleteConversationAction } from "../_components/sidebar/deleteConversat
 import { useRouter } from "next/navigation";
 import { chatHomeInterfaceAction } from "../_components/chatHomeInterface/chatHomeInterfaceAction";
 
+export type ThreadSummary = {
+  thread_id: string;
+  title: string | null;
+  preview: string | null;
+  message_count: number;
+  last_message_at: string;
+};
+
+const THREADS_KEY = "threads";
+
 export const useThreads = () => {
-  const [threadIds, setThreadIds] = useState<string[]>([]);
+  const [threads, setThreads] = useState<ThreadSummary[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
   const [pending, setPending] = useState<boolean>(false);
   const [error, setError] = useState<string | null>(null);
   const router = useRouter();
@@ -15,14 +27,18 @@ export const useThreads = () => {
     const initThreads = async () => {
       setPending(true);
       try {
-        const stored = localStorage.getItem("thread_ids");
+        // Show the stored list at once, then refresh it: titles are
+        // generated in the background after a thread's first reply.
+        const stored = localStorage.getItem(THREADS_KEY);
         if (stored) {
-          setThreadIds(JSON.parse(stored));
-        } else {
-          const fetched = await fetchThreadIdsAction(0);
-          if (fetched?.length) {
-            setThreadIds(fetched);
-          }
+          setThreads(JSON.parse(stored));
+        }
+        // Only the newest page is fetched here; older threads come in
+        // through loadMore as the list is scrolled.
+        const fetched = await fetchThreadIdsAction();
+        if (Array.isArray(fetched?.threads)) {
+          setThreads(fetched.threads);
+          setNextCursor(fetched.next_cursor);
         }
       } catch (error) {
         console.error("Failed to fetch threads:", error);
@@ -35,9 +51,34 @@ export const useThreads = () => {
   }, []);
 
   useEffect(() => {
-    if (threadIds.length <= 0) return;
-    localStorage.setItem("thread_ids", JSON.stringify(threadIds));
-  }, [threadIds]);
+    if (threads.length <= 0) return;
+    localStorage.setItem(THREADS_KEY, JSON.stringify(threads));
+  }, [threads]);
+
+  const loadMore = useCallback(async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const fetched = await fetchThreadIdsAction(nextCursor);
+      if (Array.isArray(fetched?.threads)) {
+        setThreads((prev) => {
+          const seen = new Set(prev.map((t) => t.thread_id));
+          return [
+            ...prev,
+            ...fetched.threads.filter(
+              (t: ThreadSummary) => !seen.has(t.thread_id)
+            ),
+          ];
+        });
+        setNextCursor(fetched.next_cursor);
+      }
+    } catch (error) {
+      console.error("Failed to fetch more threads:", error);
+      setError("Failed to fetch threads");
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [nextCursor, loadingMore]);
 
   const deleteThread = useCallback(
     async (id: string, currentThreadId: string) => {
@@ -45,9 +86,12 @@ export const useThreads = () => {
 
       setPending(true);
       try {
-        setThreadIds((prev) => {
-          const updated = prev.filter((t) => t !== id);
-          localStorage.setItem("thread_ids", JSON.stringify(updated));
+        const removed = (
+          JSON.parse(localStorage.getItem(THREADS_KEY) || "[]") as ThreadSummary[]
+        ).find((t) => t.thread_id === id);
+        setThreads((prev) => {
+          const updated = prev.filter((t) => t.thread_id !== id);
+          localStorage.setItem(THREADS_KEY, JSON.stringify(updated));
 
           const cache = JSON.parse(
             localStorage.getItem("chat_threads_cache") || "{}"
@@ -61,9 +105,10 @@ export const useThreads = () => {
         const data = await deleteConversationAction(id);
         if (!data?.success) {
           console.log("Delete failed, restoring...");
-          setThreadIds((prev) => {
-            const restored = [id, ...prev];
-            localStorage.setItem("thread_ids", JSON.stringify(restored));
+          setThreads((prev) => {
+            if (!removed) return prev;
+            const restored = [removed, ...prev];
+            localStorage.setItem(THREADS_KEY, JSON.stringify(restored));
             return restored;
           });
           return;
@@ -87,9 +132,19 @@ export const useThreads = () => {
     try {
       const result = await chatHomeInterfaceAction(data);
       if (result.error) result;
-      setThreadIds((prev) => {
-        const updated = [result.thread_id, ...prev];
-        localStorage.setItem("thread_ids", JSON.stringify(updated));
+      const initMsg = String(data.get("init_msg") ?? "");
+      setThreads((prev) => {
+        const updated = [
+          {
+            thread_id: result.thread_id,
+            title: null,
+            preview: initMsg.trim().split(/\s+/).join(" ").slice(0, 120),
+            message_count: 1,
+            last_message_at: new Date().toISOString(),
+          },
+          ...prev,
+        ];
+        localStorage.setItem(THREADS_KEY, JSON.stringify(updated));
         return updated;
       });
       router.push(`/chat/${result.thread_id}?n=true&p=${result.parent_id}`);
@@ -101,10 +156,12 @@ export const useThreads = () => {
     }
   }, []);
   return {
-    threadIds,
-    setThreadIds,
+    threads,
+    setThreads,
     deleteThread,
     addNewThread,
+    loadMore,
+    hasMore: nextCursor !== null,
     pending,
     error,
   };
@@ -30,7 +30,9 @@ export async function POST(req: NextRequest) {
   return new Response(fastapiRes.body, {
     status: fastapiRes.status,
     headers: {
-      "Content-Type": "text/plain",
+      "Content-Type": "text/event-stream",
+      "Cache-Control": "no-cache",
+      "X-Accel-Buffering": "no",
     },
   });
 }
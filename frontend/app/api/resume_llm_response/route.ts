@@ -0,0 +1,47 @@
+import { verifySession } from "@/app/_lib/session";
+import { NextRequest } from "next/server";
+
+// Event ids are "<stream_id>:<seq>"; stream ids are uuid4 hex.
+const EVENT_ID_RE = /^[0-9a-f]{32}:\d+$/;
+
+export async function GET(req: NextRequest) {
+  const token = req.cookies.get("auth_token")?.value || "";
+  const session = verifySession(token);
+  const API = process.env.DOCKER_BACKEND_URL;
+  if (!session) {
+    return new Response(JSON.stringify({ error: "Unauthorized" }), {
+      status: 401,
+      headers: {
+        "Content-Type": "application/json",
+        "Set-Cookie": "auth_token=; Path=/; HttpOnly; Max-Age=0",
+      },
+    });
+  }
+
+  // With a thread_id, attach to whatever generation is running for it;
+  // otherwise resume a known stream after last_event_id.
+  const threadId = req.nextUrl.searchParams.get("thread_id");
+  const lastEventId = req.nextUrl.searchParams.get("last_event_id") || "";
+  const streamId = lastEventId.slice(0, lastEventId.lastIndexOf(":"));
+  if (!threadId && !EVENT_ID_RE.test(lastEventId)) {
+    return new Response(JSON.stringify({ error: "Invalid last_event_id" }), {
+      status: 400,
+      headers: { "Content-Type": "application/json" },
+    });
+  }
+
+  const fastapiRes = threadId
+    ? await fetch(`${API}/llm/thread-stream/${encodeURIComponent(threadId)}`)
+    : await fetch(`${API}/llm/stream/${encodeURIComponent(streamId)}`, {
+        headers: { "Last-Event-ID": lastEventId },
+      });
+
+  return new Response(fastapiRes.body, {
+    status: fastapiRes.status,
+    headers: {
+      "Content-Type": "text/event-stream",
+      "Cache-Control": "no-cache",
+      "X-Accel-Buffering": "no",
+    },
+  });
+}